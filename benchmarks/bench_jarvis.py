@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+End-to-end overhead benchmark
+
+Runs JARVIS against the stand-in servers in fake_servers.py, so the numbers
+are JARVIS's own cost rather than model speed:
+
+  client   OllamaClient.chat / ClaudeClient.chat per-token cost, against a
+           bare requests stream of the same body
+  turn     Jarvis.aget_response per-turn overhead as history grows
+  startup  import time, `jarvis.py --help`, and Jarvis() + first health probe
+
+Results are written as JSON; --compare prints the ratio against an older run.
+
+Usage:
+    python benchmarks/bench_jarvis.py [--repeat N] [--tokens N] [--output FILE] [--compare OLD.json]
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import statistics
+import subprocess
+from datetime import datetime
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import jarvis  # noqa: E402
+from fake_servers import StreamProfile  # noqa: E402
+
+FAKE_SERVERS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_servers.py")
+
+HISTORY_LENGTHS = (0, 10, 50, 200)
+FILLER = "Could you walk me through how the reactor output is regulated under load? " * 3
+
+
+class FakeServers:
+    """fake_servers.py in a child process, so serving doesn't share our GIL"""
+    
+    def __init__(self, profile: StreamProfile):
+        self.proc = subprocess.Popen(
+            [sys.executable, FAKE_SERVERS, "--ollama-port", "0", "--anthropic-port", "0", "--elevenlabs-port", "0",
+             "--tokens", str(profile.tokens), "--chunk-tokens", str(profile.chunk_tokens),
+             "--rate", str(profile.rate), "--latency", str(profile.latency),
+             "--error-rate", str(profile.error_rate), "--drop-rate", str(profile.drop_rate)],
+            stdout=subprocess.PIPE, text=True,
+        )
+        self.ollama = self.proc.stdout.readline().split()[-1]
+        self.anthropic = self.proc.stdout.readline().split()[-1]
+    
+    def __enter__(self) -> "FakeServers":
+        return self
+    
+    def __exit__(self, *exc):
+        self.proc.terminate()
+        self.proc.wait()
+
+
+def timed(fn, repeat: int) -> dict:
+    """Run fn `repeat` times; seconds as best/median"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {"best": min(samples), "median": statistics.median(samples)}
+
+
+def drain(chunks) -> int:
+    count = 0
+    for chunk in chunks:
+        if isinstance(chunk, jarvis.StreamError):
+            raise RuntimeError(chunk)
+        count += 1
+    return count
+
+
+def make_jarvis(servers: FakeServers) -> "jarvis.Jarvis":
+    """A Jarvis wired to the fake servers, with nothing written to disk"""
+    j = jarvis.Jarvis()
+    j.config.ollama_host = servers.ollama
+    j.config.metrics_log_path = j.config.metrics_prom_path = j.config.hedge_log_path = ""
+    j.config.hedge_deadline = 0.0
+    j.ollama.host = j.config.ollama_host
+    j.metrics.log_path = ""
+    j.claude.api_key = "bench"
+    j.claude.available = True
+    j.claude.url = servers.anthropic
+    j.cache = None
+    j.health.refresh(force=True)
+    return j
+
+
+def bench_client(profile: StreamProfile, repeat: int) -> dict:
+    """Per-token cost of the two clients, next to a bare requests stream"""
+    servers = FakeServers(profile)
+    transport = jarvis.HTTPTransport()
+    ollama = jarvis.OllamaClient(servers.ollama, transport=transport)
+    claude = jarvis.ClaudeClient("bench", transport=transport)
+    claude.url = servers.anthropic
+    messages = [{"role": "user", "content": "hello"}]
+    model = "bench"
+    
+    def raw(endpoint: str, payload: dict):
+        with transport.post(endpoint, json=payload, stream=True) as r:
+            for _ in r.iter_lines():
+                pass
+    
+    runs = {
+        "ollama_raw": lambda: raw(f"{servers.ollama}/api/chat", {"model": model, "messages": messages}),
+        "ollama_client": lambda: drain(ollama.chat(messages, model)),
+        "claude_raw": lambda: raw(claude.url, {"model": model, "messages": messages}),
+        "claude_client": lambda: drain(claude.chat(messages, model, "system")),
+    }
+    results = {}
+    with servers:
+        for name, fn in runs.items():
+            fn()  # warm the connection pool
+            t = timed(fn, repeat)
+            results[name] = {"seconds": t["best"], "us_per_token": t["best"] / profile.tokens * 1e6}
+    for backend in ("ollama", "claude"):
+        results[f"{backend}_overhead_us_per_token"] = (
+            results[f"{backend}_client"]["us_per_token"] - results[f"{backend}_raw"]["us_per_token"]
+        )
+    return results
+
+
+def bench_turn(profile: StreamProfile, repeat: int) -> dict:
+    """Time per full turn minus the bare stream time, for growing histories"""
+    results = {}
+    with FakeServers(profile) as servers:
+        j = make_jarvis(servers)
+        for backend in ("local", "cloud"):
+            # Baseline: the same request straight through the client
+            opener = j._request(backend, history_of(j, 0), {"role": "user", "content": "Status report, please."})[3]
+            stream = timed(lambda: drain(jarvis.iterate_sync(opener(jarvis.StreamHandle()))), repeat)["median"]
+            for turns in HISTORY_LENGTHS:
+                samples = []
+                errors = 0
+                for _ in range(repeat):
+                    history = history_of(j, turns)
+                    info = jarvis.TurnInfo()
+                    start = time.perf_counter()
+                    for _ in jarvis.iterate_sync(j.aget_response("Status report, please.", history=history,
+                                                                 mode=backend, info=info)):
+                        pass
+                    samples.append(time.perf_counter() - start)
+                    errors += bool(info.error)
+                median = statistics.median(samples)
+                results[f"{backend}/{turns}"] = {
+                    "history_turns": turns,
+                    "turn_s": median,
+                    "stream_s": stream,
+                    "overhead_ms": (median - stream) * 1000,
+                    "errors": errors,
+                }
+    return results
+
+
+def history_of(j: "jarvis.Jarvis", turns: int) -> "jarvis.HistoryManager":
+    """A history of `turns` exchanges, with no summarizer so nothing runs in the background"""
+    h = jarvis.HistoryManager(j.history.budgets, keep_turns=j.history.keep_turns)
+    for i in range(turns):
+        h.append({"role": "user", "content": f"{i}: {FILLER}"})
+        h.append({"role": "assistant", "content": FILLER})
+    return h
+
+
+def bench_startup(repeat: int) -> dict:
+    """Process start costs, and in-process construction + first probe"""
+    def run(*args):
+        subprocess.run([sys.executable, *args], cwd=ROOT, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    
+    results = {
+        "python_s": timed(lambda: run("-c", "pass"), repeat)["median"],
+        "import_s": timed(lambda: run("-c", "import jarvis"), repeat)["median"],
+        "help_s": timed(lambda: run("jarvis.py", "--help"), repeat)["median"],
+    }
+    results["import_overhead_s"] = results["import_s"] - results["python_s"]
+    
+    with FakeServers(StreamProfile(tokens=1)) as servers:
+        results["construct_and_probe_s"] = timed(lambda: make_jarvis(servers), repeat)["median"]
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def flatten(tree: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in tree.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, path + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def compare(old: dict, new: dict):
+    before, after = flatten(old["results"]), flatten(new["results"])
+    print(f"\n{'metric':<50} {'before':>12} {'after':>12} {'ratio':>8}")
+    print("─" * 86)
+    for key in sorted(before.keys() & after.keys()):
+        ratio = f"{after[key] / before[key]:.2f}x" if before[key] else "—"
+        print(f"{key:<50} {before[key]:>12.4g} {after[key]:>12.4g} {ratio:>8}")
+
+
+def report(results: dict):
+    client = results["client"]
+    print(f"{'client':<20} {'µs/token':>10} {'overhead':>10}")
+    for backend in ("ollama", "claude"):
+        print(f"{backend:<20} {client[backend + '_client']['us_per_token']:>10.1f} "
+              f"{client[backend + '_overhead_us_per_token']:>+10.1f}")
+    print(f"\n{'turn':<20} {'history':>8} {'turn':>10} {'overhead':>12}")
+    for name, r in results["turn"].items():
+        print(f"{name.split('/')[0]:<20} {r['history_turns']:>8} {r['turn_s'] * 1000:>8.1f}ms "
+              f"{r['overhead_ms']:>10.1f}ms" + (f"  ({r['errors']} errors)" if r["errors"] else ""))
+    startup = results["startup"]
+    print("\nstartup")
+    for key, value in startup.items():
+        print(f"  {key:<22} {value * 1000:>8.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JARVIS end-to-end overhead benchmark")
+    parser.add_argument("--repeat", type=int, default=10, help="samples per measurement")
+    parser.add_argument("--tokens", type=int, default=2000, help="tokens per answer in the client benchmark")
+    parser.add_argument("--chunk-tokens", type=int, default=1, help="tokens per streamed chunk")
+    parser.add_argument("--turn-tokens", type=int, default=64, help="tokens per answer in the turn benchmark")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="inject HTTP 500s into the turn benchmark")
+    parser.add_argument("--output", help="results file (default benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--compare", metavar="OLD", help="print ratios against an earlier results file")
+    args = parser.parse_args()
+    
+    results = {
+        "client": bench_client(StreamProfile(tokens=args.tokens, chunk_tokens=args.chunk_tokens), args.repeat),
+        "turn": bench_turn(StreamProfile(tokens=args.turn_tokens, chunk_tokens=args.chunk_tokens,
+                                         error_rate=args.error_rate), args.repeat),
+        "startup": bench_startup(args.repeat),
+    }
+    commit = git_commit()
+    run = {
+        "meta": {
+            "at": datetime.now().isoformat(timespec="seconds"),
+            "commit": commit,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    report(results)
+    
+    output = args.output or os.path.join(
+        ROOT, "benchmarks", "results", f"{datetime.now():%Y%m%d-%H%M%S}-{commit or 'nogit'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(run, f, indent=2)
+    print(f"\nSaved {output}")
+    
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), run)
+
+
+if __name__ == "__main__":
+    main()
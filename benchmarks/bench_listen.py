@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Voice activity detector benchmark
+
+Generates synthetic speech (voiced syllables with fricative bursts, over a
+noise floor) with utterances at known places, then runs it through
+VoiceActivityDetector. It reports:
+
+  speed     audio seconds processed per CPU second, in 100 ms blocks (as the
+            microphone delivers them) and 1 s blocks, next to the same
+            features computed one frame at a time
+  accuracy  utterances found vs planted, for a few noise levels and for
+            background noise that steps up half way through
+
+Usage:
+    python benchmarks/bench_listen.py [--utterances N] [--rate HZ] [--repeat N]
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from jarvis import VoiceActivityDetector  # noqa: E402
+
+
+def synthetic_speech(rate: int, utterances: int, noise: float, seed: int = 0) -> np.ndarray:
+    """int16 audio: 1-2 s of silence, then utterances of 0.6-2.5 s separated by 0.8-2 s gaps"""
+    rng = np.random.default_rng(seed)
+    parts = [np.zeros(int(rate * rng.uniform(1.0, 2.0)))]
+    for _ in range(utterances):
+        seconds = rng.uniform(0.6, 2.5)
+        t = np.arange(int(rate * seconds)) / rate
+        f0 = 110 + 50 * np.sin(2 * np.pi * 0.7 * t)  # drifting pitch
+        phase = 2 * np.pi * np.cumsum(f0) / rate
+        voiced = sum(np.sin(h * phase) / h for h in range(1, 6))
+        envelope = np.abs(np.sin(2 * np.pi * 4 * t)) ** 0.5  # ~8 syllables a second
+        speech = 3000 * voiced * envelope
+        for start in rng.uniform(0, seconds - 0.1, size=int(seconds * 2)):  # "s", "f", "sh"
+            i = int(start * rate)
+            burst = speech[i:i + int(0.08 * rate)]
+            burst += rng.normal(0, 1200, len(burst))
+        parts += [speech, np.zeros(int(rate * rng.uniform(0.8, 2.0)))]
+    audio = np.concatenate(parts) + rng.normal(0, noise, sum(len(p) for p in parts))
+    return np.clip(audio, -32768, 32767).astype(np.int16)
+
+
+def detect(audio: np.ndarray, rate: int, block_ms: int = 100) -> int:
+    vad = VoiceActivityDetector(rate)
+    block = rate * block_ms // 1000
+    found = 0
+    for start in range(0, len(audio), block):
+        found += len(vad.feed(audio[start:start + block]))
+    return found + len(vad.flush())
+
+
+def per_frame_features(audio: np.ndarray, frame: int):
+    """The detector's features, one frame at a time"""
+    out = []
+    for start in range(0, len(audio) - frame + 1, frame):
+        x = audio[start:start + frame].astype(np.float32)
+        signs = np.signbit(x)
+        out.append((float(np.sqrt(np.mean(x * x))), np.count_nonzero(signs[1:] != signs[:-1]) / (frame - 1)))
+    return out
+
+
+def best_cpu(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.process_time()
+        fn()
+        samples.append(time.process_time() - start)
+    return max(min(samples), 1e-9)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JARVIS voice activity detector benchmark")
+    parser.add_argument("--utterances", type=int, default=20, help="utterances in the synthetic audio")
+    parser.add_argument("--rate", type=int, default=16000, help="sample rate")
+    parser.add_argument("--repeat", type=int, default=5, help="timing samples (best is reported)")
+    args = parser.parse_args()
+    
+    audio = synthetic_speech(args.rate, args.utterances, noise=50)
+    seconds = len(audio) / args.rate
+    frame = VoiceActivityDetector(args.rate).frame
+    runs = {
+        "detector, 100 ms blocks": lambda: detect(audio, args.rate, 100),
+        "detector, 1 s blocks": lambda: detect(audio, args.rate, 1000),
+        "features only, frame by frame": lambda: per_frame_features(audio, frame),
+    }
+    print(f"{seconds:.0f}s of audio at {args.rate} Hz, {frame}-sample frames\n")
+    print(f"{'speed':<36} {'× realtime':>12} {'CPU %':>8}")
+    print("─" * 58)
+    for name, fn in runs.items():
+        cpu = best_cpu(fn, args.repeat)
+        print(f"{name:<36} {seconds / cpu:>12,.0f} {100 * cpu / seconds:>7.3f}%")
+    
+    print(f"\n{'accuracy':<36} {'found':>6} {'planted':>8}")
+    print("─" * 52)
+    for noise in (0, 200, 600, 1000):
+        found = detect(synthetic_speech(args.rate, args.utterances, noise=noise, seed=1), args.rate)
+        print(f"{f'noise RMS {noise}':<36} {found:>6} {args.utterances:>8}")
+    half = args.utterances // 2
+    stepped = np.concatenate((synthetic_speech(args.rate, half, noise=50, seed=2),
+                              synthetic_speech(args.rate, args.utterances - half, noise=500, seed=3)))
+    print(f"{'noise RMS 50, then 500':<36} {detect(stepped, args.rate):>6} {args.utterances:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Stream parser micro-benchmark
+
+Compares the incremental NDJSONParser / SSEParser against the
+iter_lines() + json.loads loops the clients used before, on synthetic
+Ollama and Anthropic streams. Reports text chunks parsed per second.
+
+Usage:
+    python benchmarks/bench_parsers.py [--events N] [--repeat N]
+"""
+
+import io
+import os
+import sys
+import json
+import argparse
+import timeit
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from jarvis import NDJSONParser, SSEParser  # noqa: E402
+
+
+def legacy_ollama(response):
+    """OllamaClient.chat's loop as it was before NDJSONParser"""
+    for line in response.iter_lines():
+        if line:
+            data = json.loads(line)
+            if 'message' in data and 'content' in data['message']:
+                yield data['message']['content']
+
+
+def legacy_claude(response):
+    """ClaudeClient.chat's loop as it was before SSEParser"""
+    for line in response.iter_lines():
+        if line:
+            text = line.decode('utf-8')
+            if text.startswith('data: '):
+                try:
+                    data = json.loads(text[6:])
+                    kind = data.get('type')
+                    if kind == 'content_block_delta':
+                        delta = data.get('delta', {})
+                        if 'text' in delta:
+                            yield delta['text']
+                    elif kind in ('message_start', 'message_delta'):
+                        pass  # usage bookkeeping
+                except:  # noqa: E722
+                    continue
+
+
+def ollama_stream(events: int) -> bytes:
+    lines = [
+        json.dumps({"model": "dolphin-llama3:8b", "created_at": "2026-01-01T00:00:00.000000Z",
+                    "message": {"role": "assistant", "content": f" token{i}"}, "done": False},
+                   separators=(",", ":"))
+        for i in range(events)
+    ]
+    lines.append(json.dumps({"model": "dolphin-llama3:8b", "message": {"role": "assistant", "content": ""},
+                             "done": True, "done_reason": "stop", "eval_count": events}, separators=(",", ":")))
+    return ("\n".join(lines) + "\n").encode()
+
+
+def claude_stream(events: int) -> bytes:
+    def event(kind, data):
+        return f"event: {kind}\ndata: {json.dumps(dict(data, type=kind), separators=(',', ':'))}\n\n"
+    parts = [event("message_start", {"message": {"usage": {"input_tokens": 100, "output_tokens": 1}}}),
+             event("content_block_start", {"index": 0, "content_block": {"type": "text", "text": ""}})]
+    for i in range(events):
+        parts.append(event("content_block_delta", {"index": 0, "delta": {"type": "text_delta", "text": f" token{i}"}}))
+        if i % 50 == 0:
+            parts.append(event("ping", {}))
+    parts += [event("content_block_stop", {"index": 0}),
+              event("message_delta", {"delta": {"stop_reason": "end_turn"}, "usage": {"output_tokens": events}}),
+              event("message_stop", {})]
+    return "".join(parts).encode()
+
+
+def response_over(body: bytes) -> requests.Response:
+    """A streaming Response reading from memory, as the clients would see it"""
+    response = requests.Response()
+    response.raw = io.BytesIO(body)
+    response.status_code = 200
+    return response
+
+
+def drive(parser_cls, body: bytes, chunk_size: int) -> int:
+    parser = parser_cls()
+    count = 0
+    for data in response_over(body).iter_content(chunk_size=chunk_size):
+        count += len(parser.feed(data))
+    return count
+
+
+def legacy(fn, body: bytes) -> int:
+    return sum(1 for text in fn(response_over(body)) if text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JARVIS stream parser micro-benchmark")
+    parser.add_argument("--events", type=int, default=20000, help="text chunks per stream")
+    parser.add_argument("--repeat", type=int, default=5, help="timing samples (best is reported)")
+    args = parser.parse_args()
+    
+    streams = {
+        "ollama": (ollama_stream(args.events), legacy_ollama, NDJSONParser),
+        "claude": (claude_stream(args.events), legacy_claude, SSEParser),
+    }
+    print(f"{'stream':<8} {'reader':<26} {'chunks/s':>14} {'speedup':>9}")
+    print("─" * 62)
+    for name, (body, legacy_fn, parser_cls) in streams.items():
+        expected = legacy(legacy_fn, body)
+        assert drive(parser_cls, body, 512) == expected, f"{name}: parsers disagree"
+        base = min(timeit.repeat(lambda: legacy(legacy_fn, body), number=1, repeat=args.repeat))
+        print(f"{name:<8} {'iter_lines + json.loads':<26} {expected / base:>14,.0f} {'1.00x':>9}")
+        for chunk_size in (512, 4096, 65536):
+            best = min(timeit.repeat(lambda: drive(parser_cls, body, chunk_size), number=1, repeat=args.repeat))
+            print(f"{name:<8} {f'{parser_cls.__name__} ({chunk_size} B)':<26} "
+                  f"{expected / best:>14,.0f} {base / best:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Routing micro-benchmark
+
+Compares the per-query cost of the compiled RoutingEngine against the
+original keyword-loop determine_routing, on short prompts and on long
+pasted inputs such as multi-KB code blocks.
+
+Usage:
+    python benchmarks/bench_routing.py [--repeat N]
+"""
+
+import os
+import sys
+import argparse
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from jarvis import RoutingEngine  # noqa: E402
+
+
+def legacy_determine_routing(query: str) -> str:
+    """determine_routing as it was before the RoutingEngine"""
+    query_lower = query.lower()
+    cloud_keywords = [
+        'analyze', 'analysis', 'research', 'compare', 'comprehensive',
+        'code review', 'debug', 'optimize', 'architecture', 'design',
+        'strategy', 'business', 'professional', 'technical', 'explain in detail',
+        'investment', 'financial', 'legal', 'medical', 'scientific'
+    ]
+    local_keywords = [
+        'private', 'confidential', 'secret', 'personal', 'between us',
+        'unrestricted', 'uncensored', 'no filter', 'hypothetically',
+        'creative writing', 'roleplay', 'fiction', 'imagine', 'fantasy'
+    ]
+    for kw in local_keywords:
+        if kw in query_lower:
+            return "local"
+    for kw in cloud_keywords:
+        if kw in query_lower:
+            return "cloud"
+    return "local"
+
+
+CODE_BLOCK = '''
+def merge_intervals(intervals):
+    """Merge overlapping [start, end] pairs in place-sorted order."""
+    intervals.sort(key=lambda pair: pair[0])
+    merged = []
+    for start, end in intervals:
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+'''
+
+
+def inputs():
+    """(label, query) pairs from a one-liner up to a 64 KB paste"""
+    yield "short (40 B)", "What's the weather like on Mars today?"
+    for size_kb in (4, 16, 64):
+        body = (CODE_BLOCK * (size_kb * 1024 // len(CODE_BLOCK) + 1))[:size_kb * 1024]
+        # Worst case for the legacy loop: no keyword at all, every substring scan runs to the end
+        yield f"code paste ({size_kb} KB)", "Why is this slow?\n```python" + body + "```"
+        yield f"code paste + keyword ({size_kb} KB)", "Please debug this:\n```python" + body + "```"
+
+
+def bench(fn, query: str, repeat: int) -> float:
+    """Best-of-5 seconds per call"""
+    number = max(1, repeat)
+    return min(timeit.repeat(lambda: fn(query), number=number, repeat=5)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JARVIS routing micro-benchmark")
+    parser.add_argument("--repeat", type=int, default=200, help="calls per timing sample")
+    args = parser.parse_args()
+    
+    engine = RoutingEngine()
+    print(f"{'input':<30} {'legacy':>12} {'engine':>12} {'ratio':>8}  decision")
+    print("─" * 80)
+    for label, query in inputs():
+        legacy = bench(legacy_determine_routing, query, args.repeat)
+        compiled = bench(engine.route, query, args.repeat)
+        decision = engine.route(query)
+        print(f"{label:<30} {legacy * 1e6:>9.1f} µs {compiled * 1e6:>9.1f} µs "
+              f"{legacy / compiled:>7.2f}x  {decision.backend} ({decision.explain()})")
+
+
+if __name__ == "__main__":
+    main()
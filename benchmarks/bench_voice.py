@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Voice output benchmark
+
+Streams an answer from the stand-in Ollama server at model-like speed and
+speaks it through the stand-in ElevenLabs server into audio files, then
+reports time to first audio:
+
+  after      the whole answer, then one TTS request for all of it
+  pipelined  SpeechPipeline fed from the stream, for 1..N synthesis workers
+
+and the time until the last segment was written.
+
+Usage:
+    python benchmarks/bench_voice.py [--sentences N] [--rate N] [--tts-latency S] [--repeat N]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import jarvis  # noqa: E402
+from fake_servers import StreamProfile, serve_ollama, serve_elevenlabs, url  # noqa: E402
+
+SENTENCE = "Power output is holding steady at nominal levels, sir. "
+OUTPUT_FORMAT = "pcm_16000"
+
+
+def run_after(ollama: "jarvis.OllamaClient", tts: "jarvis.ElevenLabsTTS", output: "jarvis.AudioFiles") -> dict:
+    start = time.perf_counter()
+    answer = "".join(ollama.chat([{"role": "user", "content": "status"}], "bench"))
+    output.play(tts.synthesize(answer), tts.extension)
+    first = time.perf_counter() - start
+    return {"first_audio_s": first, "done_s": first, "segments": 1}
+
+
+def run_pipelined(ollama: "jarvis.OllamaClient", tts: "jarvis.ElevenLabsTTS", output: "jarvis.AudioFiles",
+                  workers: int) -> dict:
+    voice = jarvis.SpeechPipeline(tts, output, workers=workers)
+    start = time.perf_counter()
+    for _ in voice.tee(ollama.chat([{"role": "user", "content": "status"}], "bench")):
+        pass
+    voice.close(timeout=60)
+    done = time.perf_counter() - start
+    if voice.errors:
+        raise RuntimeError(voice.last_error)
+    return {"first_audio_s": voice.first_audio, "done_s": done, "segments": voice.spoken}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JARVIS voice output benchmark")
+    parser.add_argument("--sentences", type=int, default=12, help="sentences per answer")
+    parser.add_argument("--rate", type=float, default=4.0, help="sentences generated per second")
+    parser.add_argument("--tts-latency", type=float, default=0.3, help="seconds per TTS request")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="synthesis worker counts")
+    parser.add_argument("--repeat", type=int, default=3, help="samples per measurement (median reported)")
+    args = parser.parse_args()
+    
+    ollama_server = serve_ollama(StreamProfile(tokens=args.sentences, rate=args.rate, token=SENTENCE))
+    tts_server = serve_elevenlabs(StreamProfile(latency=args.tts_latency))
+    ollama = jarvis.OllamaClient(url(ollama_server))
+    tts = jarvis.ElevenLabsTTS("bench", "voice", "bench", OUTPUT_FORMAT)
+    tts.url = url(tts_server, "/v1/text-to-speech")
+    
+    runs = {"after": lambda output: run_after(ollama, tts, output)}
+    for workers in args.workers:
+        runs[f"pipelined ×{workers}"] = lambda output, workers=workers: run_pipelined(ollama, tts, output, workers)
+    
+    print(f"answer: {args.sentences} sentences at {args.rate:g}/s, TTS {args.tts_latency:g}s per request\n")
+    print(f"{'run':<16} {'first audio':>12} {'all audio':>10} {'segments':>9}")
+    print("─" * 50)
+    for name, fn in runs.items():
+        samples = []
+        for _ in range(args.repeat):
+            with tempfile.TemporaryDirectory() as directory:
+                samples.append(fn(jarvis.AudioFiles(directory)))
+        first = statistics.median(s["first_audio_s"] for s in samples)
+        done = statistics.median(s["done_s"] for s in samples)
+        print(f"{name:<16} {first:>11.2f}s {done:>9.2f}s {samples[-1]['segments']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Stand-in Ollama, Anthropic and ElevenLabs servers
+
+Stream canned tokens in the real wire formats (Ollama NDJSON, Anthropic SSE)
+at a configurable rate, so JARVIS's own overhead can be measured without a
+model in the loop. Latency before the first byte, tokens per chunk and error
+injection are configurable too. The ElevenLabs stand-in answers text to
+speech requests with silent pcm_* audio as long as the text would take to say.
+
+bench_jarvis.py runs this script as a child process so that serving doesn't
+compete with the client under test for the GIL. It also works on its own for
+manual testing:
+    python benchmarks/fake_servers.py --ollama-port 11434 --anthropic-port 8089 --rate 40
+then point ClaudeClient.url at http://127.0.0.1:8089/v1/messages and
+ElevenLabsTTS.url at http://127.0.0.1:8090/v1/text-to-speech.
+"""
+
+import json
+import time
+import random
+import argparse
+import threading
+from urllib.parse import parse_qs
+from typing import Optional
+from dataclasses import dataclass
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+@dataclass
+class StreamProfile:
+    """How a fake server answers"""
+    tokens: int = 64             # tokens per answer
+    chunk_tokens: int = 1        # tokens per NDJSON line / SSE delta
+    rate: float = 0.0            # tokens per second, 0 = as fast as possible
+    latency: float = 0.0         # seconds before response headers
+    error_rate: float = 0.0      # chance of an HTTP error instead of an answer
+    error_status: int = 500      # e.g. 429, or 529 for Anthropic's "overloaded"
+    retry_after: float = 0.0     # Retry-After seconds sent with injected errors (0 = no header)
+    drop_rate: float = 0.0       # chance of cutting the stream off half way
+    token: str = "tok "
+    
+    def chunks(self):
+        """Text chunks, paced to the configured rate"""
+        per_chunk = self.chunk_tokens / self.rate if self.rate else 0.0
+        start = time.monotonic()
+        sent = 0
+        while sent < self.tokens:
+            n = min(self.chunk_tokens, self.tokens - sent)
+            if per_chunk:
+                # Pace against the start time so sleep jitter doesn't accumulate
+                delay = start + (sent // self.chunk_tokens + 1) * per_chunk - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            sent += n
+            yield self.token * n
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # small streamed writes would otherwise stall on delayed ACKs
+    
+    def log_message(self, *args):
+        pass
+    
+    @property
+    def profile(self) -> StreamProfile:
+        return self.server.profile
+    
+    def _json(self, status: int, body: dict, headers: Optional[dict] = None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def _read_body(self) -> dict:
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length) if length else b""
+        try:
+            return json.loads(raw or b"{}")
+        except ValueError:
+            return {}
+    
+    def _inject(self) -> bool:
+        """Apply latency and error injection; False if an error was sent instead"""
+        self.server.requests += 1
+        if self.profile.latency:
+            time.sleep(self.profile.latency)
+        if random.random() < self.profile.error_rate:
+            self.server.errors += 1
+            headers = {"Retry-After": f"{self.profile.retry_after:g}"} if self.profile.retry_after else None
+            self._json(self.profile.error_status, {"error": "injected failure"}, headers)
+            return False
+        return True
+    
+    def _start_stream(self, content_type: str) -> bool:
+        """Apply latency and error injection, then send streaming headers; False on an injected error"""
+        if not self._inject():
+            return False
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        return True
+    
+    def _chunk(self, data: bytes):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+    
+    def _stream(self, frames):
+        """Send framed chunks, maybe dropping the connection part way"""
+        drop_at = None
+        if random.random() < self.profile.drop_rate:
+            drop_at = max(1, self.profile.tokens // (2 * self.profile.chunk_tokens))
+        try:
+            for i, frame in enumerate(frames):
+                if drop_at is not None and i == drop_at:
+                    self.server.errors += 1
+                    self.close_connection = True
+                    return
+                self._chunk(frame)
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # client cancelled
+
+
+class FakeOllamaHandler(_Handler):
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._json(200, {"models": [{"name": name} for name in self.server.models]})
+        elif self.path == "/api/ps":
+            self._json(200, {"models": [{"name": name, "size_vram": 0} for name in self.server.models]})
+        else:
+            self._json(404, {"error": "not found"})
+    
+    def do_POST(self):
+        request = self._read_body()
+        if self.path != "/api/chat":
+            self._json(404, {"error": "not found"})
+            return
+        if not self._start_stream("application/x-ndjson"):
+            return
+        model = request.get("model", "")
+        prompt_tokens = len(json.dumps(request.get("messages", []))) // 4
+        
+        def frames():
+            count = 0
+            for text in self.profile.chunks():
+                count += text.count(self.profile.token)
+                yield (json.dumps({"model": model, "message": {"role": "assistant", "content": text},
+                                   "done": False}) + "\n").encode()
+            yield (json.dumps({"model": model, "message": {"role": "assistant", "content": ""},
+                               "done": True, "prompt_eval_count": prompt_tokens,
+                               "eval_count": count}) + "\n").encode()
+        self._stream(frames())
+
+
+class FakeAnthropicHandler(_Handler):
+    def do_POST(self):
+        request = self._read_body()
+        if self.path != "/v1/messages":
+            self._json(404, {"type": "error", "error": {"type": "not_found_error"}})
+            return
+        if not self._start_stream("text/event-stream"):
+            return
+        
+        def event(kind: str, data: dict) -> bytes:
+            return f"event: {kind}\ndata: {json.dumps(dict(data, type=kind))}\n\n".encode()
+        
+        def frames():
+            prompt_tokens = len(json.dumps(request.get("messages", []))) // 4
+            yield event("message_start", {"message": {"model": request.get("model", ""),
+                                                      "usage": {"input_tokens": prompt_tokens,
+                                                                "output_tokens": 1}}})
+            yield event("content_block_start", {"index": 0, "content_block": {"type": "text", "text": ""}})
+            count = 0
+            for text in self.profile.chunks():
+                count += text.count(self.profile.token)
+                yield event("content_block_delta", {"index": 0, "delta": {"type": "text_delta", "text": text}})
+            yield event("content_block_stop", {"index": 0})
+            yield event("message_delta", {"delta": {"stop_reason": "end_turn"}, "usage": {"output_tokens": count}})
+            yield event("message_stop", {})
+        self._stream(frames())
+
+
+class FakeElevenLabsHandler(_Handler):
+    CHARS_PER_SECOND = 15  # roughly how fast text is read out
+    
+    def do_POST(self):
+        request = self._read_body()
+        path, _, query = self.path.partition("?")
+        if not path.startswith("/v1/text-to-speech/"):
+            self._json(404, {"detail": "not found"})
+            return
+        output_format = parse_qs(query).get("output_format", ["mp3_44100_128"])[0]
+        if not output_format.startswith("pcm_"):
+            self._json(422, {"detail": "the fake server only produces pcm_* audio"})
+            return
+        if not self._inject():
+            return
+        rate = int(output_format.split("_")[1])
+        seconds = len(request.get("text", "")) / self.CHARS_PER_SECOND
+        audio = bytes(2 * int(rate * seconds))  # 16-bit mono silence
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/pcm")
+        self.send_header("Content-Length", str(len(audio)))
+        self.end_headers()
+        self.wfile.write(audio)
+
+
+def serve(handler, profile: StreamProfile, port: int = 0, **attrs) -> ThreadingHTTPServer:
+    """Start a server on a daemon thread; port 0 picks a free one"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    server.profile = profile
+    server.requests = server.errors = 0
+    for key, value in attrs.items():
+        setattr(server, key, value)
+    threading.Thread(target=server.serve_forever, name=f"fake-{handler.__name__}", daemon=True).start()
+    return server
+
+
+def serve_ollama(profile: StreamProfile, port: int = 0, models=("dolphin-llama3:8b",)) -> ThreadingHTTPServer:
+    return serve(FakeOllamaHandler, profile, port, models=list(models))
+
+
+def serve_anthropic(profile: StreamProfile, port: int = 0) -> ThreadingHTTPServer:
+    return serve(FakeAnthropicHandler, profile, port)
+
+
+def serve_elevenlabs(profile: StreamProfile, port: int = 0) -> ThreadingHTTPServer:
+    """Only latency and the error settings of the profile apply"""
+    return serve(FakeElevenLabsHandler, profile, port)
+
+
+def url(server: ThreadingHTTPServer, path: str = "") -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in Ollama and Anthropic servers")
+    parser.add_argument("--ollama-port", type=int, default=11434, help="0 picks a free port")
+    parser.add_argument("--anthropic-port", type=int, default=8089, help="0 picks a free port")
+    parser.add_argument("--elevenlabs-port", type=int, default=8090, help="0 picks a free port")
+    parser.add_argument("--tokens", type=int, default=64, help="tokens per answer")
+    parser.add_argument("--chunk-tokens", type=int, default=1, help="tokens per streamed chunk")
+    parser.add_argument("--rate", type=float, default=0.0, help="tokens/second (0 = unthrottled)")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before headers")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests failing")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status of injected failures")
+    parser.add_argument("--retry-after", type=float, default=0.0, help="Retry-After seconds on injected failures")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="fraction of streams cut off half way")
+    args = parser.parse_args()
+    
+    profile = StreamProfile(tokens=args.tokens, chunk_tokens=args.chunk_tokens, rate=args.rate,
+                            latency=args.latency, error_rate=args.error_rate, error_status=args.error_status,
+                            retry_after=args.retry_after, drop_rate=args.drop_rate)
+    ollama = serve_ollama(profile, args.ollama_port)
+    anthropic = serve_anthropic(profile, args.anthropic_port)
+    elevenlabs = serve_elevenlabs(profile, args.elevenlabs_port)
+    print(f"Ollama     {url(ollama)}", flush=True)
+    print(f"Anthropic  {url(anthropic, '/v1/messages')}", flush=True)
+    print(f"ElevenLabs {url(elevenlabs, '/v1/text-to-speech')}", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
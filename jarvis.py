@@ -20,31 +20,31 @@ import os
 import sys
 import time
 import json
-import requests
+import signal
+import socket
+import random
+import asyncio
 import threading
 import textwrap
 import shutil
+import contextlib
+from collections import deque, OrderedDict
+import sqlite3
+import hashlib
+import functools
+import bisect
+import re
 from enum import Enum
-from typing import Optional, List, Dict, Generator, Tuple
+from typing import Optional, List, Dict, Generator, Tuple, Callable, Union, Iterator, AsyncGenerator
 from dataclasses import dataclass, field
 from datetime import datetime
+from importlib.util import find_spec
 
-# Rich library for beautiful terminal output
-try:
-    from rich.console import Console
-    from rich.panel import Panel
-    from rich.text import Text
-    from rich.table import Table
-    from rich.progress import Progress, SpinnerColumn, TextColumn
-    from rich.live import Live
-    from rich.markdown import Markdown
-    from rich.syntax import Syntax
-    from rich.style import Style
-    from rich.align import Align
-    from rich import box
-    RICH_AVAILABLE = True
-except ImportError:
-    RICH_AVAILABLE = False
+# Rich library for beautiful terminal output. Importing it costs more than the
+# rest of startup combined, so it's loaded by load_rich() on first UI use.
+RICH_AVAILABLE = find_spec("rich") is not None
+NUMPY_AVAILABLE = find_spec("numpy") is not None  # semantic memory
+PSUTIL_AVAILABLE = find_spec("psutil") is not None  # host load, for latency-aware routing
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -63,15 +63,104 @@ class Config:
     
     # Ollama
     ollama_host: str = "http://localhost:11434"
+    ollama_hosts: List[str] = field(default_factory=list)  # more Ollama servers to spread local requests over
     ollama_model: str = "dolphin-llama3:8b"
+    ollama_keep_alive: str = "30m"    # how long Ollama keeps the model loaded after a call ("-1" = forever)
+    ollama_options: Dict = field(default_factory=dict)  # e.g. {"num_ctx": 8192, "num_thread": 8}
+    ollama_preload: bool = True       # load the model in the background at startup / on switch
+    ollama_ctx_min: int = 4096        # num_ctx to start from; it doubles as prompts need it
+    ollama_ctx_max: int = 32768       # num_ctx never grows past this; longer prompts go to cloud (auto mode)
+    ollama_answer_tokens: int = 2048  # room kept for the answer when sizing num_ctx
     
     # Claude
     claude_model: str = "claude-sonnet-4-5-20250929"
+    claude_prompt_cache: bool = True  # cache_control breakpoints on system + history
+    claude_context: int = 200000      # context window in tokens
+    claude_max_tokens: int = 4096     # answer limit, lowered when the prompt leaves less room
+    
+    # HTTP transport (shared keep-alive pools)
+    http_pool_connections: int = 10   # distinct hosts kept pooled
+    http_pool_maxsize: int = 8        # sockets kept alive per host
+    http_connect_timeout: float = 3.05
+    http_read_timeout: float = 120.0
+    
+    # Health monitor
+    health_ttl: float = 15.0          # seconds a cached backend status stays fresh
+    
+    # Retries and circuit breakers (both backends)
+    retry_attempts: int = 3           # tries per request, as long as no text has streamed yet
+    retry_base_delay: float = 0.5     # seconds; the jittered backoff window doubles per retry
+    retry_max_delay: float = 8.0      # a longer retry-after than this fails over instead of waiting
+    breaker_threshold: int = 2        # failed turns in a row before routing skips a backend
+    breaker_cooldown: float = 30.0    # seconds skipped before it's tried again (doubles while failing)
+    
+    # History window (approximate tokens per backend)
+    history_budget_local: int = 3000
+    history_budget_cloud: int = 24000
+    history_keep_turns: int = 2       # most recent turns always sent verbatim
+    
+    # Response cache (SQLite, LRU + TTL)
+    response_cache_path: str = field(default_factory=lambda: os.path.expanduser("~/.jarvis/response_cache.db"))
+    response_cache_modes: Tuple[str, ...] = ("auto", "cloud")  # leave "local" out for privacy
+    response_cache_ttl: float = 7 * 24 * 3600
+    response_cache_max_entries: int = 2000
+    response_cache_max_mb: float = 32.0
+    
+    # Session store (SQLite log of every interactive conversation; "" disables)
+    session_store_path: str = field(default_factory=lambda: os.path.expanduser("~/.jarvis/sessions.db"))
+    session_compact_after_days: float = 30.0  # fold older sessions down to summary + last turns
+    
+    # Semantic memory (past exchanges embedded by Ollama, needs numpy)
+    memory_enabled: bool = True
+    memory_model: str = "nomic-embed-text"
+    memory_dir: str = field(default_factory=lambda: os.path.expanduser("~/.jarvis/memory"))
+    memory_top_k: int = 3
+    memory_min_score: float = 0.55    # cosine similarity below this isn't worth the tokens
+    memory_budget: int = 600          # tokens of retrieved text per prompt
+    memory_timeout: float = 0.5       # seconds to wait for the query embedding before skipping
+    memory_batch: int = 16            # exchanges per embedding request
     
     # UI
     typing_speed: float = 0.01
     animate_startup: bool = True
     show_thinking: bool = True
+    render_fps: float = 15.0          # max repaints per second while streaming
+    render_markdown: bool = True
+    
+    # Routing (keyword → weight overrides; 0 disables a keyword)
+    routing_local_weights: Dict[str, float] = field(default_factory=dict)
+    routing_cloud_weights: Dict[str, float] = field(default_factory=dict)
+    routing_latency_aware: bool = True  # when keywords tie, pick the backend expected to finish first
+    routing_local_parallel: int = 1     # requests Ollama runs at once (its OLLAMA_NUM_PARALLEL)
+    
+    # Hedged requests (auto mode): race the other backend if no token by the deadline
+    hedge_deadline: float = 0.0       # seconds; 0 disables hedging
+    hedge_log_path: str = field(default_factory=lambda: os.path.expanduser("~/.jarvis/hedge_log.jsonl"))
+    
+    # Metrics ("" disables a file)
+    metrics_log_path: str = field(default_factory=lambda: os.path.expanduser("~/.jarvis/turns.jsonl"))
+    metrics_prom_path: str = field(default_factory=lambda: os.path.expanduser("~/.jarvis/metrics.prom"))
+    
+    # Voice output (--voice / `voice on`): answers are spoken sentence by sentence as they stream
+    voice_enabled: bool = False
+    voice_id: str = "JBFqnCBsd6RMkjVDRZzb"   # ElevenLabs voice ("George")
+    voice_model: str = "eleven_flash_v2_5"  # ElevenLabs' lowest-latency model
+    voice_format: str = "mp3_44100_128"     # pcm_16000, pcm_24000, ... play without ffmpeg
+    voice_workers: int = 2                  # sentences synthesized at once
+    voice_queue: int = 8                    # sentences waiting for synthesis before new ones are merged in
+    voice_output_dir: str = ""              # write numbered audio files here instead of playing them
+    
+    # Voice input (--listen): an energy / zero-crossing detector cuts speech into utterances
+    listen_rate: int = 16000          # microphone and raw stdin sample rate (WAV files carry their own)
+    listen_frame_ms: int = 20         # detector frame
+    listen_end_ms: int = 500          # silence that ends an utterance (the endpointing delay)
+    listen_min_speech_ms: int = 250   # shorter bursts are dropped as noise
+    listen_ratio: float = 3.0         # speech energy over the running noise floor
+    listen_engine: str = "google"     # SpeechRecognition recognizer: google, whisper, sphinx, ...
+    listen_language: str = "en-US"    # passed to the recognizer ("" for its default)
+    
+    # Profiling (--profile / `profile on`): one Chrome trace-event file per turn
+    profile_dir: str = field(default_factory=lambda: os.path.expanduser("~/.jarvis/traces"))
     
     # Mode
     mode: str = "auto"  # auto, local, cloud
@@ -103,19 +192,39 @@ class Theme:
     DIM = "dim white"
     
     # Styles
-    HEADER_STYLE = Style(color="cyan", bold=True)
-    SUBHEADER_STYLE = Style(color="yellow")
-    TEXT_STYLE = Style(color="white")
-    DIM_STYLE = Style(color="bright_black")
-    SUCCESS_STYLE = Style(color="green", bold=True)
-    ERROR_STYLE = Style(color="red", bold=True)
+    HEADER_STYLE = "bold cyan"
+    SUBHEADER_STYLE = "yellow"
+    TEXT_STYLE = "white"
+    DIM_STYLE = "bright_black"
+    SUCCESS_STYLE = "bold green"
+    ERROR_STYLE = "bold red"
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # CONSOLE SETUP
 # ═══════════════════════════════════════════════════════════════════════════════
 
-console = Console() if RICH_AVAILABLE else None
+console = None
+
+
+def load_rich() -> bool:
+    """Import Rich and create the console on first use; returns RICH_AVAILABLE"""
+    global console, Console, Panel, Text, Table, Progress, SpinnerColumn, TextColumn
+    global Live, Markdown, Syntax, Align, box
+    if console is not None or not RICH_AVAILABLE:
+        return RICH_AVAILABLE
+    from rich.console import Console
+    from rich.panel import Panel
+    from rich.text import Text
+    from rich.table import Table
+    from rich.progress import Progress, SpinnerColumn, TextColumn
+    from rich.live import Live
+    from rich.markdown import Markdown
+    from rich.syntax import Syntax
+    from rich.align import Align
+    from rich import box
+    console = Console()
+    return True
 
 
 def get_terminal_width() -> int:
@@ -165,6 +274,7 @@ def clear_screen():
 
 def print_centered(text: str, style: str = "cyan"):
     """Print text centered in terminal"""
+    load_rich()
     width = get_terminal_width()
     for line in text.split('\n'):
         padding = (width - len(line)) // 2
@@ -176,6 +286,7 @@ def print_centered(text: str, style: str = "cyan"):
 
 def animate_startup():
     """Beautiful startup animation"""
+    load_rich()
     clear_screen()
     
     if not RICH_AVAILABLE:
@@ -237,6 +348,7 @@ def animate_startup():
 
 def display_header():
     """Display compact header for ongoing session"""
+    load_rich()
     if not RICH_AVAILABLE:
         print("\n═══ JARVIS v3.0 ═══\n")
         return
@@ -258,14 +370,22 @@ def display_header():
 # SYSTEM STATUS DISPLAY
 # ═══════════════════════════════════════════════════════════════════════════════
 
-def display_status(ollama_status: bool, claude_status: bool, ollama_models: List[str], mode: str):
-    """Display beautiful system status"""
+def display_status(ollama_status: bool, claude_status: bool, ollama_models: List[str], mode: str,
+                   extra_rows: Optional[List[Tuple[str, str, str]]] = None):
+    """Display beautiful system status
+    
+    extra_rows are (component, status, details) triples appended below the core rows.
+    """
+    extra_rows = extra_rows or []
+    load_rich()
     
     if not RICH_AVAILABLE:
         print("\n── System Status ──")
         print(f"  {'✓' if ollama_status else '✗'} Local (Ollama): {'Online' if ollama_status else 'Offline'}")
         print(f"  {'✓' if claude_status else '✗'} Cloud (Claude): {'Configured' if claude_status else 'Not configured'}")
         print(f"  ► Mode: {mode.upper()}")
+        for component, status, details in extra_rows:
+            print(f"  · {component}: {status} {details}".rstrip())
         print()
         return
     
@@ -314,6 +434,9 @@ def display_status(ollama_status: bool, claude_status: bool, ollama_models: List
     
     table.add_row("Active Mode", mode_display, "Intelligent routing" if mode == "auto" else "")
     
+    for component, status, details in extra_rows:
+        table.add_row(component, status, details)
+    
     console.print()
     console.print(Align.center(table))
     console.print()
@@ -363,298 +486,4411 @@ CONTEXT:
 
 Be helpful, intelligent, and efficient. Skip unnecessary preamble."""
 
+SUMMARY_PROMPT = """You maintain the running memory of a conversation between Carlos and JARVIS.
+
+Merge the new exchanges into the existing summary. Keep facts, decisions, names,
+numbers and open questions. Drop greetings and filler. Write terse third-person
+notes, no more than 200 words. Reply with the updated summary only."""
+
+
+MODE_INDICATORS = {
+    "local": "[yellow]⚡[/] ",
+    "cloud": "[cyan]☁[/] ",
+}
+
+
+def summary_section(summary: str) -> str:
+    """System prompt section carrying the running conversation summary"""
+    return f"EARLIER CONVERSATION (summary):\n{summary}" if summary else ""
+
+
+def with_summary(system: str, summary: str) -> str:
+    """Append the running conversation summary to a system prompt"""
+    if not summary:
+        return system
+    return f"{system}\n\n{summary_section(summary)}"
+
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # AUTO-ROUTING LOGIC
 # ═══════════════════════════════════════════════════════════════════════════════
 
-def determine_routing(query: str) -> str:
-    """Determine whether to use local or cloud based on query"""
-    query_lower = query.lower()
+# Cloud indicators (complex reasoning, professional tasks) → weight of evidence
+CLOUD_KEYWORDS: Dict[str, float] = {
+    'analyze': 1.0, 'analyzing': 1.0, 'analysis': 1.0, 'research': 1.0,
+    'compare': 1.0, 'comparison': 1.0, 'comprehensive': 1.0,
+    'code review': 1.5, 'debug': 1.5, 'debugging': 1.5, 'optimize': 1.0,
+    'architecture': 1.0, 'design': 0.5, 'strategy': 1.0, 'business': 1.0,
+    'professional': 0.5, 'technical': 0.5, 'explain in detail': 1.5,
+    'investment': 1.0, 'financial': 1.0, 'legal': 1.0, 'medical': 1.0, 'scientific': 1.0,
+}
+
+# Local indicators (unrestricted content) → weight of evidence
+LOCAL_KEYWORDS: Dict[str, float] = {
+    'unrestricted': 3.0, 'uncensored': 3.0, 'no filter': 3.0, 'hypothetically': 1.0,
+    'creative writing': 1.5, 'roleplay': 2.0, 'fiction': 1.0, 'imagine': 0.5, 'fantasy': 1.0,
+}
+
+# Privacy indicators always force local, whatever the scores say
+PRIVACY_KEYWORDS = ('private', 'confidential', 'secret', 'personal', 'between us')
+
+
+@dataclass
+class RoutingDecision:
+    """Routing outcome plus the evidence behind it"""
+    backend: str
+    local_score: float = 0.0
+    cloud_score: float = 0.0
+    features: List[Tuple[str, str, float]] = field(default_factory=list)  # (side, keyword, weight)
+    private: bool = False
+    estimates: Dict[str, float] = field(default_factory=dict)  # expected seconds, when latency decided
+    load_notes: str = ""
+    oversized: str = ""   # why the prompt can't go to local, when its size decided
+    
+    def explain(self) -> str:
+        matched = ", ".join(f"{kw}→{side}" for side, kw, _ in self.features)
+        if self.oversized:
+            return self.oversized + (f"; keywords ({matched})" if matched else "")
+        if self.estimates:
+            other = next(b for b in self.estimates if b != self.backend)
+            reason = (f"faster: {self.backend} ~{self.estimates[self.backend]:.1f}s "
+                      f"vs {other} ~{self.estimates[other]:.1f}s")
+            if self.load_notes:
+                reason += f" ({self.load_notes})"
+            return reason + (f"; keywords tied ({matched})" if matched else "")
+        if not self.features:
+            return "no signals, default local" + (f" ({self.load_notes})" if self.load_notes else "")
+        reason = "privacy" if self.private else f"local {self.local_score:g} vs cloud {self.cloud_score:g}"
+        return f"{reason} ({matched})"
+
+
+def _keyword_trie_pattern(keywords: List[str]) -> str:
+    """Alternation with shared prefixes factored out, so the regex walks a trie"""
+    trie: Dict = {}
+    for kw in keywords:
+        node = trie
+        for char in kw:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    
+    def render(node: Dict) -> str:
+        branches = []
+        optional = "" in node
+        for char, child in sorted(node.items()):
+            if char:
+                token = r"\s+" if char == " " else re.escape(char)
+                branches.append(token + render(child))
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if optional:
+            body = "(?:" + body + ")?" if len(branches) == 1 else body + "?"
+        return body
+    
+    return render(trie)
+
+
+# Byte map for cutting text into ASCII words: letters (lowercased), digits and "_"
+# stay, every other byte (UTF-8 sequences included) becomes a space
+_ASCII_WORDS = bytes(
+    (c | 0x20 if chr(c).isupper() else c) if chr(c).isalnum() or c == 0x5F else 0x20
+    for c in range(128)
+) + b" " * 128
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+class RoutingEngine:
+    """Scores a query for local vs cloud with keyword sets compiled once
+    
+    Keywords only match as whole words ("design" no longer hits "designated"),
+    each distinct keyword counts once, and the side with more weight wins.
+    Any privacy keyword vetoes the cloud outright.
     
-    # Cloud indicators (complex reasoning, professional tasks)
-    cloud_keywords = [
-        'analyze', 'analysis', 'research', 'compare', 'comprehensive',
-        'code review', 'debug', 'optimize', 'architecture', 'design',
-        'strategy', 'business', 'professional', 'technical', 'explain in detail',
-        'investment', 'financial', 'legal', 'medical', 'scientific'
-    ]
+    The query is cut into ASCII words in one pass (bytes.translate and split,
+    both in C) and intersected with the keywords' lead words, so the cost is
+    one scan however many keywords there are; the old loop scanned the text
+    once per keyword. A one-word keyword is confirmed by that hit alone.
+    Phrases, keywords with punctuation and non-ASCII queries (where a word
+    character is more than ASCII) are confirmed by a trie regex, run only for
+    the lead words found.
+    """
     
-    # Local indicators (privacy, unrestricted content)
-    local_keywords = [
-        'private', 'confidential', 'secret', 'personal', 'between us',
-        'unrestricted', 'uncensored', 'no filter', 'hypothetically',
-        'creative writing', 'roleplay', 'fiction', 'imagine', 'fantasy'
-    ]
+    def __init__(self, local_weights: Optional[Dict[str, float]] = None,
+                 cloud_weights: Optional[Dict[str, float]] = None,
+                 privacy_keywords: Tuple[str, ...] = PRIVACY_KEYWORDS,
+                 default: str = "local"):
+        self.default = default
+        self.weights: Dict[str, Tuple[str, float]] = {}
+        for kw, weight in {**CLOUD_KEYWORDS, **(cloud_weights or {})}.items():
+            if weight:
+                self.weights[" ".join(kw.lower().split())] = ("cloud", weight)
+        for kw, weight in {**LOCAL_KEYWORDS, **(local_weights or {})}.items():
+            if weight:
+                self.weights[" ".join(kw.lower().split())] = ("local", weight)
+        for kw in privacy_keywords:
+            self.weights[" ".join(kw.lower().split())] = ("privacy", 0.0)
+        self._rank = {kw: i for i, kw in enumerate(self.weights)}  # features keep keyword order
+        
+        # Index every keyword under its first ASCII word ("c++" under "c", "between us" under "between")
+        self._exact: Dict[bytes, str] = {}  # one-word keywords, confirmed by the word itself
+        phrases: Dict[bytes, List[str]] = {}
+        every: Dict[bytes, List[str]] = {}
+        unanchored: List[str] = []  # no ASCII word at all: always tried
+        for kw in self.weights:
+            words = kw.encode().translate(_ASCII_WORDS).split()
+            if not words:
+                unanchored.append(kw)
+                continue
+            every.setdefault(words[0], []).append(kw)
+            if kw.encode() == words[0]:
+                self._exact[words[0]] = kw
+            else:
+                phrases.setdefault(words[0], []).append(kw)
+        self._leads = frozenset(every)
+        self._phrases = {lead: self._compile(kws) for lead, kws in phrases.items()}
+        self._every = {lead: self._compile(kws) for lead, kws in every.items()}
+        self._unanchored = self._compile(unanchored) if unanchored else None
     
-    for kw in local_keywords:
-        if kw in query_lower:
-            return "local"
+    @staticmethod
+    def _compile(keywords: List[str]) -> "re.Pattern":
+        # Lookahead rather than \b, so a keyword ending in punctuation ("c++") can match
+        return re.compile(_keyword_trie_pattern(keywords) + r"(?!\w)")
     
-    for kw in cloud_keywords:
-        if kw in query_lower:
-            return "cloud"
+    @staticmethod
+    def _matches(pattern: "re.Pattern", text: str) -> Iterator[str]:
+        for match in pattern.finditer(text):
+            start, found = match.start(), match.group()
+            if start and _is_word_char(found[0]) and _is_word_char(text[start - 1]):
+                continue  # inside a longer word
+            yield " ".join(found.split())
     
-    # Default to local for privacy
-    return "local"
+    def route(self, query: str) -> RoutingDecision:
+        decision = RoutingDecision(self.default)
+        ascii_only = query.isascii()
+        text = query if ascii_only else query.lower()
+        found = self._leads.intersection(text.encode().translate(_ASCII_WORDS).split())
+        if not found and self._unanchored is None:
+            return decision
+        
+        hits: List[str] = []
+        patterns = self._phrases if ascii_only else self._every
+        for lead in found:
+            if ascii_only and lead in self._exact:
+                hits.append(self._exact[lead])
+            if lead in patterns:
+                text = text.lower()
+                hits.extend(self._matches(patterns[lead], text))
+        if self._unanchored is not None:
+            hits.extend(self._matches(self._unanchored, text.lower()))
+        
+        for kw in sorted(set(hits), key=self._rank.__getitem__):
+            side, weight = self.weights[kw]
+            decision.features.append((side, kw, weight))
+            if side == "privacy":
+                decision.private = True
+            elif side == "local":
+                decision.local_score += weight
+            else:
+                decision.cloud_score += weight
+        
+        if decision.private:
+            decision.backend = "local"
+        elif decision.cloud_score > decision.local_score:
+            decision.backend = "cloud"
+        elif decision.local_score > decision.cloud_score:
+            decision.backend = "local"
+        return decision
+
+
+_default_router: Optional[RoutingEngine] = None
+
+
+def determine_routing(query: str) -> str:
+    """Determine whether to use local or cloud based on query"""
+    global _default_router
+    if _default_router is None:
+        _default_router = RoutingEngine()
+    return _default_router.route(query).backend
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
-# OLLAMA CLIENT
+# STREAM CHUNKS
 # ═══════════════════════════════════════════════════════════════════════════════
 
-class OllamaClient:
-    """Local AI via Ollama"""
+class Notice(str):
+    """Chunk text from JARVIS itself (Rich markup), not model output"""
+
+
+class StreamError(Notice):
+    """Chunk text that reports a backend failure rather than model output"""
+    retry_after: Optional[float] = None  # seconds the backend asked us to back off for, if it said
     
-    def __init__(self, host: str = "http://localhost:11434"):
-        self.host = host
-        self.available = False
-        self.models: List[str] = []
+    @classmethod
+    def from_exception(cls, e: Exception) -> "StreamError":
+        error = cls(f"[{e}]" if isinstance(e, BackendError) else f"[Error: {e}]")
+        error.retry_after = getattr(e, "retry_after", None)
+        return error
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# PROFILING
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class _Span:
+    __slots__ = ("profiler", "name", "args", "start")
     
-    def check_status(self) -> bool:
-        """Check if Ollama is running"""
+    def __init__(self, profiler: "Profiler", name: str, args: Dict):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+    
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter(), self.args)
+
+
+class Profiler:
+    """Records timed spans as Chrome trace events and writes one trace per turn
+    
+    Off by default, when span() costs a flag check. Turned on by --profile or
+    `profile on`; every turn is then saved to trace_dir as trace-event JSON
+    (open it in ui.perfetto.dev or chrome://tracing). Spans from background
+    threads (stream pumps, health probes) land on their own rows. Optionally
+    each turn also runs under cProfile (the main thread only, saved as a
+    .pstats file next to the trace) and tracemalloc (top allocation growth).
+    """
+    
+    MAX_EVENTS = 200000   # events kept between writes, oldest dropped first
+    TOP = 15              # cProfile functions and tracemalloc lines listed in a trace
+    
+    def __init__(self, trace_dir: str = ""):
+        self.enabled = False
+        self.cpu = False
+        self.memory = False
+        self.trace_dir = trace_dir
+        self.last_path = ""
+        self.written = 0
+        self._events: deque = deque(maxlen=self.MAX_EVENTS)
+        self._threads: Dict[int, str] = {}
+        self._origin = time.perf_counter()
+        self._null = contextlib.nullcontext()
+    
+    def start(self, cpu: bool = False, memory: bool = False):
+        self.cpu, self.memory = cpu, memory
+        self._events.clear()
+        self.enabled = True
+    
+    def stop(self):
+        self.enabled = False
+        if self.memory:
+            import tracemalloc
+            tracemalloc.stop()
+            self.memory = False
+    
+    def describe(self) -> str:
+        extras = [name for name, on in (("cpu", self.cpu), ("memory", self.memory)) if on]
+        return "on" + (f" ({', '.join(extras)})" if extras else "") if self.enabled else "off"
+    
+    def span(self, name: str, **args):
+        """Context manager timing a block as one trace event"""
+        if not self.enabled:
+            return self._null
+        return _Span(self, name, args)
+    
+    def record(self, name: str, start: float, end: float, args: Optional[Dict] = None):
+        """Add a finished span (perf_counter times)"""
+        thread = threading.current_thread()
+        self._threads.setdefault(thread.ident, thread.name)
+        event = {"name": name, "ph": "X", "ts": (start - self._origin) * 1e6, "dur": (end - start) * 1e6,
+                 "pid": os.getpid(), "tid": thread.ident}
+        if args:
+            event["args"] = args
+        self._events.append(event)
+    
+    @contextlib.contextmanager
+    def turn(self, label: str, **args):
+        """Profile one turn and write its trace once it ends"""
+        if not self.enabled:
+            yield
+            return
+        profile = snapshot = None
+        if self.cpu:
+            import cProfile
+            profile = cProfile.Profile()
+        if self.memory:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            snapshot = tracemalloc.take_snapshot()
+            self._memory_counter()
+        if profile:
+            profile.enable()
         try:
-            r = requests.get(f"{self.host}/api/tags", timeout=2)
-            if r.status_code == 200:
-                data = r.json()
-                self.models = [m['name'] for m in data.get('models', [])]
-                self.available = True
-                return True
-        except:
-            pass
-        self.available = False
-        return False
+            with self.span(label, **args):
+                yield
+        finally:
+            if profile:
+                profile.disable()
+            self.last_path = self._write(label, profile, snapshot)
+    
+    def _memory_counter(self):
+        import tracemalloc
+        current, peak = tracemalloc.get_traced_memory()
+        self._events.append({"name": "python heap", "ph": "C", "ts": (time.perf_counter() - self._origin) * 1e6,
+                             "pid": os.getpid(), "args": {"current MB": current / 2 ** 20, "peak MB": peak / 2 ** 20}})
     
-    def chat(self, messages: List[Dict], model: str) -> Generator[str, None, None]:
-        """Stream chat completion"""
+    def _write(self, label: str, profile, snapshot) -> str:
+        if not self.trace_dir:
+            return ""
+        self.written += 1
+        base = os.path.join(self.trace_dir, f"{datetime.now():%Y%m%d-%H%M%S}-{self.written:03d}-{label}")
+        other: Dict = {"label": label}
         try:
-            r = requests.post(
-                f"{self.host}/api/chat",
-                json={"model": model, "messages": messages, "stream": True},
-                stream=True,
-                timeout=120
-            )
-            for line in r.iter_lines():
-                if line:
-                    data = json.loads(line)
-                    if 'message' in data and 'content' in data['message']:
-                        yield data['message']['content']
-                    if data.get('done'):
-                        break
-        except Exception as e:
-            yield f"[Error: {str(e)}]"
+            os.makedirs(self.trace_dir, exist_ok=True)
+            if profile is not None:
+                import io
+                import pstats
+                profile.dump_stats(base + ".pstats")
+                out = io.StringIO()
+                pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(self.TOP)
+                other["cprofile"] = out.getvalue().strip().splitlines()
+            import tracemalloc
+            if snapshot is not None and tracemalloc.is_tracing():  # `profile off` mid-turn stops it
+                self._memory_counter()
+                growth = tracemalloc.take_snapshot().compare_to(snapshot, "lineno")[:self.TOP]
+                other["tracemalloc"] = [str(stat) for stat in growth]
+            events = list(self._events)
+            self._events.clear()
+            pid = os.getpid()
+            names = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                     for tid, name in list(self._threads.items())]
+            with open(base + ".json", "w", encoding="utf-8") as f:
+                json.dump({"traceEvents": names + events, "displayTimeUnit": "ms", "otherData": other}, f)
+        except OSError:
+            return ""
+        return base + ".json"
+
+
+PROFILER = Profiler()
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
-# CLAUDE CLIENT
+# STREAM RENDERING
 # ═══════════════════════════════════════════════════════════════════════════════
 
-class ClaudeClient:
-    """Cloud AI via Claude API"""
+FENCE_MARKERS = ("```", "~~~")
+
+
+def split_finished_blocks(text: str) -> Tuple[List[str], str]:
+    """Split streamed Markdown into blocks that can no longer change and the open tail
     
-    def __init__(self, api_key: str):
-        self.api_key = api_key
-        self.available = bool(api_key)
-        self.url = "https://api.anthropic.com/v1/messages"
+    A block is finished at a blank line outside a code fence, or when its
+    closing fence arrives. The trailing partial line always stays in the tail.
+    """
+    blocks = []
+    block_start = offset = 0
+    in_fence = False
+    for line in text.split("\n")[:-1]:
+        end = offset + len(line) + 1
+        stripped = line.strip()
+        if stripped.startswith(FENCE_MARKERS):
+            if in_fence:
+                blocks.append(text[block_start:end])
+                block_start = end
+            else:
+                if text[block_start:offset].strip():
+                    blocks.append(text[block_start:offset])
+                block_start = offset
+            in_fence = not in_fence
+        elif not in_fence and not stripped and text[block_start:offset].strip():
+            blocks.append(text[block_start:end])
+            block_start = end
+        offset = end
+    return blocks, text[block_start:]
+
+
+class StreamRenderer:
+    """Renders streamed model output at a bounded frame rate
     
-    def chat(self, messages: List[Dict], model: str, system: str = "") -> Generator[str, None, None]:
-        """Stream chat completion"""
-        if not self.api_key:
-            yield "[Error: API key not configured]"
+    Chunks are buffered and repainted through rich.live.Live at most `fps`
+    times per second. Finished Markdown blocks and code blocks are printed
+    once and frozen, so only the open tail is laid out again on each frame.
+    Without a terminal, text is written straight through.
+    """
+    
+    def __init__(self, fps: float = 15.0, markdown: bool = True):
+        self.interval = 1.0 / fps if fps > 0 else 0.0
+        self.markdown = markdown
+        self.plain = not load_rich() or not console.is_terminal
+        self._tail: List[str] = []
+        self._live = None
+        self._last_paint = 0.0
+        self._dirty = False
+    
+    def __enter__(self) -> "StreamRenderer":
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def feed(self, chunk: str):
+        if isinstance(chunk, Notice):
+            self._notice(chunk)
+        elif self.plain:
+            sys.stdout.write(chunk)
+        elif chunk:
+            self._tail.append(chunk)
+            self._dirty = True
+            if time.monotonic() - self._last_paint >= self.interval:
+                self._paint()
+    
+    def close(self):
+        if self.plain:
+            sys.stdout.flush()
             return
-        
-        try:
-            headers = {
-                "Content-Type": "application/json",
-                "x-api-key": self.api_key,
-                "anthropic-version": "2023-06-01"
-            }
-            
-            payload = {
-                "model": model,
-                "max_tokens": 4096,
-                "messages": messages,
-                "stream": True
-            }
-            if system:
-                payload["system"] = system
-            
-            r = requests.post(self.url, headers=headers, json=payload, stream=True, timeout=120)
-            
-            if r.status_code != 200:
-                yield f"[API Error: {r.status_code}]"
-                return
+        if self._dirty:
+            self._paint(final=True)
+        if self._live:
+            self._live.stop()
+            self._live = None
+    
+    def _notice(self, chunk: Notice):
+        if not RICH_AVAILABLE:
+            sys.stdout.write(chunk)
+            return
+        text = Text(chunk, style="red") if isinstance(chunk, StreamError) else Text.from_markup(chunk)
+        if self.plain:
+            sys.stdout.write(text.plain)
+        elif self._live:
+            # Keep the notice after the text that preceded it
+            if self._dirty or self._tail:
+                self._paint(final=True)
+            self._live.console.print(text)
+        else:
+            console.print(text, end="")
+    
+    def _paint(self, final: bool = False):
+        with PROFILER.span("render", final=final):
+            text = "".join(self._tail)
+            if final:
+                blocks, tail = [text], ""
+            else:
+                blocks, tail = split_finished_blocks(text)
+            self._tail = [tail] if tail else []
             
-            for line in r.iter_lines():
-                if line:
-                    text = line.decode('utf-8')
-                    if text.startswith('data: '):
-                        try:
-                            data = json.loads(text[6:])
-                            if data.get('type') == 'content_block_delta':
-                                delta = data.get('delta', {})
-                                if 'text' in delta:
-                                    yield delta['text']
-                        except:
-                            continue
-        except Exception as e:
-            yield f"[Error: {str(e)}]"
+            if self._live is None:
+                console.print()
+                self._live = Live(console=console, auto_refresh=False, vertical_overflow="visible")
+                self._live.start()
+            for block in blocks:
+                if block.strip():
+                    self._live.console.print(self._render(block))
+            self._live.update(self._render(tail) if tail.strip() else Text(""), refresh=True)
+            self._last_paint = time.monotonic()
+            self._dirty = False
+    
+    def _render(self, block: str):
+        if not self.markdown:
+            return Text(block)
+        stripped = block.lstrip()
+        if stripped.startswith(FENCE_MARKERS):
+            header, _, body = stripped.partition("\n")
+            language = header.strip("`~ ").split()[0] if header.strip("`~ ") else "text"
+            code = body.rstrip()
+            for marker in FENCE_MARKERS:
+                if code.endswith(marker):
+                    code = code[: -len(marker)].rstrip()
+            return Syntax(code, language, theme="monokai", word_wrap=True)
+        return Markdown(block)
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
-# JARVIS CORE
+# HTTP TRANSPORT
 # ═══════════════════════════════════════════════════════════════════════════════
 
-class Jarvis:
-    """Main JARVIS System"""
+class HTTPTransport:
+    """Shared keep-alive HTTP layer used by every backend client
+    
+    requests is imported when the first request goes out, which at startup
+    happens on the health monitor's thread rather than the main one.
+    """
+    
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 8,
+                 connect_timeout: float = 3.05, read_timeout: float = 120.0):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._session = None
+        self._adapter = None
+        self._lock = threading.Lock()
+    
+    @property
+    def session(self):
+        """requests.Session with one urllib3 pool per host, each holding up to pool_maxsize sockets"""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+                    self._adapter = HTTPAdapter(
+                        pool_connections=self.pool_connections,
+                        pool_maxsize=self.pool_maxsize,
+                        max_retries=0,
+                    )
+                    session = requests.Session()
+                    session.mount("http://", self._adapter)
+                    session.mount("https://", self._adapter)
+                    self._session = session
+        return self._session
+    
+    def timeout(self, read: Optional[float] = None) -> Tuple[float, float]:
+        """(connect, read) timeout pair"""
+        return (self.connect_timeout, self.read_timeout if read is None else read)
+    
+    def get(self, url: str, read_timeout: Optional[float] = None, **kwargs) -> "requests.Response":
+        with PROFILER.span("http get", url=url):
+            return self.session.get(url, timeout=self.timeout(read_timeout), **kwargs)
+    
+    def post(self, url: str, read_timeout: Optional[float] = None, **kwargs) -> "requests.Response":
+        # Streamed responses return once the headers are in
+        with PROFILER.span("http post", url=url):
+            return self.session.post(url, timeout=self.timeout(read_timeout), **kwargs)
+    
+    def connection_stats(self) -> Dict[str, int]:
+        """Connections opened vs reused across all host pools"""
+        opened = sent = 0
+        if self._adapter is None:
+            return {"opened": 0, "reused": 0, "requests": 0}
+        pools = self._adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            opened += pool.num_connections
+            sent += pool.num_requests
+        return {"opened": opened, "reused": max(sent - opened, 0), "requests": sent}
+    
+    def close(self):
+        """Drop all pooled sockets"""
+        if self._session is not None:
+            self._session.close()
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# ASYNC STREAMING
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class StreamHandle:
+    """Lets another thread abort a blocking HTTP stream
+    
+    Also timestamps the request: opened_at when the stream is started and
+    connected_at once response headers have arrived. usage is filled in with
+    the token counts the backend reports (input_tokens, output_tokens).
+    """
     
     def __init__(self):
-        self.config = Config()
-        self.ollama = OllamaClient(self.config.ollama_host)
-        self.claude = ClaudeClient(self.config.anthropic_api_key)
-        self.history: List[Dict] = []
-        self.session_start = datetime.now()
+        self.cancelled = False
+        self.opened_at = time.monotonic()
+        self.connected_at: Optional[float] = None
+        self.usage: Dict[str, int] = {}
+        self._response = None
+        self._lock = threading.Lock()
+        self._cancel_event = threading.Event()
     
-    def check_systems(self) -> Tuple[bool, bool]:
-        """Check availability of all AI systems"""
-        ollama_ok = self.ollama.check_status()
-        claude_ok = self.claude.available
-        return ollama_ok, claude_ok
+    @property
+    def connect_time(self) -> Optional[float]:
+        """Seconds from opening the request to response headers"""
+        return None if self.connected_at is None else self.connected_at - self.opened_at
     
-    def process_input(self, user_input: str) -> Optional[str]:
-        """Process user input - returns response for commands, None to continue"""
-        cmd = user_input.strip().lower()
-        
-        # Exit commands
-        if cmd in ['exit', 'quit', 'bye', 'goodbye']:
-            self._goodbye()
-            sys.exit(0)
-        
-        # Help
-        if cmd == 'help':
-            return self._help_text()
-        
-        # Status
-        if cmd == 'status':
-            ollama_ok, claude_ok = self.check_systems()
-            display_status(ollama_ok, claude_ok, self.ollama.models, self.config.mode)
-            return None
-        
-        # Mode changes
-        if cmd == 'mode local':
-            self.config.mode = 'local'
-            return "Switched to [yellow]LOCAL[/] mode (Ollama - unrestricted)"
-        if cmd == 'mode cloud':
-            self.config.mode = 'cloud'
-            return "Switched to [cyan]CLOUD[/] mode (Claude)"
-        if cmd == 'mode auto':
-            self.config.mode = 'auto'
-            return "Switched to [green]AUTO[/] mode (intelligent routing)"
-        
-        # Clear history
-        if cmd == 'clear':
-            self.history.clear()
-            return "Conversation history cleared, sir."
-        
-        # List models
-        if cmd == 'models':
-            self.ollama.check_status()
-            if self.ollama.models:
-                return "Local models:\n  " + "\n  ".join(self.ollama.models)
-            return "[red]No local models found.[/]"
-        
-        # Reactor animation
-        if cmd == 'reactor':
-            animate_startup()
-            return None
-        
-        return "NOT_COMMAND"
+    def attach(self, response):
+        with self._lock:
+            self.connected_at = time.monotonic()
+            self._response = response
+            if self.cancelled:
+                self._abort(response)
     
-    def _help_text(self) -> str:
-        """Generate help text"""
-        return """
-[bold cyan]━━━ Commands ━━━[/]
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            self._cancel_event.set()
+            if self._response is not None:
+                self._abort(self._response)
+    
+    def sleep(self, seconds: float) -> bool:
+        """Wait between retries; False if the stream was cancelled meanwhile"""
+        return not self._cancel_event.wait(seconds)
+    
+    @staticmethod
+    def _abort(response):
+        # close() alone won't wake a thread blocked in recv(); shutdown() does
+        conn = getattr(response.raw, "connection", None) or getattr(response.raw, "_connection", None)
+        sock = getattr(conn, "sock", None)
+        try:
+            if sock is not None:
+                sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        try:
+            response.close()
+        except Exception:
+            pass
 
-[yellow]mode local[/]     Switch to local AI (Ollama - unrestricted)
-[yellow]mode cloud[/]     Switch to cloud AI (Claude)
-[yellow]mode auto[/]      Intelligent routing based on query
 
-[yellow]status[/]         Show system status
-[yellow]models[/]         List available local models
-[yellow]clear[/]          Clear conversation history
-[yellow]reactor[/]        Replay startup animation
-[yellow]help[/]           Show this help
-[yellow]exit[/]           Shutdown JARVIS
-"""
+async def astream(start: Callable[[StreamHandle], Iterator[str]],
+                  handle: Optional[StreamHandle] = None) -> AsyncGenerator[str, None]:
+    """Async view of a blocking chunk generator
     
-    def _goodbye(self):
-        """Goodbye message"""
-        if RICH_AVAILABLE:
-            console.print()
-            console.print("[cyan]JARVIS:[/] Shutting down. Until next time, sir.")
-            time.sleep(0.5)
-        else:
-            print("\nJARVIS: Shutting down. Until next time, sir.")
+    The blocking stream runs on a daemon pump thread. Cancelling the consumer
+    (task.cancel() or aclose()) shuts down the socket so the thread exits
+    promptly instead of reading the rest of the answer.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    handle = handle or StreamHandle()
+    done = object()
     
-    def get_response(self, user_input: str) -> Generator[str, None, None]:
-        """Get AI response with streaming"""
-        ollama_ok, claude_ok = self.check_systems()
-        
-        # Determine which system to use
-        if self.config.mode == 'local':
-            use_cloud = False
-        elif self.config.mode == 'cloud':
-            use_cloud = True
-        else:  # auto
-            routing = determine_routing(user_input)
-            use_cloud = (routing == 'cloud')
-        
-        # Fallback logic
-        if use_cloud and not claude_ok:
-            if ollama_ok:
-                use_cloud = False
-                yield "[dim](Cloud unavailable, using local)[/]\n"
-            else:
-                yield "[red]No AI systems available.[/]"
-                return
-        
-        if not use_cloud and not ollama_ok:
-            if claude_ok:
-                use_cloud = True
-                yield "[dim](Local unavailable, using cloud)[/]\n"
-            else:
-                yield "[red]No AI systems available.[/]"
+    def put(item):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            pass  # loop already closed
+    
+    def pump():
+        try:
+            for chunk in start(handle):
+                if handle.cancelled:
+                    break
+                put(chunk)
+        except Exception as e:
+            if not handle.cancelled:
+                put(StreamError.from_exception(e))
+        finally:
+            put(done)
+    
+    threading.Thread(target=pump, name="jarvis-stream", daemon=True).start()
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
                 return
+            yield item
+    finally:
+        handle.cancel()
+
+
+async def aiter_sync(chunks: Iterator[str]) -> AsyncGenerator[str, None]:
+    """Async view of an in-memory chunk generator, yielding to the loop between chunks"""
+    for chunk in chunks:
+        yield chunk
+        await asyncio.sleep(0)
+
+
+def iterate_sync(agen: AsyncGenerator) -> Generator:
+    """Blocking view of an async generator, driven on a private event loop"""
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(agen.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        try:
+            loop.run_until_complete(agen.aclose())
+        finally:
+            loop.close()
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# STREAM PARSERS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+_scanstring = json.decoder.scanstring  # decodes one JSON string in C, from just past its opening quote
+
+
+def iter_body(response) -> Iterator[bytes]:
+    """Response body as it arrives: whole HTTP chunks when the body is chunked"""
+    if getattr(response.raw, "chunked", False):
+        return response.iter_content(chunk_size=None)
+    return response.iter_content(chunk_size=512)
+
+
+class NDJSONParser:
+    """Incremental parser for Ollama's NDJSON chat stream
+    
+    Takes raw byte chunks of any size. Token lines are recognised by
+    substring and only their content string is decoded; json.loads runs
+    just for the final line (done_reason, stats) and for errors.
+    """
+    
+    TEXT = '"content":"'
+    
+    def __init__(self):
+        self._buffer = b""
+        self.done = False
+        self.done_reason = ""
+        self.error = ""
+        self.final: Dict = {}
+    
+    def feed(self, data: bytes) -> List[str]:
+        """Text deltas completed by this chunk"""
+        buffer = self._buffer + data if self._buffer else data
+        end = buffer.rfind(b"\n")
+        if end < 0:
+            self._buffer = buffer
+            return []
+        self._buffer = buffer[end + 1:]
+        out: List[str] = []
+        # Splitting on b"\n" never cuts a UTF-8 sequence, so complete lines decode cleanly
+        for line in buffer[:end].decode("utf-8").split("\n"):
+            if '"done":false' in line:
+                start = line.find(self.TEXT)
+                if start >= 0:
+                    text = _scanstring(line, start + len(self.TEXT))[0]
+                    if text:
+                        out.append(text)
+                    continue
+            if line.strip():
+                self._parse(line, out)
+        return out
+    
+    def close(self) -> List[str]:
+        """Flush a final line that arrived without a newline"""
+        return self.feed(b"\n") if self._buffer.strip() else []
+    
+    def _parse(self, line: str, out: List[str]):
+        data = json.loads(line)
+        if "error" in data:
+            self.error = str(data["error"])
+            return
+        text = data.get("message", {}).get("content")
+        if text:
+            out.append(text)
+        if data.get("done"):
+            self.done = True
+            self.done_reason = data.get("done_reason", "")
+            self.final = data
+
+
+class SSEParser:
+    """Incremental parser for Anthropic's server-sent event stream
+    
+    The `event:` line names each event, so pings and content block
+    start/stop markers are skipped without any JSON work, and text deltas
+    are decoded straight from the data line. json.loads runs only for
+    message_start / message_delta (usage, stop_reason) and errors.
+    """
+    
+    TEXT = '"type":"text_delta","text":"'
+    SKIP = frozenset(("ping", "content_block_start", "content_block_stop", "message_stop"))
+    
+    def __init__(self, on_usage: Optional[Callable[[Dict], None]] = None):
+        self._buffer = b""
+        self._event = ""
+        self.on_usage = on_usage
+        self.stop_reason = ""
+        self.error = ""
+    
+    def feed(self, data: bytes) -> List[str]:
+        """Text deltas completed by this chunk"""
+        buffer = self._buffer + data if self._buffer else data
+        end = buffer.rfind(b"\n")
+        if end < 0:
+            self._buffer = buffer
+            return []
+        self._buffer = buffer[end + 1:]
+        out: List[str] = []
+        for line in buffer[:end].decode("utf-8").split("\n"):
+            if line.startswith("data:"):
+                event = self._event
+                if event == "content_block_delta":
+                    start = line.find(self.TEXT)
+                    if start >= 0:
+                        text = _scanstring(line, start + len(self.TEXT))[0]
+                        if text:
+                            out.append(text)
+                        continue
+                elif event in self.SKIP:
+                    continue
+                self._parse(event, line[5:], out)
+            elif line.startswith("event:"):
+                self._event = line[6:].strip()
+        return out
+    
+    def _parse(self, event: str, payload: str, out: List[str]):
+        data = json.loads(payload)
+        kind = data.get("type", event)
+        if kind == "content_block_delta":
+            text = data.get("delta", {}).get("text")  # other delta kinds carry no answer text
+            if text:
+                out.append(text)
+        elif kind == "message_start":
+            self._usage(data.get("message", {}).get("usage"))
+        elif kind == "message_delta":
+            self.stop_reason = data.get("delta", {}).get("stop_reason") or self.stop_reason
+            self._usage(data.get("usage"))
+        elif kind == "error":
+            error = data.get("error", {})
+            self.error = f"{error.get('type', 'error')}: {error.get('message', '')}".strip(": ")
+    
+    def _usage(self, usage: Optional[Dict]):
+        if usage and self.on_usage:
+            self.on_usage(usage)
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# RESILIENCE
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# 529 is Anthropic's "overloaded"; Ollama answers 503 when its request queue is full
+RETRY_STATUSES = frozenset((408, 429, 500, 502, 503, 504, 529))
+RETRY_ERROR_TYPES = ("overloaded_error", "rate_limit_error", "api_error")  # Anthropic in-stream errors
+
+
+class BackendError(Exception):
+    """A backend call that failed, and whether trying again could help"""
+    
+    def __init__(self, message: str, status: Optional[int] = None, retryable: bool = False,
+                 retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+        self.retry_after = retry_after
+    
+    @classmethod
+    def wrap(cls, e: Exception) -> "BackendError":
+        """BackendError for any exception raised while talking to a backend"""
+        if isinstance(e, BackendError):
+            return e
+        import requests  # already loaded by the transport if anything was sent
+        # Refused or reset connections are worth another try; timeouts already waited long enough
+        retryable = isinstance(e, (requests.ConnectionError, ConnectionError)) and not isinstance(e, requests.Timeout)
+        return cls(f"Error: {e}", retryable=retryable)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds from a Retry-After header (delta-seconds or an HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def status_error(response, label: str = "Error") -> BackendError:
+    """BackendError for a non-200 response, from its status, error body and Retry-After"""
+    try:
+        body = response.json()  # also drains the body so the socket can be reused
+    except ValueError:
+        body = {}
+    error = body.get("error", "") if isinstance(body, dict) else ""
+    if isinstance(error, dict):  # Anthropic: {"type": ..., "message": ...}
+        error = f"{error.get('type', 'error')}: {error.get('message', '')}".strip(": ")
+    status = response.status_code
+    return BackendError(f"{label}: {status}" + (f" {error}" if error else ""), status=status,
+                        retryable=status in RETRY_STATUSES,
+                        retry_after=parse_retry_after(response.headers.get("retry-after")))
+
+
+@dataclass
+class RetryPolicy:
+    """Jittered exponential backoff for calls that fail before producing any text"""
+    attempts: int = 3          # tries in total
+    base_delay: float = 0.5    # seconds; the backoff window doubles with every retry
+    max_delay: float = 8.0     # a longer retry-after than this fails over instead of waiting
+    
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> Optional[float]:
+        """Seconds to wait after failed try number `attempt` (1-based); None to give up"""
+        if attempt >= self.attempts:
+            return None
+        if retry_after is not None:
+            return retry_after if retry_after <= self.max_delay else None
+        # Full jitter: a uniform pick over the window keeps clients from retrying in lockstep
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+def stream_with_retry(attempt: Callable[[], Iterator[str]], policy: RetryPolicy,
+                      handle: Optional[StreamHandle] = None,
+                      on_retry: Optional[Callable[[BackendError, float], None]] = None
+                      ) -> Generator[str, None, None]:
+    """Stream from attempt(), retrying retryable failures until text has been produced
+    
+    Once a chunk has gone out a retry would repeat it, so later failures are
+    raised as they are. Raises BackendError.
+    """
+    tries = 0
+    while True:
+        tries += 1
+        produced = False
+        try:
+            for chunk in attempt():
+                produced = True
+                yield chunk
+            return
+        except Exception as e:
+            error = BackendError.wrap(e)
+            delay = None if produced or not error.retryable else policy.delay(tries, error.retry_after)
+            if delay is None:
+                if error is e:
+                    raise
+                raise error from e
+        if on_retry:
+            on_retry(error, delay)
+        if handle is None:
+            time.sleep(delay)
+        elif not handle.sleep(delay):
+            return  # cancelled while backing off
+
+
+class CircuitBreaker:
+    """Stops traffic to a backend that keeps failing
+    
+    Closed until `threshold` calls in a row have failed (or the backend asks
+    for a longer back-off than we retry for); it then opens for `cooldown`
+    seconds, during which routing skips the backend. After that it is
+    half-open: calls go through again, the first success closes it and a
+    failure reopens it for twice as long, up to `max_cooldown`.
+    """
+    
+    def __init__(self, threshold: int = 2, cooldown: float = 30.0, max_cooldown: float = 300.0,
+                 max_retry_after: float = RetryPolicy.max_delay):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.max_retry_after = max_retry_after  # the longest retry-after the caller waits out itself
+        self.failures = 0          # consecutive failed calls
+        self.trips = 0
+        self.last_error = ""
+        self._opened_at = 0.0
+        self._open_for = 0.0       # 0 while closed
+        self._lock = threading.Lock()
+    
+    def _state(self, now: float) -> str:
+        if not self._open_for:
+            return "closed"
+        return "open" if now - self._opened_at < self._open_for else "half-open"
+    
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state(time.monotonic())
+    
+    def allows(self) -> bool:
+        return self.state != "open"
+    
+    def remaining(self) -> float:
+        """Seconds until an open breaker lets calls through again"""
+        with self._lock:
+            return max(0.0, self._opened_at + self._open_for - time.monotonic()) if self._open_for else 0.0
+    
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._open_for = 0.0
+    
+    def record_failure(self, error: str = "", retry_after: Optional[float] = None):
+        with self._lock:
+            now = time.monotonic()
+            self.failures += 1
+            self.last_error = error
+            state = self._state(now)
+            if state == "half-open":
+                duration = min(self._open_for * 2, self.max_cooldown)
+            elif state == "closed" and (self.failures >= self.threshold
+                                        or (retry_after or 0.0) > self.max_retry_after):
+                duration = self.cooldown
+            else:
+                return
+            self._opened_at = now
+            self._open_for = max(duration, retry_after or 0.0)
+            self.trips += 1
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# OLLAMA CLIENT
+# ═══════════════════════════════════════════════════════════════════════════════
+
+@dataclass(eq=False)
+class OllamaHost:
+    """One Ollama server in the pool: its probed state, load and circuit breaker"""
+    url: str
+    breaker: CircuitBreaker
+    healthy: bool = True      # assumed until the first probe says otherwise
+    models: List[str] = field(default_factory=list)    # canonical names from /api/tags
+    resident: List[str] = field(default_factory=list)  # canonical names from /api/ps
+    error: str = ""
+    outstanding: int = 0      # requests open on this host right now
+    served: int = 0
+    
+    @property
+    def label(self) -> str:
+        return self.url.split("://", 1)[-1].rstrip("/")
+    
+    @property
+    def usable(self) -> bool:
+        return self.healthy and self.breaker.allows()
+
+
+class OllamaClient:
+    """Local AI via Ollama, spread over one or more hosts
+    
+    Each request goes to the host with the fewest outstanding requests,
+    preferring hosts that already have the model in memory over ones that
+    only have it installed. A host that fails before sending any text is
+    ejected by its own circuit breaker and the request moves to the next one.
+    """
+    
+    def __init__(self, host: Union[str, List[str]] = "http://localhost:11434",
+                 transport: Optional[HTTPTransport] = None,
+                 keep_alive: Optional[str] = None, options: Optional[Dict] = None,
+                 retry: Optional[RetryPolicy] = None, breaker_threshold: int = 2,
+                 breaker_cooldown: float = 30.0):
+        self.transport = transport or HTTPTransport()
+        self.keep_alive = keep_alive
+        self.options = options or {}
+        self.retry = retry or RetryPolicy()
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.retries = 0    # requests retried after a failure, since startup
+        self.failovers = 0  # requests moved to another host before their first token
+        self.last_done_reason = ""
+        self.num_ctx: Optional[int] = None  # context size sent with every request, set by the planner
+        self.available = False
+        self.models: List[str] = []
+        self._lock = threading.Lock()
+        self.set_hosts([host] if isinstance(host, str) else host)
+    
+    def set_hosts(self, urls: List[str]):
+        self.hosts = [OllamaHost(url.rstrip("/"), CircuitBreaker(self.breaker_threshold, self.breaker_cooldown,
+                                                                 max_retry_after=self.retry.max_delay))
+                      for url in dict.fromkeys(urls)]
+    
+    @property
+    def host(self) -> str:
+        """The pool's URLs, for messages"""
+        return ", ".join(h.url for h in self.hosts)
+    
+    @host.setter
+    def host(self, url: str):
+        self.set_hosts([url])
+    
+    @staticmethod
+    def canonical(model: str) -> str:
+        """Model name as Ollama reports it ("llama3" → "llama3:latest")"""
+        return model if ":" in model else f"{model}:latest"
+    
+    def _extras(self) -> Dict:
+        """keep_alive and options, sent with every request that may load a model"""
+        extras: Dict = {}
+        if self.keep_alive is not None:
+            extras["keep_alive"] = self.keep_alive
+        options = self.options
+        if self.num_ctx and "num_ctx" not in options:
+            # Every request must carry the same num_ctx, or Ollama reloads the model to resize it
+            options = {**options, "num_ctx": self.num_ctx}
+        if options:
+            extras["options"] = options
+        return extras
+    
+    def check_status(self) -> bool:
+        """Probe every host; True if any of them is up"""
+        if len(self.hosts) == 1:
+            self._probe(self.hosts[0])
+        else:
+            # In parallel, so one dead host costs a connect timeout rather than one each
+            threads = [threading.Thread(target=self._probe, args=(h,), daemon=True) for h in self.hosts]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        up = [h for h in self.hosts if h.healthy]
+        self.models = list(dict.fromkeys(m for h in up for m in h.models))
+        self.available = bool(up)
+        return self.available
+    
+    def _probe(self, host: OllamaHost):
+        try:
+            r = self.transport.get(f"{host.url}/api/tags", read_timeout=2)
+            if r.status_code != 200:
+                raise BackendError(f"Error: {r.status_code}")
+            models = [self.canonical(m['name']) for m in r.json().get('models', [])]
+        except Exception as e:
+            host.healthy, host.resident = False, []
+            host.error = str(e) if isinstance(e, BackendError) else "no response"
+            return
+        resident: List[str] = []
+        try:
+            r = self.transport.get(f"{host.url}/api/ps", read_timeout=2)
+            if r.status_code == 200:
+                resident = [self.canonical(m['name']) for m in r.json().get('models', [])]
+        except Exception:
+            pass
+        host.healthy, host.error, host.models, host.resident = True, "", models, resident
+    
+    def running(self) -> List[str]:
+        """Models loaded in memory on any live host, as of the last check_status()"""
+        return list(dict.fromkeys(m for h in self.hosts if h.healthy for m in h.resident))
+    
+    def pick(self, model: str, exclude: Tuple[OllamaHost, ...] = ()) -> Optional[OllamaHost]:
+        """Host for the next request for `model`; None once every live host is excluded"""
+        with self._lock:
+            hosts = [h for h in self.hosts if h not in exclude]
+            usable = [h for h in hosts if h.usable]
+            if not usable and exclude:
+                return None
+            # With nothing usable, a first try still goes out so the caller gets the real error
+            hosts = usable or hosts
+            if not hosts:
+                return None
+            name = self.canonical(model)
+            hosts = [h for h in hosts if name in h.models] or hosts
+            # A cold load costs about one queued request, so a loaded host wins
+            # unless it has at least two more requests open than an idle one
+            return min(hosts, key=lambda h: (h.outstanding + (name not in h.resident),
+                                              name not in h.resident, h.served))
+    
+    @contextlib.contextmanager
+    def _using(self, host: OllamaHost):
+        with self._lock:
+            host.outstanding += 1
+        try:
+            yield host
+        finally:
+            with self._lock:
+                host.outstanding -= 1
+                host.served += 1
+    
+    def embed(self, texts: List[str], model: str) -> List[List[float]]:
+        """Embedding vectors for a batch of texts (raises on failure)"""
+        payload: Dict = {"model": model, "input": texts}
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        with self._using(self.pick(model)) as host:
+            r = self.transport.post(f"{host.url}/api/embed", json=payload)
+        r.raise_for_status()
+        return r.json()["embeddings"]
+    
+    def warm(self, model: str) -> bool:
+        """Load a model into memory, on the host its requests will go to, without generating anything"""
+        host = self.pick(model)
+        try:
+            # An empty message list makes Ollama load the model and return at once
+            payload = {"model": model, "messages": [], "stream": False, **self._extras()}
+            with self._using(host):
+                r = self.transport.post(f"{host.url}/api/chat", json=payload)
+                _ = r.content
+            if r.status_code == 200:
+                host.resident = list(dict.fromkeys(host.resident + [self.canonical(model)]))
+            return r.status_code == 200
+        except Exception:
+            return False
+    
+    def chat(self, messages: List[Dict], model: str,
+             handle: Optional[StreamHandle] = None) -> Generator[str, None, None]:
+        """Stream chat completion (raises BackendError once retries are used up)"""
+        return stream_with_retry(lambda: self._chat(messages, model, handle), self.retry, handle,
+                                 self._retried)
+    
+    def _retried(self, error: BackendError, delay: float):
+        self.retries += 1
+    
+    def _chat(self, messages: List[Dict], model: str,
+              handle: Optional[StreamHandle]) -> Generator[str, None, None]:
+        """One streaming attempt, moved to another host if its host fails before any text"""
+        tried: Tuple[OllamaHost, ...] = ()
+        while True:
+            host = self.pick(model, tried)
+            produced = False
+            try:
+                with self._using(host):
+                    for chunk in self._chat_on(host, messages, model, handle):
+                        produced = True
+                        yield chunk
+                host.breaker.record_success()
+                return
+            except Exception as e:
+                error = BackendError.wrap(e)
+                if handle is not None and handle.cancelled:
+                    raise
+                if error.retryable:
+                    host.breaker.record_failure(str(error), error.retry_after)
+                tried += (host,)
+                if produced or not error.retryable or self.pick(model, tried) is None:
+                    raise
+                self.failovers += 1
+    
+    def _chat_on(self, host: OllamaHost, messages: List[Dict], model: str,
+                 handle: Optional[StreamHandle]) -> Generator[str, None, None]:
+        with self.transport.post(
+            f"{host.url}/api/chat",
+            json={"model": model, "messages": messages, "stream": True, **self._extras()},
+            stream=True,
+        ) as r:
+            if handle:
+                handle.attach(r)
+            if r.status_code != 200:
+                raise status_error(r)
+            parser = NDJSONParser()
+            # Read through to the end of the body so the socket goes back to the pool
+            for data in iter_body(r):
+                with PROFILER.span("parse ndjson"):
+                    texts = parser.feed(data)
+                yield from texts
+                if parser.error:
+                    break
+            yield from parser.close()
+        self.last_done_reason = parser.done_reason
+        if handle and parser.final:
+            handle.usage = {"input_tokens": parser.final.get("prompt_eval_count", 0),
+                            "output_tokens": parser.final.get("eval_count", 0)}
+        if parser.error:
+            raise BackendError(f"Error: {parser.error}")
+        if parser.done_reason == "length":
+            yield Notice("\n[dim](answer cut off at the model's length limit)[/]")
+    
+    def achat(self, messages: List[Dict], model: str,
+              handle: Optional[StreamHandle] = None) -> AsyncGenerator[str, None]:
+        """Stream chat completion as a cancellable async generator"""
+        return astream(lambda h: self.chat(messages, model, handle=h), handle)
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# CLAUDE CLIENT
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class ClaudeClient:
+    """Cloud AI via Claude API"""
+    
+    CACHE_CONTROL = {"type": "ephemeral"}
+    USAGE_FIELDS = ("input_tokens", "output_tokens",
+                    "cache_creation_input_tokens", "cache_read_input_tokens")
+    
+    def __init__(self, api_key: str, transport: Optional[HTTPTransport] = None,
+                 prompt_cache: bool = True, retry: Optional[RetryPolicy] = None):
+        self.api_key = api_key
+        self.available = bool(api_key)
+        self.url = "https://api.anthropic.com/v1/messages"
+        self.transport = transport or HTTPTransport()
+        self.prompt_cache = prompt_cache
+        self.retry = retry or RetryPolicy()
+        self.retries = 0  # requests retried after a failure, since startup
+        self.last_stop_reason = ""
+        self.usage_totals: Dict[str, int] = dict.fromkeys(self.USAGE_FIELDS, 0)
+        self._usage_lock = threading.Lock()
+    
+    def build_system(self, system: Union[str, List[str]]) -> Union[str, List[Dict]]:
+        """System prompt as text blocks, the first (static) one marked cacheable"""
+        parts = [system] if isinstance(system, str) else [p for p in system if p]
+        if not self.prompt_cache:
+            return "\n\n".join(parts)
+        blocks = [{"type": "text", "text": p} for p in parts]
+        if blocks:
+            blocks[0]["cache_control"] = self.CACHE_CONTROL
+        return blocks
+    
+    def build_messages(self, messages: List[Dict], context: str = "") -> List[Dict]:
+        """Messages with a cache breakpoint on the last one
+        
+        Everything up to the newest message is stable next turn, so the
+        breakpoint moves forward with the conversation and the previous
+        turn's prefix is read back from the cache. context is text for this
+        turn only (recalled memory); it follows the breakpoint in the last
+        message, so it never breaks the cached prefix.
+        """
+        if not messages or not messages[-1]["content"]:
+            return messages
+        last = messages[-1]
+        if not self.prompt_cache:
+            if not context:
+                return messages
+            return messages[:-1] + [{"role": last["role"], "content": f"{last['content']}\n\n{context}"}]
+        blocks = [{"type": "text", "text": last["content"], "cache_control": self.CACHE_CONTROL}]
+        if context:
+            blocks.append({"type": "text", "text": context})
+        return messages[:-1] + [{"role": last["role"], "content": blocks}]
+    
+    def _record_usage(self, usage: Dict, seen: Dict[str, int], handle: Optional[StreamHandle] = None):
+        """Add one usage report to the totals; seen holds this stream's previous counts"""
+        if handle:
+            prompt = sum(usage.get(key, 0) for key in self.USAGE_FIELDS if key != "output_tokens")
+            if prompt:
+                handle.usage["input_tokens"] = prompt
+            if "output_tokens" in usage:
+                handle.usage["output_tokens"] = usage["output_tokens"]
+        with self._usage_lock:
+            for key in self.USAGE_FIELDS:
+                if key in usage:
+                    # message_delta repeats cumulative counts, so only add the increase
+                    increase = usage[key] - seen.get(key, 0)
+                    seen[key] = usage[key]
+                    self.usage_totals[key] += max(increase, 0)
+    
+    def chat(self, messages: List[Dict], model: str, system: Union[str, List[str]] = "",
+             handle: Optional[StreamHandle] = None, max_tokens: int = 4096,
+             context: str = "") -> Generator[str, None, None]:
+        """Stream chat completion (raises BackendError once retries are used up)"""
+        return stream_with_retry(lambda: self._chat(messages, model, system, handle, max_tokens, context),
+                                 self.retry, handle, self._retried)
+    
+    def _retried(self, error: BackendError, delay: float):
+        self.retries += 1
+    
+    def _chat(self, messages: List[Dict], model: str, system: Union[str, List[str]],
+              handle: Optional[StreamHandle], max_tokens: int, context: str = "") -> Generator[str, None, None]:
+        """One streaming attempt"""
+        if not self.api_key:
+            raise BackendError("Error: API key not configured")
+        
+        headers = {
+            "Content-Type": "application/json",
+            "x-api-key": self.api_key,
+            "anthropic-version": "2023-06-01"
+        }
+        
+        payload = {
+            "model": model,
+            "max_tokens": max_tokens,
+            "messages": self.build_messages(messages, context),
+            "stream": True
+        }
+        if system:
+            payload["system"] = self.build_system(system)
+        
+        with self.transport.post(self.url, headers=headers, json=payload, stream=True) as r:
+            if handle:
+                handle.attach(r)
+            if r.status_code != 200:
+                raise status_error(r, "API Error")
+            
+            # Counts already added for this stream; concurrent streams each keep their own
+            seen: Dict[str, int] = {}
+            parser = SSEParser(on_usage=lambda usage: self._record_usage(usage, seen, handle))
+            for data in iter_body(r):
+                with PROFILER.span("parse sse"):
+                    texts = parser.feed(data)
+                yield from texts
+                if parser.error:
+                    break
+        self.last_stop_reason = parser.stop_reason
+        if parser.error:
+            # An overload reported mid-stream is retryable as long as no text has gone out yet
+            raise BackendError(f"API Error: {parser.error}", retryable=parser.error.startswith(RETRY_ERROR_TYPES))
+        if parser.stop_reason in ("max_tokens", "refusal"):
+            yield Notice(f"\n[dim](answer stopped: {parser.stop_reason})[/]")
+    
+    def achat(self, messages: List[Dict], model: str, system: Union[str, List[str]] = "",
+              handle: Optional[StreamHandle] = None, max_tokens: int = 4096,
+              context: str = "") -> AsyncGenerator[str, None]:
+        """Stream chat completion as a cancellable async generator"""
+        return astream(lambda h: self.chat(messages, model, system, handle=h, max_tokens=max_tokens,
+                                           context=context), handle)
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# METRICS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Bucket upper bounds; every histogram has a fixed size whatever the traffic
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 250, 500)
+
+# name → (help text, buckets)
+METRICS = {
+    "health_probe_seconds": ("Duration of a backend health probe", LATENCY_BUCKETS),
+    "routing_seconds": ("Time spent choosing a backend", LATENCY_BUCKETS),
+    "connect_seconds": ("Request start to response headers", LATENCY_BUCKETS),
+    "ttft_seconds": ("Input to first token", LATENCY_BUCKETS),
+    "inter_token_seconds": ("Gap between streamed chunks", LATENCY_BUCKETS),
+    "tokens_per_second": ("Generation speed after the first token (estimated tokens)", RATE_BUCKETS),
+    "turn_seconds": ("Input to end of answer", LATENCY_BUCKETS),
+    "embed_seconds": ("Embedding request for semantic memory", LATENCY_BUCKETS),
+    "memory_search_seconds": ("Semantic memory lookup, embedding the query included", LATENCY_BUCKETS),
+    "recognize_seconds": ("Speech recognition of one utterance (voice input)", LATENCY_BUCKETS),
+    "speech_to_token_seconds": ("End of speech to the answer's first token (voice input)", LATENCY_BUCKETS),
+}
+
+
+class Histogram:
+    """Fixed-bucket histogram (Prometheus style, counts are per bucket here)"""
+    
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+    
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+    
+    def quantile(self, q: float) -> float:
+        """Estimate by linear interpolation inside the bucket holding the q-th value"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                low = self.buckets[i - 1] if i else 0.0
+                if i == len(self.buckets):
+                    return low  # beyond the last bound: report the bound
+                return low + (self.buckets[i] - low) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+    
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+
+class Metrics:
+    """Per backend/model latency histograms and turn counters
+    
+    Memory is bounded by the number of metric × backend × model combinations,
+    not by traffic. Exports to the Prometheus text format and to a JSON-lines
+    log with one record per turn.
+    """
+    
+    def __init__(self, log_path: str = ""):
+        self.log_path = log_path
+        self.histograms: Dict[Tuple[str, str, str], Histogram] = {}
+        self.turns: Dict[Tuple[str, str, str], int] = {}  # (backend, model, outcome) → count
+        self._lock = threading.Lock()
+    
+    def observe(self, name: str, value: Optional[float], backend: str = "", model: str = ""):
+        if value is None:
+            return
+        self.observe_many(name, [value], backend, model)
+    
+    def observe_many(self, name: str, values: List[float], backend: str = "", model: str = ""):
+        key = (name, backend, model)
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = Histogram(METRICS[name][1])
+            for value in values:
+                hist.observe(value)
+    
+    def get(self, name: str, backend: str = "", model: str = "") -> Optional[Histogram]:
+        return self.histograms.get((name, backend, model))
+    
+    def record_turn(self, record: Dict):
+        """Count a finished turn and append it to the JSON-lines log"""
+        key = (record.get("backend") or "", record.get("model") or "", record["outcome"])
+        with self._lock:
+            self.turns[key] = self.turns.get(key, 0) + 1
+        if self.log_path:
+            try:
+                os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+            except OSError:
+                pass
+    
+    def backends(self) -> List[Tuple[str, str]]:
+        """(backend, model) pairs that have served turns"""
+        with self._lock:
+            return sorted({(b, m) for b, m, _ in self.turns if b})
+    
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.turns.clear()
+    
+    def prometheus(self) -> str:
+        """Everything in the Prometheus text exposition format"""
+        def labels(**kv) -> str:
+            inner = ",".join(f'{k}="{v}"' for k, v in kv.items() if v != "")
+            return "{" + inner + "}" if inner else ""
+        
+        lines = []
+        with self._lock:
+            lines += ["# HELP jarvis_turns_total Finished turns by outcome",
+                      "# TYPE jarvis_turns_total counter"]
+            for (backend, model, outcome), n in sorted(self.turns.items()):
+                lines.append(f"jarvis_turns_total{labels(backend=backend, model=model, outcome=outcome)} {n}")
+            for name, (help_text, _) in METRICS.items():
+                series = sorted((k, h) for k, h in self.histograms.items() if k[0] == name)
+                if not series:
+                    continue
+                lines += [f"# HELP jarvis_{name} {help_text}", f"# TYPE jarvis_{name} histogram"]
+                for (_, backend, model), hist in series:
+                    cumulative = 0
+                    for bound, n in zip(list(hist.buckets) + ["+Inf"], hist.counts):
+                        cumulative += n
+                        lines.append(f"jarvis_{name}_bucket"
+                                     f"{labels(backend=backend, model=model, le=bound)} {cumulative}")
+                    tags = labels(backend=backend, model=model)
+                    lines.append(f"jarvis_{name}_sum{tags} {hist.sum:.6f}")
+                    lines.append(f"jarvis_{name}_count{tags} {hist.count}")
+        return "\n".join(lines) + "\n"
+    
+    def write_prometheus(self, path: str) -> bool:
+        """Atomically write the text file (e.g. for node_exporter's textfile collector)"""
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            tmp = f"{path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(self.prometheus())
+            os.replace(tmp, path)
+            return True
+        except OSError:
+            return False
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# HEALTH MONITOR
+# ═══════════════════════════════════════════════════════════════════════════════
+
+@dataclass
+class BackendHealth:
+    """Cached health of a single backend"""
+    name: str
+    healthy: bool = False
+    models: List[str] = field(default_factory=list)
+    checked_at: float = 0.0   # time.monotonic() of the last probe or failure report
+    latency: float = 0.0      # seconds the last probe took
+    error: str = ""
+    resident: List[str] = field(default_factory=list)  # models loaded in memory (local only)
+    cpu: Optional[float] = None     # host CPU and memory use in percent (local only, needs psutil)
+    memory: Optional[float] = None
+
+
+class HealthMonitor:
+    """Caches backend status with a TTL and refreshes it on a background thread
+    
+    The hot path only ever reads cached state; probing happens here.
+    """
+    
+    def __init__(self, ollama: OllamaClient, claude: ClaudeClient, ttl: float = 15.0,
+                 metrics: Optional[Metrics] = None, breaker_threshold: int = 2,
+                 breaker_cooldown: float = 30.0):
+        self.ollama = ollama
+        self.claude = claude
+        self.ttl = ttl
+        self.metrics = metrics
+        self._state: Dict[str, BackendHealth] = {
+            "local": BackendHealth("local"),
+            "cloud": BackendHealth("cloud"),
+        }
+        retry = {"local": ollama.retry, "cloud": claude.retry}
+        self.breakers: Dict[str, CircuitBreaker] = {
+            name: CircuitBreaker(breaker_threshold, breaker_cooldown, max_retry_after=retry[name].max_delay)
+            for name in self._state
+        }
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def get(self, name: str) -> BackendHealth:
+        with self._lock:
+            return self._state[name]
+    
+    def is_healthy(self, name: str) -> bool:
+        """Reachable at the last probe, and not tripped by recent failures"""
+        return self.get(name).healthy and self.breakers[name].allows()
+    
+    def is_stale(self, name: str) -> bool:
+        return time.monotonic() - self.get(name).checked_at >= self.ttl
+    
+    def refresh(self, force: bool = False):
+        """Probe every backend whose cached status has expired"""
+        for name in self._state:
+            if force or self.is_stale(name):
+                with PROFILER.span("health probe", backend=name):
+                    self._probe(name)
+        self._ready.set()
+    
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until the first full probe has finished"""
+        return self._ready.wait(timeout)
+    
+    def _probe(self, name: str):
+        start = time.monotonic()
+        resident: List[str] = []
+        cpu = memory = None
+        if name == "local":
+            healthy = self.ollama.check_status()
+            models = list(self.ollama.models)
+            error = "" if healthy else f"No response from {self.ollama.host}"
+            if healthy:
+                resident = [OllamaClient.canonical(m) for m in self.ollama.running()]
+            if PSUTIL_AVAILABLE:
+                import psutil  # ~30ms, so only ever imported on this thread
+                cpu = psutil.cpu_percent(interval=None)  # average since the previous probe
+                memory = psutil.virtual_memory().percent
+        else:
+            # No network probe for Claude: a configured key is all we can know up front,
+            # real failures arrive through record_failure()
+            healthy = self.claude.available
+            models = []
+            error = "" if healthy else "API key not configured"
+        now = time.monotonic()
+        with self._lock:
+            self._state[name] = BackendHealth(name, healthy, models, now, now - start, error, resident,
+                                              cpu, memory)
+        if self.metrics:
+            self.metrics.observe("health_probe_seconds", now - start, name)
+    
+    def record_failure(self, name: str, reason: str = "", retry_after: Optional[float] = None):
+        """A call that failed in-band, after its retries; enough in a row trip the breaker"""
+        self.breakers[name].record_failure(reason, retry_after)
+    
+    def record_success(self, name: str):
+        self.breakers[name].record_success()
+    
+    def start(self):
+        """Start the background refresh thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="jarvis-health", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+    
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception:
+                pass
+            if self._stop.wait(self.ttl / 2):
+                return
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# LATENCY MODEL
+# ═══════════════════════════════════════════════════════════════════════════════
+
+@dataclass
+class BackendEstimate:
+    """Expected seconds to a complete answer on one backend, and what went into it"""
+    backend: str
+    seconds: float
+    notes: List[str] = field(default_factory=list)
+
+
+class LatencyModel:
+    """Predicts how long each backend would take to finish an answer
+    
+    Time to first token is fitted as a + b·prompt_tokens by least squares over
+    each backend/model's recent turns, so long prompts cost what prefill
+    actually costs on this hardware. Generation time is the expected answer
+    length over the recent tokens/sec average, and requests already in flight
+    on a backend queue ahead of this one. Priors stand in until a backend has
+    a few turns of its own. Local estimates are also stretched by host CPU and
+    memory pressure and by the load time of a model that isn't in memory.
+    """
+    
+    PRIORS = {
+        "local": {"ttft": 0.5, "per_token": 1 / 400, "tps": 25.0},
+        "cloud": {"ttft": 1.2, "per_token": 1 / 8000, "tps": 60.0},
+    }
+    LOAD_PRIOR = 8.0    # seconds to load a local model, until one has been timed
+    MIN_SAMPLES = 5
+    MIN_SPREAD = 100    # prompt tokens between the shortest and longest sample before fitting a slope
+    ALPHA = 0.3         # EWMA weight of the newest turn
+    
+    def __init__(self, window: int = 50, local_parallel: int = 1):
+        self.window = window
+        self.local_parallel = max(1, local_parallel)
+        self.answer_tokens = 250.0  # EWMA over all backends: answer length depends on the question
+        self._ttft: Dict[Tuple[str, str], deque] = {}   # (backend, model) → (prompt_tokens, ttft)
+        self._tps: Dict[Tuple[str, str], float] = {}
+        self._load: Dict[str, float] = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, backend: str, model: str, prompt_tokens: int, ttft: Optional[float],
+                tokens_per_second: float, tokens: int):
+        """Learn from a completed, uncached, unhedged turn"""
+        key = (backend, model)
+        with self._lock:
+            if ttft is not None:
+                self._ttft.setdefault(key, deque(maxlen=self.window)).append((prompt_tokens, ttft))
+            if tokens_per_second:
+                previous = self._tps.get(key)
+                self._tps[key] = tokens_per_second if previous is None else (
+                    self.ALPHA * tokens_per_second + (1 - self.ALPHA) * previous)
+            if tokens:
+                self.answer_tokens = self.ALPHA * tokens + (1 - self.ALPHA) * self.answer_tokens
+    
+    def observe_load(self, model: str, seconds: float):
+        with self._lock:
+            self._load[OllamaClient.canonical(model)] = seconds
+    
+    def ttft_fit(self, backend: str, model: str) -> Tuple[float, float, int]:
+        """(seconds, seconds per prompt token, samples) for time to first token"""
+        prior = self.PRIORS[backend]
+        with self._lock:
+            samples = list(self._ttft.get((backend, model), ()))
+        n = len(samples)
+        if n < self.MIN_SAMPLES:
+            return prior["ttft"], prior["per_token"], n
+        mean_x = sum(x for x, _ in samples) / n
+        mean_y = sum(y for _, y in samples) / n
+        xs = [x for x, _ in samples]
+        if max(xs) - min(xs) < self.MIN_SPREAD:
+            # Prompts all about the same length: a fitted slope would be noise, extrapolated
+            slope = prior["per_token"]
+        else:
+            var = sum((x - mean_x) ** 2 for x in xs)
+            slope = max(0.0, sum((x - mean_x) * (y - mean_y) for x, y in samples) / var)
+        return max(0.0, mean_y - slope * mean_x), slope, n
+    
+    def samples(self, backend: str, model: str) -> int:
+        with self._lock:
+            return len(self._ttft.get((backend, model), ()))
+    
+    def tokens_per_second(self, backend: str, model: str) -> float:
+        with self._lock:
+            return self._tps.get((backend, model)) or self.PRIORS[backend]["tps"]
+    
+    def estimate(self, backend: str, model: str, prompt_tokens: int, in_flight: int,
+                 health: BackendHealth) -> BackendEstimate:
+        base, per_token, _ = self.ttft_fit(backend, model)
+        service = base + per_token * prompt_tokens + self.answer_tokens / self.tokens_per_second(backend, model)
+        estimate = BackendEstimate(backend, service)
+        if backend != "local":
+            return estimate
+        
+        if health.healthy and OllamaClient.canonical(model) not in health.resident:
+            with self._lock:
+                load = self._load.get(OllamaClient.canonical(model), self.LOAD_PRIOR)
+            estimate.seconds += load
+            estimate.notes.append(f"model not loaded +{load:.0f}s")
+        if in_flight:
+            # Ollama runs local_parallel requests at once; the rest wait their turn
+            wait = in_flight / self.local_parallel * service
+            estimate.seconds += wait
+            estimate.notes.append(f"{in_flight} in flight +{wait:.1f}s")
+        elif health.cpu is not None and health.cpu > 50:
+            # With nothing of ours running, a busy CPU is someone else competing with inference
+            stretch = 1 + (health.cpu - 50) / 50
+            estimate.seconds += service * (stretch - 1)
+            estimate.notes.append(f"cpu {health.cpu:.0f}% ×{stretch:.1f}")
+        if health.memory is not None and health.memory >= 90:
+            estimate.seconds += service * 0.5
+            estimate.notes.append(f"memory {health.memory:.0f}% ×1.5")
+        return estimate
+    
+    def describe(self, backend: str, model: str) -> str:
+        base, per_token, n = self.ttft_fit(backend, model)
+        fitted = f"{n} turns" if n >= self.MIN_SAMPLES else "prior"
+        return (f"ttft {base:.2f}s + {per_token * 1000:.2f}ms/token · "
+                f"{self.tokens_per_second(backend, model):.0f} tok/s ({fitted})")
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# TOKEN ACCOUNTING
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Roughly the pieces BPE vocabularies such as Llama 3's and Claude's split text
+# into: word pieces of up to 8 letters, 3-digit number groups, a newline with its
+# indentation, pairs of ASCII symbols and single non-ASCII characters
+TOKEN_PIECES = re.compile(r"[A-Za-z]{1,8}|\d{1,3}|\n[ \t]*|[^\sA-Za-z\d\x80-\U0010ffff]{1,2}|[^\x00-\x7f]")
+MESSAGE_OVERHEAD = 4     # role markers and separators the chat templates add per message
+MEMO_MIN_CHARS = 32      # shorter texts are cheaper to count than to look up
+
+
+@functools.lru_cache(maxsize=4096)
+def _count_pieces(text: str) -> int:
+    return len(TOKEN_PIECES.findall(text))
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count; long texts are memoized, so recounting a history costs lookups"""
+    if len(text) < MEMO_MIN_CHARS:
+        return len(TOKEN_PIECES.findall(text))
+    return _count_pieces(text)
+
+
+def estimate_messages(messages: List[Dict]) -> int:
+    return sum(estimate_tokens(m["content"]) + MESSAGE_OVERHEAD for m in messages)
+
+
+@dataclass
+class ContextPlan:
+    """Pre-flight sizing of one request"""
+    backend: str
+    estimated: int     # approximate prompt tokens, before calibration
+    prompt_tokens: int
+    context: int       # the model's context window (num_ctx for Ollama)
+    max_tokens: int    # room left for the answer
+    warning: str = ""
+
+
+class ContextPlanner:
+    """Sizes each request against its model's context before it is sent
+    
+    Approximate counts are scaled per backend by how the prompt token counts
+    the backends report compare with our estimates (an EWMA over the usage
+    each stream ends with). Ollama's num_ctx starts at ctx_min and only ever
+    doubles, because every change makes Ollama reload the model.
+    """
+    
+    ALPHA = 0.2
+    SCALE_BOUNDS = (0.5, 2.0)   # a report outside this isn't comparable (Ollama reused its prompt cache)
+    MIN_REPORT = 64             # prompts too short to say much about the ratio
+    MIN_ANSWER = 256            # tokens of answer room below which a prompt counts as overflowing
+    
+    def __init__(self, claude_context: int = 200000, claude_max_tokens: int = 4096,
+                 ctx_min: int = 4096, ctx_max: int = 32768, answer_tokens: int = 2048,
+                 fixed_ctx: Optional[int] = None):
+        self.claude_context = claude_context
+        self.claude_max_tokens = claude_max_tokens
+        self.ctx_max = fixed_ctx or max(ctx_min, ctx_max)
+        self.answer_tokens = answer_tokens
+        self.fixed_ctx = fixed_ctx            # num_ctx set in ollama_options: used as is
+        self.num_ctx = fixed_ctx or ctx_min
+        self.scale: Dict[str, float] = {"local": 1.0, "cloud": 1.0}
+        self.reports: Dict[str, int] = {"local": 0, "cloud": 0}
+        self._lock = threading.Lock()
+    
+    def estimate(self, backend: str, tokens: int) -> int:
+        return round(tokens * self.scale[backend])
+    
+    def fits_local(self, prompt_tokens: int) -> bool:
+        """Whether a prompt leaves answer room in the largest num_ctx we'd ask for"""
+        return prompt_tokens + self.MIN_ANSWER <= self.ctx_max
+    
+    def plan(self, backend: str, system: str, messages: List[Dict]) -> ContextPlan:
+        estimated = estimate_tokens(system) + MESSAGE_OVERHEAD + estimate_messages(messages)
+        prompt = self.estimate(backend, estimated)
+        if backend == "cloud":
+            room = self.claude_context - prompt
+            plan = ContextPlan(backend, estimated, prompt, self.claude_context,
+                               max(1, min(self.claude_max_tokens, room)))
+            if room < self.MIN_ANSWER:
+                plan.warning = (f"prompt ~{prompt:,} tokens is over Claude's {self.claude_context:,}-token "
+                                f"context; the API will likely reject it")
+            elif room < self.claude_max_tokens:
+                plan.warning = f"answer limited to ~{room:,} tokens by the context window"
+            return plan
+        with self._lock:
+            if not self.fixed_ctx:
+                while self.num_ctx < prompt + self.answer_tokens and self.num_ctx < self.ctx_max:
+                    self.num_ctx = min(self.num_ctx * 2, self.ctx_max)
+            context = self.num_ctx
+        plan = ContextPlan(backend, estimated, prompt, context, max(0, context - prompt))
+        if plan.max_tokens < self.MIN_ANSWER:
+            plan.warning = (f"prompt ~{prompt:,} tokens doesn't fit num_ctx {context:,}; "
+                            f"Ollama will drop the start of the conversation")
+        return plan
+    
+    def calibrate(self, backend: str, estimated: int, reported: Optional[int]):
+        """Fold a backend's reported prompt token count into the scale for its estimates"""
+        if not reported or estimated < self.MIN_REPORT:
+            return
+        ratio = reported / estimated
+        low, high = self.SCALE_BOUNDS
+        if not low <= ratio <= high:
+            return
+        with self._lock:
+            self.scale[backend] += self.ALPHA * (ratio - self.scale[backend])
+            self.reports[backend] += 1
+    
+    def describe(self) -> str:
+        return " · ".join(f"{name} ×{self.scale[name]:.2f} ({self.reports[name]} reports)"
+                          for name in ("local", "cloud"))
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# CONVERSATION HISTORY
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class HistoryManager:
+    """Token-budgeted conversation window with a running summary
+    
+    Recent turns are kept verbatim. When the smallest backend budget is
+    exceeded the oldest turns are folded into the summary by a background
+    summarizer, which only ever sees the previous summary plus the newly
+    evicted turns. Folded turns stay verbatim too while the largest budget
+    has room for them, so a backend with a bigger budget gets the summary
+    plus a longer window.
+    """
+    
+    def __init__(self, budgets: Dict[str, int], keep_turns: int = 2,
+                 summarizer: Optional[Callable[[str, List[Dict]], str]] = None):
+        self.budgets = budgets
+        self.keep_turns = keep_turns
+        self.summarizer = summarizer
+        self.messages: List[Dict] = []
+        self._tokens: List[int] = []
+        self._total = 0  # sum of _tokens, kept up to date so windows don't rescan the history
+        self.summary = ""
+        self.folded_turns = 0
+        self.folded_messages = 0  # leading messages the summary covers
+        self._fold_point = 0  # messages before this index are folded, kept only for larger budgets
+        self.on_append: Optional[Callable[[Dict], None]] = None       # e.g. persist to a session
+        self.on_summary: Optional[Callable[[str, int], None]] = None  # (summary, folded_messages)
+        self._pending: List[Dict] = []
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._generation = 0  # bumped by clear() so stale folds are discarded
+    
+    # List-like access for existing callers
+    def __len__(self) -> int:
+        return len(self.messages)
+    
+    def __iter__(self):
+        return iter(self.messages)
+    
+    def __getitem__(self, index):
+        return self.messages[index]
+    
+    def append(self, message: Dict):
+        with self._lock:
+            tokens = estimate_tokens(message["content"])
+            self.messages.append(message)
+            self._tokens.append(tokens)
+            self._total += tokens
+        if self.on_append:
+            self.on_append(message)
+    
+    def clear(self):
+        with self._lock:
+            self.messages.clear()
+            self._tokens.clear()
+            self._total = 0
+            self._pending.clear()
+            self.summary = ""
+            self.folded_turns = 0
+            self.folded_messages = 0
+            self._fold_point = 0
+            self._generation += 1
+    
+    def restore(self, summary: str, folded_messages: int, folded_turns: int,
+                messages: List[Dict], pending: List[Dict]):
+        """Replace the state with a saved one; pending messages get folded in the background"""
+        with self._lock:
+            self._generation += 1
+            self.summary = summary
+            self.folded_messages = folded_messages
+            self.folded_turns = folded_turns
+            self.messages = list(messages)
+            self._tokens = [estimate_tokens(m["content"]) for m in self.messages]
+            self._total = sum(self._tokens)
+            self._fold_point = 0
+            self._pending = list(pending)
+            if self._pending:
+                self._start_worker()
+    
+    def summary_tokens(self) -> int:
+        return estimate_tokens(self.summary) if self.summary else 0
+    
+    def usage(self, backend: str) -> int:
+        """Tokens the window for this backend currently occupies"""
+        with self._lock:
+            return self._fit(self.budgets.get(backend, 0), 0, 0, 0)[2]
+    
+    def window(self, backend: str, pending: Optional[Dict] = None) -> Tuple[str, List[Dict]]:
+        """Summary and verbatim messages to send, compacting to the backend's budget
+        
+        pending is a message that isn't in the history yet (the question being
+        asked); it counts against the budget and ends the returned window.
+        """
+        extra_tokens = estimate_tokens(pending["content"]) if pending else 0
+        extra_turns = int(bool(pending) and pending["role"] == "user")
+        with self._lock:
+            # Fold what the smallest budget can't hold
+            fold, turns, _ = self._fit(self._smallest_budget(), extra_tokens, extra_turns, self._fold_point)
+            if fold > self._fold_point:
+                self._pending.extend(self.messages[self._fold_point:fold])
+                self.folded_turns += turns
+                self._fold_point = fold
+                self._start_worker()
+            # Forget folded turns once even the largest budget has no room for them
+            drop = min(self._fit(self._largest_budget(), extra_tokens, extra_turns, 0)[0], self._fold_point)
+            if drop:
+                self._total -= sum(self._tokens[:drop])
+                del self.messages[:drop]
+                del self._tokens[:drop]
+                self._fold_point -= drop
+            start = min(self._fit(self.budgets.get(backend, 0), extra_tokens, extra_turns, 0)[0], self._fold_point)
+            window = self.messages[start:] + [pending] if pending else self.messages[start:]
+            return self.summary, window
+    
+    def _smallest_budget(self) -> int:
+        return min((b for b in self.budgets.values() if b), default=0)
+    
+    def _largest_budget(self) -> int:
+        budgets = self.budgets.values()
+        return 0 if not budgets or 0 in budgets else max(budgets)
+    
+    def _fit(self, budget: int, extra_tokens: int, extra_turns: int, start: int) -> Tuple[int, int, int]:
+        """(first message to keep, turns left out after start, tokens sent) to fit budget from start
+        
+        Caller holds the lock. Whole turns go, oldest first, down to keep_turns.
+        """
+        total = self.summary_tokens() + self._total - sum(self._tokens[:start]) + extra_tokens
+        turns = sum(1 for m in self.messages[start:] if m["role"] == "user") + extra_turns
+        dropped = 0
+        while budget and total > budget and turns - dropped > self.keep_turns and start < len(self.messages):
+            # One whole turn: the leading user message plus its replies
+            count = 1
+            while start + count < len(self.messages) and self.messages[start + count]["role"] != "user":
+                count += 1
+            total -= sum(self._tokens[start:start + count])
+            start += count
+            dropped += 1
+        return start, dropped, total
+    
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+    
+    def turn_count(self) -> int:
+        return sum(1 for m in self.messages if m["role"] == "user")
+    
+    def _start_worker(self):
+        # Caller holds the lock
+        if self.summarizer is None or (self._worker and self._worker.is_alive()):
+            return
+        self._worker = threading.Thread(target=self._fold, name="jarvis-summary", daemon=True)
+        self._worker.start()
+    
+    def _fold(self):
+        while True:
+            with self._lock:
+                if not self._pending:
+                    return
+                batch, self._pending = self._pending, []
+                previous, generation = self.summary, self._generation
+            try:
+                updated = self.summarizer(previous, batch)
+            except Exception:
+                updated = ""
+            if not updated:
+                updated = fallback_summary(previous, batch)
+            with self._lock:
+                if generation != self._generation:
+                    continue
+                self.summary = updated
+                self.folded_messages += len(batch)
+                folded = self.folded_messages
+            if self.on_summary:
+                self.on_summary(updated, folded)
+
+
+def fallback_summary(previous: str, messages: List[Dict], width: int = 160) -> str:
+    """Extractive summary used when the local model can't produce one"""
+    lines = [previous] if previous else []
+    for m in messages:
+        speaker = "Carlos" if m["role"] == "user" else "JARVIS"
+        lines.append(f"- {speaker}: {textwrap.shorten(m['content'], width)}")
+    return "\n".join(lines)
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# RESPONSE CACHE
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class ResponseCache:
+    """Persistent cache of complete answers with LRU, TTL and size-cap eviction"""
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS responses (
+            key        TEXT PRIMARY KEY,
+            backend    TEXT NOT NULL,
+            model      TEXT NOT NULL,
+            response   TEXT NOT NULL,
+            size       INTEGER NOT NULL,
+            created    REAL NOT NULL,
+            last_used  REAL NOT NULL,
+            hits       INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+    """
+    
+    def __init__(self, path: str, ttl: float = 7 * 24 * 3600,
+                 max_entries: int = 2000, max_bytes: int = 32 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(self.SCHEMA)
+    
+    @staticmethod
+    def make_key(backend: str, model: str, system: str, messages: List[Dict]) -> str:
+        """Hash of everything that determines the answer"""
+        normalized = [(m["role"], " ".join(m["content"].split())) for m in messages]
+        blob = json.dumps([backend, model, system, normalized], ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT response, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            self._db.execute(
+                "UPDATE responses SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key)
+            )
+            self.hits += 1
+            return row[0]
+    
+    def put(self, key: str, backend: str, model: str, response: str):
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, backend, model, response, size, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, backend, model, response, size, now, now),
+            )
+            self._evict(now)
+    
+    def _evict(self, now: float):
+        # Caller holds the lock and an open transaction
+        self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        count, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        # Least recently used first, until both caps hold
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            count -= 1
+            total -= size
+    
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            count, total, hits = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(hits), 0) FROM responses"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": count,
+            "bytes": total,
+            "lifetime_hits": hits,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+    
+    def clear(self) -> int:
+        with self._lock, self._db:
+            return self._db.execute("DELETE FROM responses").rowcount
+    
+    @staticmethod
+    def replay(text: str) -> Generator[str, None, None]:
+        """Stream a cached answer back word by word, like a live backend"""
+        for match in re.finditer(r"\s*\S+\s*", text):
+            yield match.group()
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# SESSION STORE
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class SessionStore:
+    """Append-only conversation log in SQLite (WAL), one row per message
+    
+    (session, seq) is the primary key, so resuming walks one session's index
+    backwards and reads only the messages that fit the context window. The
+    running summary is stored with the session, along with how many of its
+    leading messages it already covers.
+    """
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            id         TEXT PRIMARY KEY,
+            started    REAL NOT NULL,
+            updated    REAL NOT NULL,
+            title      TEXT NOT NULL DEFAULT '',
+            turns      INTEGER NOT NULL DEFAULT 0,
+            summary    TEXT NOT NULL DEFAULT '',
+            folded     INTEGER NOT NULL DEFAULT 0,
+            compacted  INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated);
+        CREATE TABLE IF NOT EXISTS messages (
+            session  TEXT NOT NULL,
+            seq      INTEGER NOT NULL,
+            role     TEXT NOT NULL,
+            content  TEXT NOT NULL,
+            tokens   INTEGER NOT NULL,
+            at       REAL NOT NULL,
+            PRIMARY KEY (session, seq)
+        ) WITHOUT ROWID;
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")  # WAL stays consistent; at worst the last turn is lost
+        self._db.executescript(self.SCHEMA)
+    
+    @staticmethod
+    def new_id() -> str:
+        """Sortable by start time; the random tail keeps sessions started together apart"""
+        now = datetime.now()
+        return f"{now:%Y%m%d-%H%M%S}.{now.microsecond // 1000:03d}-{random.getrandbits(24):06x}"
+    
+    def append(self, session: str, message: Dict):
+        """Add one message to the end of a session, creating the session if needed"""
+        now = time.time()
+        content = message["content"]
+        with self._lock, self._db:
+            self._db.execute("INSERT OR IGNORE INTO sessions (id, started, updated) VALUES (?, ?, ?)",
+                             (session, now, now))
+            (seq,) = self._db.execute(
+                "SELECT COALESCE(MAX(seq), 0) + 1 FROM messages WHERE session = ?", (session,)
+            ).fetchone()
+            self._db.execute(
+                "INSERT INTO messages (session, seq, role, content, tokens, at) VALUES (?, ?, ?, ?, ?, ?)",
+                (session, seq, message["role"], content, estimate_tokens(content), now),
+            )
+            if message["role"] == "user":
+                self._db.execute(
+                    "UPDATE sessions SET updated = ?, turns = turns + 1, "
+                    "title = CASE WHEN title = '' THEN ? ELSE title END WHERE id = ?",
+                    (now, textwrap.shorten(content, 60), session),
+                )
+            else:
+                self._db.execute("UPDATE sessions SET updated = ? WHERE id = ?", (now, session))
+    
+    def set_summary(self, session: str, summary: str, folded: int):
+        """Record the running summary and how many leading messages it covers"""
+        with self._lock, self._db:
+            self._db.execute("UPDATE sessions SET summary = ?, folded = ? WHERE id = ?",
+                             (summary, folded, session))
+    
+    def find(self, prefix: str = "") -> Optional[str]:
+        """Newest session whose id starts with prefix"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id FROM sessions WHERE substr(id, 1, ?) = ? ORDER BY updated DESC LIMIT 1",
+                (len(prefix), prefix)
+            ).fetchone()
+        return row[0] if row else None
+    
+    def load(self, session: str, budget: int) -> Optional[Dict]:
+        """Summary plus the newest whole turns that fit in `budget` tokens (0 = all)
+        
+        Messages after the summary that don't fit are returned as `pending`,
+        to be folded into the summary rather than dropped.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT summary, folded FROM sessions WHERE id = ?", (session,)).fetchone()
+            if row is None:
+                return None
+            summary, folded = row
+            remaining = budget - (estimate_tokens(summary) if summary else 0)
+            tail: List[Dict] = []
+            cursor = self._db.execute(
+                "SELECT seq, role, content, tokens FROM messages WHERE session = ? AND seq > ? "
+                "ORDER BY seq DESC", (session, folded)
+            )
+            for seq, role, content, tokens in cursor:
+                if budget and remaining - tokens < 0 and tail:
+                    break
+                remaining -= tokens
+                tail.append({"seq": seq, "role": role, "content": content})
+            cursor.close()
+            tail.reverse()
+            # Start the window on a user message so turns stay whole
+            while tail and tail[0]["role"] != "user":
+                tail.pop(0)
+            first = tail[0]["seq"] if tail else folded + 1
+            pending = [
+                {"role": role, "content": content}
+                for role, content in self._db.execute(
+                    "SELECT role, content FROM messages WHERE session = ? AND seq > ? AND seq < ? ORDER BY seq",
+                    (session, folded, first),
+                )
+            ]
+            (folded_turns,) = self._db.execute(
+                "SELECT COUNT(*) FROM messages WHERE session = ? AND seq < ? AND role = 'user'", (session, first)
+            ).fetchone()
+        return {
+            "summary": summary,
+            "folded": folded,
+            "folded_turns": folded_turns,
+            "pending": pending,
+            "messages": [{"role": m["role"], "content": m["content"]} for m in tail],
+        }
+    
+    def list(self, limit: int = 10) -> List[Dict]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, started, updated, title, turns, compacted FROM sessions "
+                "ORDER BY updated DESC LIMIT ?", (limit,)
+            ).fetchall()
+        keys = ("id", "started", "updated", "title", "turns", "compacted")
+        return [dict(zip(keys, row)) for row in rows]
+    
+    def compact(self, older_than: float, keep_turns: int = 2) -> int:
+        """Fold old sessions down to summary + last few turns; returns sessions compacted
+        
+        Uses the extractive fallback summary, so this never needs a model.
+        """
+        cutoff = time.time() - older_than
+        compacted = 0
+        with self._lock:
+            stale = self._db.execute(
+                "SELECT id, summary, folded FROM sessions WHERE updated < ? AND compacted = 0", (cutoff,)
+            ).fetchall()
+        for session, summary, folded in stale:
+            with self._lock, self._db:
+                # Keep the last keep_turns user messages and everything after them
+                row = self._db.execute(
+                    "SELECT seq FROM messages WHERE session = ? AND role = 'user' "
+                    "ORDER BY seq DESC LIMIT 1 OFFSET ?", (session, max(keep_turns - 1, 0))
+                ).fetchone()
+                keep_from = row[0] if row else folded + 1
+                unfolded = self._db.execute(
+                    "SELECT role, content FROM messages WHERE session = ? AND seq > ? AND seq < ? ORDER BY seq",
+                    (session, folded, keep_from),
+                ).fetchall()
+                if unfolded:
+                    summary = fallback_summary(summary, [{"role": r, "content": c} for r, c in unfolded])
+                self._db.execute("DELETE FROM messages WHERE session = ? AND seq < ?", (session, keep_from))
+                self._db.execute("UPDATE sessions SET summary = ?, folded = ?, compacted = 1 WHERE id = ?",
+                                 (summary, max(folded, keep_from - 1), session))
+            compacted += 1
+        return compacted
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# SEMANTIC MEMORY
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class MemoryIndex:
+    """On-disk vector index of past exchanges, searched by cosine similarity
+    
+    Vectors are L2-normalized float32 rows appended to vectors.f32 and read
+    through a memory map, so a search is one matrix-vector product. Line i
+    of entries.jsonl describes row i.
+    """
+    
+    def __init__(self, directory: str, model: str):
+        import numpy  # optional dependency, only needed once memory is enabled
+        self.np = numpy
+        self.directory = directory
+        self.model = model
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.entries_path = os.path.join(directory, "entries.jsonl")
+        self.meta_path = os.path.join(directory, "meta.json")
+        self.dim = 0
+        self.entries: List[Dict] = []
+        self._matrix = None        # memmap over vectors.f32, reopened after appends
+        self._cloud_ok = None      # bool mask of rows that may be shown to the cloud model
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def _load(self):
+        try:
+            with open(self.meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return
+        if meta.get("model") != self.model:
+            self._reset()  # vectors from another embedding model aren't comparable
+            return
+        self.dim = meta["dim"]
+        try:
+            with open(self.entries_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self.entries.append(json.loads(line))
+                    except ValueError:
+                        break  # torn write: everything from here is discarded below
+        except OSError:
+            pass
+        # Vectors and entries are appended separately; trim both to what they agree on
+        rows = os.path.getsize(self.vectors_path) // (4 * self.dim) if os.path.exists(self.vectors_path) else 0
+        count = min(rows, len(self.entries))
+        if rows != count or len(self.entries) != count:
+            del self.entries[count:]
+            if rows:
+                with open(self.vectors_path, "r+b") as f:
+                    f.truncate(count * 4 * self.dim)
+            with open(self.entries_path, "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(e) + "\n" for e in self.entries)
+    
+    def _reset(self):
+        for path in (self.vectors_path, self.entries_path, self.meta_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.dim = 0
+        self.entries = []
+        self._matrix = self._cloud_ok = None
+    
+    def add(self, vectors: List[List[float]], entries: List[Dict]):
+        """Append embedded exchanges (entries carry text, backend and timestamp)"""
+        np = self.np
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1, norms)
+        with self._lock:
+            if not self.dim:
+                self.dim = matrix.shape[1]
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"model": self.model, "dim": self.dim}, f)
+            if matrix.shape[1] != self.dim:
+                raise ValueError(f"embedding size changed ({matrix.shape[1]} != {self.dim})")
+            with open(self.vectors_path, "ab") as f:
+                f.write(matrix.tobytes())
+            with open(self.entries_path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(e) + "\n" for e in entries)
+            self.entries.extend(entries)
+            self._matrix = self._cloud_ok = None
+    
+    def search(self, vector: List[float], k: int, cloud_only: bool = False,
+               min_score: float = 0.0) -> List[Tuple[float, Dict]]:
+        """Top-k (score, entry) by cosine similarity, best first"""
+        np = self.np
+        with self._lock:
+            if not self.entries:
+                return []
+            if self._matrix is None:
+                self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r",
+                                         shape=(len(self.entries), self.dim))
+                self._cloud_ok = np.array([e.get("backend") == "cloud" for e in self.entries])
+            matrix, cloud_ok, entries = self._matrix, self._cloud_ok, list(self.entries)
+        query = np.asarray(vector, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        scores = matrix @ query
+        if cloud_only:
+            scores = np.where(cloud_ok, scores, -np.inf)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), entries[i]) for i in top if scores[i] >= min_score]
+
+
+def memory_section(snippets: List[str]) -> str:
+    """Prompt section carrying retrieved past exchanges (sent with the question it was recalled for)"""
+    if not snippets:
+        return ""
+    return "RELEVANT PAST EXCHANGES (retrieved from earlier conversations):\n" + "\n---\n".join(snippets)
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# VOICE OUTPUT
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class SentenceSplitter:
+    """Cuts streamed markdown into speakable sentences as soon as they end
+    
+    A sentence ends at . ! ? or … followed by whitespace, or at a line break
+    (list items, headings). Code blocks are skipped and inline markup is
+    dropped, so only the prose is read out. Pieces shorter than min_chars
+    wait for the next one, so "1." or "Dr." isn't synthesized on its own.
+    """
+    
+    END = re.compile(r'(?<=[.!?…])["\')\]*_]*[ \t]+|[ \t]*\n+')
+    MARKUP = re.compile(r'!?\[([^\]]*)\]\([^)]*\)|[*`~|]+|__+|^\s*(?:[-+>]|#{1,6}|\d+[.)])\s+', re.M)
+    FENCE = "```"
+    
+    def __init__(self, min_chars: int = 24):
+        self.min_chars = min_chars
+        self.reset()
+    
+    def reset(self):
+        self._buffer = ""
+        self._short = ""    # cleaned text held back for being too short
+        self._in_code = False
+    
+    def feed(self, text: str) -> List[str]:
+        """Sentences completed by this chunk"""
+        self._buffer += text
+        out: List[str] = []
+        while True:
+            fence = self._buffer.find(self.FENCE)
+            if self._in_code:
+                if fence < 0:
+                    self._buffer = self._buffer[-2:]  # might be the start of the closing fence
+                    return out
+                self._buffer = self._buffer[fence + len(self.FENCE):]
+                self._in_code = False
+                continue
+            prose = self._buffer if fence < 0 else self._buffer[:fence]
+            start = 0
+            for match in self.END.finditer(prose):
+                self._emit(prose[start:match.start()], out)
+                start = match.end()
+            if fence < 0:
+                self._buffer = prose[start:]
+                return out
+            self._emit(prose[start:], out)  # a code block ends the sentence before it
+            self._buffer = self._buffer[fence + len(self.FENCE):]
+            self._in_code = True
+    
+    def flush(self) -> str:
+        """Whatever is left once the answer is complete"""
+        out: List[str] = []
+        if not self._in_code:
+            self._emit(self._buffer, out)
+        rest = " ".join(out + [self._short]).strip()
+        self.reset()
+        return rest
+    
+    def _emit(self, piece: str, out: List[str]):
+        text = " ".join(self.MARKUP.sub(r"\1", piece).split())
+        if not text:
+            return
+        self._short = f"{self._short} {text}" if self._short else text
+        if len(self._short) >= self.min_chars:
+            out.append(self._short)
+            self._short = ""
+
+
+def pcm_to_wav(pcm: bytes, rate: int) -> bytes:
+    """16-bit mono PCM wrapped in a WAV header"""
+    import io
+    import wave
+    out = io.BytesIO()
+    with wave.open(out, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(pcm)
+    return out.getvalue()
+
+
+class ElevenLabsTTS:
+    """Text to speech through the ElevenLabs REST API
+    
+    Any object with synthesize(text) -> bytes, an `extension` and describe()
+    can stand in for this one in SpeechPipeline. pcm_* output formats are
+    returned as WAV, which plays without ffmpeg.
+    """
+    
+    def __init__(self, api_key: str, voice: str, model: str, output_format: str = "mp3_44100_128",
+                 transport: Optional[HTTPTransport] = None, timeout: float = 30.0):
+        self.api_key = api_key
+        self.voice = voice
+        self.model = model
+        self.output_format = output_format
+        self.url = "https://api.elevenlabs.io/v1/text-to-speech"
+        self.transport = transport or HTTPTransport()
+        self.timeout = timeout
+    
+    @property
+    def extension(self) -> str:
+        codec = self.output_format.split("_")[0]
+        return "wav" if codec == "pcm" else codec
+    
+    def describe(self) -> str:
+        return f"ElevenLabs {self.model}"
+    
+    def synthesize(self, text: str) -> bytes:
+        """Audio for one sentence (raises BackendError)"""
+        if not self.api_key:
+            raise BackendError("TTS error: ElevenLabs API key not configured")
+        try:
+            response = self.transport.post(
+                f"{self.url}/{self.voice}", read_timeout=self.timeout,
+                params={"output_format": self.output_format},
+                headers={"xi-api-key": self.api_key, "Accept": "audio/*"},
+                json={"text": text, "model_id": self.model},
+            )
+        except Exception as e:
+            raise BackendError.wrap(e) from e
+        if response.status_code != 200:
+            raise status_error(response, "TTS error")
+        if self.extension == "wav":
+            return pcm_to_wav(response.content, int(self.output_format.split("_")[1]))
+        return response.content
+
+
+class AudioFiles:
+    """Audio output that writes each segment to a file, numbered in speaking order"""
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.prefix = f"{datetime.now():%Y%m%d-%H%M%S}"
+        self.paths: List[str] = []
+        os.makedirs(directory, exist_ok=True)
+    
+    def describe(self) -> str:
+        return f"files in {self.directory}"
+    
+    def play(self, audio: bytes, extension: str):
+        path = os.path.join(self.directory, f"{self.prefix}-{len(self.paths) + 1:04d}.{extension}")
+        with open(path, "wb") as f:
+            f.write(audio)
+        self.paths.append(path)
+
+
+class Speaker:
+    """Audio output through pydub's player (decoding mp3 needs ffmpeg; wav doesn't)"""
+    
+    def __init__(self):
+        from pydub import AudioSegment  # optional dependency, raises ImportError without it
+        from pydub.playback import play
+        self._decode = AudioSegment.from_file
+        self._play = play
+    
+    def describe(self) -> str:
+        return "speaker"
+    
+    def play(self, audio: bytes, extension: str):
+        import io
+        self._play(self._decode(io.BytesIO(audio), format=extension))
+
+
+class SpeechPipeline:
+    """Speaks an answer while the model is still writing it
+    
+    feed() takes streamed text; each finished sentence is queued for a pool
+    of synthesis threads, and one output thread plays (or writes) the audio
+    strictly in order as segments become ready. The first sentence is heard
+    after one sentence of generation plus one TTS request, not after the
+    whole answer.
+    
+    At most queue_size sentences wait for synthesis. Past that, new text is
+    appended to the last waiting sentence (fewer, longer requests), and only
+    once that reaches MAX_CHARS does feed() block. Workers stay within
+    queue_size segments of playback, which bounds the audio held in memory.
+    A TTS backend that keeps failing trips a circuit breaker, and sentences
+    are skipped rather than sent while it is open.
+    """
+    
+    MAX_CHARS = 2000  # text per TTS request, when sentences are merged
+    
+    def __init__(self, backend, output, workers: int = 2, queue_size: int = 8, min_chars: int = 24):
+        self.backend = backend
+        self.output = output
+        self.queue_size = max(queue_size, 1)
+        self.splitter = SentenceSplitter(min_chars)
+        self.spoken = 0                           # segments played or written
+        self.merged = 0                           # sentences folded into a waiting one
+        self.errors = 0
+        self.skipped = 0                          # sentences not sent while the breaker was open
+        self.last_error = ""
+        self.breaker = CircuitBreaker(threshold=2, cooldown=30.0)
+        self.first_audio: Optional[float] = None  # seconds from the last answer's start to its first audio
+        self._jobs: deque = deque()               # (seq, text) waiting for a worker
+        self._ready: Dict[int, Optional[bytes]] = {}  # synthesized, waiting their turn (None: failed)
+        self._next = 0                            # sequence number of the next sentence
+        self._played = 0                          # sequence number to play next
+        self._answering = False                   # between begin_turn() and end_turn()
+        self._turn_start = 0.0
+        self._turn_first = 0                      # first sequence number of the current answer
+        self._closed = False
+        self._cond = threading.Condition()
+        self._threads = [threading.Thread(target=self._synthesize_loop, name=f"jarvis-tts-{i}", daemon=True)
+                         for i in range(max(workers, 1))]
+        self._threads.append(threading.Thread(target=self._play_loop, name="jarvis-audio", daemon=True))
+        for thread in self._threads:
+            thread.start()
+    
+    @property
+    def pending(self) -> int:
+        """Sentences queued, being synthesized or waiting to play"""
+        with self._cond:
+            return self._next - self._played
+    
+    def begin_turn(self):
+        """Start timing a new answer (feed() does this itself if needed)"""
+        with self._cond:
+            self._answering = True
+            self._turn_start = time.monotonic()
+            self._turn_first = self._next
+            self.first_audio = None
+    
+    def feed(self, text: str):
+        """Streamed answer text; finished sentences are queued for speech"""
+        if not self._answering:
+            self.begin_turn()
+        for sentence in self.splitter.feed(text):
+            self.say(sentence)
+    
+    def end_turn(self):
+        """The answer is complete: speak what is left of it"""
+        rest = self.splitter.flush()
+        if rest:
+            self.say(rest)
+        self._answering = False
+    
+    def tee(self, chunks: Iterator) -> Generator:
+        """Pass a get_response() stream through unchanged, speaking its text"""
+        self.begin_turn()
+        completed = False
+        try:
+            for chunk in chunks:
+                if not isinstance(chunk, Notice):
+                    self.feed(chunk)
+                yield chunk
+            completed = True
+        finally:
+            if completed:
+                self.end_turn()
+            else:
+                self.cancel()
+    
+    def say(self, text: str):
+        """Queue one piece of text, in order after everything queued before"""
+        with self._cond:
+            while len(self._jobs) >= self.queue_size:
+                seq, waiting = self._jobs[-1]
+                if len(waiting) + len(text) < self.MAX_CHARS:
+                    self._jobs[-1] = (seq, f"{waiting} {text}")
+                    self.merged += 1
+                    return
+                self._cond.wait()
+            self._jobs.append((self._next, text))
+            self._next += 1
+            self._cond.notify_all()
+    
+    def cancel(self):
+        """Drop everything not yet played (a segment already playing finishes)"""
+        self.splitter.reset()
+        with self._cond:
+            self._jobs.clear()
+            self._ready.clear()
+            self._played = self._next
+            self._answering = False
+            self._cond.notify_all()
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until everything queued has been played; False on timeout"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._played >= self._next, timeout)
+    
+    def close(self, timeout: float = 0.0):
+        """Stop the threads once the queue is spoken, waiting up to timeout for that"""
+        self.end_turn()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(deadline - time.monotonic(), 0.0))
+    
+    def describe(self) -> str:
+        return f"{self.backend.describe()} → {self.output.describe()}"
+    
+    def _synthesize_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: (self._jobs and self._jobs[0][0] < self._played + self.queue_size)
+                                    or (self._closed and not self._jobs))
+                if not self._jobs:
+                    return
+                seq, text = self._jobs.popleft()
+                self._cond.notify_all()  # room for a producer blocked in say()
+            audio = None
+            if not self.breaker.allows():
+                with self._cond:
+                    self.skipped += 1
+            else:
+                try:
+                    with PROFILER.span("tts", seq=seq, chars=len(text)):
+                        audio = self.backend.synthesize(text)
+                    self.breaker.record_success()
+                except Exception as e:
+                    error = BackendError.wrap(e)
+                    self.breaker.record_failure(str(error), error.retry_after)
+                    with self._cond:
+                        self.errors += 1
+                        self.last_error = str(error)
+            with self._cond:
+                if seq >= self._played:  # not cancelled meanwhile
+                    self._ready[seq] = audio
+                    self._cond.notify_all()
+    
+    def _play_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._played in self._ready
+                                    or (self._closed and self._played >= self._next))
+                seq = self._played
+                if seq not in self._ready:
+                    return
+                audio = self._ready.pop(seq)
+                if audio is not None and self.first_audio is None and seq >= self._turn_first:
+                    self.first_audio = time.monotonic() - self._turn_start
+            if audio is not None:
+                try:
+                    with PROFILER.span("play", seq=seq, bytes=len(audio)):
+                        self.output.play(audio, self.backend.extension)
+                    self.spoken += 1
+                except Exception as e:
+                    with self._cond:
+                        self.errors += 1
+                        self.last_error = f"Audio output error: {e}"
+            with self._cond:
+                self._played = max(self._played, seq + 1)  # cancel() may have skipped ahead
+                self._cond.notify_all()
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# VOICE INPUT
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class VoiceActivityDetector:
+    """Cuts 16-bit mono PCM into utterances, one fixed-size frame at a time
+    
+    Each frame's RMS energy and zero-crossing rate are computed for a whole
+    block of frames at once with NumPy. A frame is speech when its energy is
+    `ratio` times the noise floor, or half that with the high zero-crossing
+    rate of fricatives (s, f, sh). Each frame's noise floor is the quietest
+    frame of the NOISE_WINDOW_MS up to it: speech always pauses between
+    syllables, so the floor follows a fan switching on without being pulled
+    up by the speech itself, however the audio is split into blocks.
+    An utterance ends after end_ms of non-speech, so end_ms is also the
+    endpointing delay; bursts with less than min_speech_ms of speech are
+    dropped as clicks. pre_roll_ms of audio before the onset is kept so the
+    first syllable isn't clipped.
+    """
+    
+    ZCR_FRICATIVE = 0.25    # crossings per sample
+    MIN_ENERGY = 100.0      # int16 RMS; below this nothing counts as speech, even after digital silence
+    NOISE_WINDOW_MS = 1500
+    
+    def __init__(self, rate: int, frame_ms: int = 20, end_ms: int = 500, min_speech_ms: int = 250,
+                 ratio: float = 3.0, pre_roll_ms: int = 200):
+        import numpy  # optional dependency, only needed once voice input is used
+        self.np = numpy
+        self.rate = rate
+        self.frame = max(rate * frame_ms // 1000, 2)
+        self.end_frames = max(round(end_ms / frame_ms), 1)
+        self.min_frames = max(round(min_speech_ms / frame_ms), 1)
+        self.pre_roll = round(pre_roll_ms / frame_ms) * self.frame  # samples
+        self.ratio = ratio
+        self.noise = 0.0
+        self._recent = numpy.zeros(0, numpy.float32)  # energies of the frames before the next block
+        self._window = max(round(self.NOISE_WINDOW_MS / frame_ms), 1)
+        self._pending = numpy.zeros(0, numpy.int16)  # samples short of a whole frame
+        self._before = numpy.zeros(0, numpy.int16)   # latest audio while idle, for the pre-roll
+        self._parts: List = []                       # blocks of the current utterance
+        self._speaking = False
+        self._voiced = 0                             # speech frames in the current utterance
+        self._silent = 0                             # non-speech frames since the last speech frame
+    
+    @property
+    def end_delay(self) -> float:
+        """Seconds of audio between the end of speech and its detection"""
+        return self.end_frames * self.frame / self.rate
+    
+    def classify(self, frames) -> "numpy.ndarray":
+        """Speech mask for a (n, frame) block, updating the noise floor"""
+        np = self.np
+        x = frames.astype(np.float32)
+        energy = np.sqrt(np.mean(x * x, axis=1))
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (self.frame - 1)
+        # A rolling minimum, so a long block of speech can't raise the floor for its own start
+        history = np.concatenate((self._recent, energy))
+        if len(history) < self._window + len(energy) - 1:
+            history = np.concatenate((np.full(self._window + len(energy) - 1 - len(history), np.inf,
+                                              np.float32), history))
+        floor = np.lib.stride_tricks.sliding_window_view(history, self._window).min(axis=1)[-len(energy):]
+        self._recent = history[len(history) - (self._window - 1):]
+        self.noise = float(floor[-1])
+        threshold = np.maximum(floor * self.ratio, self.MIN_ENERGY)
+        return (energy >= threshold) | ((energy >= threshold / 2) & (zcr >= self.ZCR_FRICATIVE))
+    
+    def feed(self, samples) -> List["numpy.ndarray"]:
+        """Utterances (int16 arrays) that ended in this block of samples"""
+        np = self.np
+        if self._pending.size:
+            samples = np.concatenate((self._pending, samples))
+        n = len(samples) // self.frame
+        self._pending = samples[n * self.frame:]
+        if not n:
+            return []
+        frames = samples[:n * self.frame].reshape(n, self.frame)
+        speech = self.classify(frames)
+        done = []
+        i = 0
+        while i < n:
+            if not self._speaking:
+                onsets = np.flatnonzero(speech[i:])
+                start = i + int(onsets[0]) if onsets.size else n
+                before = np.concatenate((self._before, frames[i:start].ravel()))
+                self._before = before[max(len(before) - self.pre_roll, 0):]
+                if not onsets.size:
+                    break
+                self._parts = [self._before] if self.pre_roll else []
+                self._before = self._before[:0]
+                self._speaking, self._voiced, self._silent = True, 0, 0
+                i = start
+            # Length of the silent run at each frame, carrying the run from the previous block
+            rest = speech[i:]
+            index = np.arange(rest.size)
+            last_speech = np.maximum.accumulate(np.where(rest, index, -1 - self._silent))
+            silent = index - last_speech
+            ends = np.flatnonzero(silent >= self.end_frames)
+            stop = int(ends[0]) + 1 if ends.size else rest.size
+            self._parts.append(frames[i:i + stop].ravel())
+            self._voiced += int(np.count_nonzero(rest[:stop]))
+            self._silent = int(silent[stop - 1])
+            i += stop
+            if ends.size:
+                done += self._finish()
+        return done
+    
+    def flush(self) -> List["numpy.ndarray"]:
+        """The utterance in progress when the audio ends, if it is long enough"""
+        return self._finish() if self._speaking else []
+    
+    def _finish(self) -> List["numpy.ndarray"]:
+        np = self.np
+        self._speaking = False
+        audio = np.concatenate(self._parts) if self._parts else np.zeros(0, np.int16)
+        self._parts = []
+        # Keep pre_roll worth of the trailing silence, mirroring the onset
+        trim = max(self._silent * self.frame - self.pre_roll, 0)
+        if trim:
+            audio = audio[:len(audio) - trim]
+        return [audio] if self._voiced >= self.min_frames else []
+
+
+def read_wav(f) -> Tuple[int, Iterator]:
+    """Sample rate and int16 mono blocks (~100 ms) from a 16-bit WAV path or file object"""
+    import wave
+    import numpy
+    try:
+        wav = wave.open(f, "rb")
+    except (wave.Error, EOFError) as e:
+        raise ValueError(f"not a WAV file{f' ({e})' if str(e) else ''}") from e
+    if wav.getsampwidth() != 2:
+        raise ValueError("only 16-bit WAV is supported")
+    rate, channels = wav.getframerate(), wav.getnchannels()
+    
+    def blocks():
+        with wav:
+            while True:
+                data = wav.readframes(rate // 10)
+                if not data:
+                    return
+                samples = numpy.frombuffer(data, dtype="<i2")
+                if channels > 1:
+                    samples = samples.reshape(-1, channels).mean(axis=1).astype(numpy.int16)
+                yield samples
+    return rate, blocks()
+
+
+def read_pcm(f, rate: int) -> Iterator:
+    """int16 mono blocks (~100 ms) from raw little-endian PCM"""
+    import numpy
+    size = rate // 10 * 2
+    while True:
+        data = f.read(size)
+        if len(data) < 2:
+            return
+        yield numpy.frombuffer(data[:len(data) // 2 * 2], dtype="<i2")
+
+
+def microphone(rate: int) -> Iterator:
+    """int16 mono blocks (~100 ms) from the default input device"""
+    import numpy
+    import pyaudio  # optional dependency
+    audio = pyaudio.PyAudio()
+    stream = audio.open(format=pyaudio.paInt16, channels=1, rate=rate, input=True,
+                        frames_per_buffer=rate // 10)
+    try:
+        while True:
+            # Audio keeps arriving while an answer streams; old blocks are better than an exception
+            yield numpy.frombuffer(stream.read(rate // 10, exception_on_overflow=False), dtype="<i2")
+    finally:
+        stream.close()
+        audio.terminate()
+
+
+def open_audio(source: str, rate: int = 16000) -> Tuple[int, Iterator]:
+    """Sample rate and PCM blocks from "mic", a WAV path, or "-" (WAV or raw s16le at rate on stdin)"""
+    if source == "mic":
+        return rate, microphone(rate)
+    if source == "-":
+        stdin = sys.stdin.buffer
+        if stdin.peek(4)[:4] == b"RIFF":
+            return read_wav(stdin)
+        return rate, read_pcm(stdin, rate)
+    return read_wav(source)
+
+
+class SpeechRecognizer:
+    """Speech to text through the SpeechRecognition package
+    
+    engine picks its recognize_<engine> method: google (the default, online),
+    whisper or sphinx (offline, with their extra packages), and so on. Any
+    object with transcribe(samples, rate) -> str and describe() can stand in
+    for this one in VoiceInput.
+    """
+    
+    def __init__(self, engine: str = "google", language: str = "en-US"):
+        import speech_recognition  # optional dependency, raises ImportError without it
+        self.sr = speech_recognition
+        self.recognizer = speech_recognition.Recognizer()
+        self.engine = engine
+        self.language = language
+        self._recognize = getattr(self.recognizer, f"recognize_{engine}", None)
+        if self._recognize is None:
+            raise ValueError(f"SpeechRecognition has no {engine} recognizer")
+    
+    def describe(self) -> str:
+        return f"SpeechRecognition ({self.engine})"
+    
+    def transcribe(self, samples, rate: int) -> str:
+        audio = self.sr.AudioData(samples.astype("<i2").tobytes(), rate, 2)
+        kwargs = {"language": self.language} if self.language else {}
+        try:
+            return self._recognize(audio, **kwargs) or ""
+        except self.sr.UnknownValueError:
+            return ""  # nothing intelligible
+        except self.sr.RequestError as e:
+            raise BackendError(f"Speech recognition error: {e}") from e
+
+
+@dataclass
+class Utterance:
+    """One transcribed stretch of speech"""
+    text: str
+    seconds: float                                           # length of the audio sent to the recognizer
+    detected_at: float                                       # monotonic time the end of speech was detected
+    timings: Dict[str, float] = field(default_factory=dict)  # endpoint, recognize (seconds)
+
+
+class VoiceInput:
+    """Turns a stream of PCM blocks into transcribed utterances
+    
+    Only the speech the detector cuts out is sent to the recognizer; silence
+    and noise never leave the process.
+    """
+    
+    def __init__(self, recognizer, rate: int, **vad_options):
+        self.recognizer = recognizer
+        self.rate = rate
+        self.vad = VoiceActivityDetector(rate, **vad_options)
+        self.errors = 0
+        self.last_error = ""
+    
+    def utterances(self, blocks: Iterator) -> Generator[Utterance, None, None]:
+        """Transcripts in speaking order; unintelligible or failed ones are skipped"""
+        for block in blocks:
+            with PROFILER.span("vad", samples=len(block)):
+                segments = self.vad.feed(block)
+            for audio in segments:
+                heard = self._recognize(audio, self.vad.end_delay)
+                if heard:
+                    yield heard
+        for audio in self.vad.flush():
+            heard = self._recognize(audio, 0.0)  # the audio ended, not the speech
+            if heard:
+                yield heard
+    
+    def _recognize(self, audio, endpoint: float) -> Optional[Utterance]:
+        detected = time.monotonic()
+        try:
+            with PROFILER.span("recognize", seconds=len(audio) / self.rate):
+                text = self.recognizer.transcribe(audio, self.rate).strip()
+        except Exception as e:
+            self.errors += 1
+            self.last_error = str(e)
+            return None
+        if not text:
+            return None
+        return Utterance(text, len(audio) / self.rate, detected,
+                         {"endpoint": endpoint, "recognize": time.monotonic() - detected})
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# JARVIS CORE
+# ═══════════════════════════════════════════════════════════════════════════════
+
+@dataclass
+class TurnInfo:
+    """What actually served a turn, filled in by Jarvis.aget_response"""
+    backend: str = ""
+    model: str = ""
+    cached: bool = False
+    hedged: bool = False
+    routing: Optional[RoutingDecision] = None
+    error: str = ""
+    prompt_tokens: int = 0                                   # estimated tokens sent (system, history, question)
+    tokens: int = 0                                          # estimated output tokens
+    tokens_per_second: float = 0.0
+    timings: Dict[str, float] = field(default_factory=dict)  # routing, connect, ttft, turn (seconds)
+
+
+class Jarvis:
+    """Main JARVIS System"""
+    
+    def __init__(self):
+        self.config = Config()
+        self.transport = HTTPTransport(
+            pool_connections=self.config.http_pool_connections,
+            pool_maxsize=self.config.http_pool_maxsize,
+            connect_timeout=self.config.http_connect_timeout,
+            read_timeout=self.config.http_read_timeout,
+        )
+        retry = RetryPolicy(self.config.retry_attempts, self.config.retry_base_delay,
+                            self.config.retry_max_delay)
+        self.ollama = OllamaClient([self.config.ollama_host, *self.config.ollama_hosts],
+                                   transport=self.transport, keep_alive=self.config.ollama_keep_alive,
+                                   options=self.config.ollama_options, retry=retry,
+                                   breaker_threshold=self.config.breaker_threshold,
+                                   breaker_cooldown=self.config.breaker_cooldown)
+        self.claude = ClaudeClient(self.config.anthropic_api_key, transport=self.transport,
+                                   prompt_cache=self.config.claude_prompt_cache, retry=retry)
+        self.metrics = Metrics(self.config.metrics_log_path)
+        self.health = HealthMonitor(self.ollama, self.claude, ttl=self.config.health_ttl,
+                                    metrics=self.metrics,
+                                    breaker_threshold=self.config.breaker_threshold,
+                                    breaker_cooldown=self.config.breaker_cooldown)
+        self.history = HistoryManager(
+            budgets={
+                "local": self.config.history_budget_local,
+                "cloud": self.config.history_budget_cloud,
+            },
+            keep_turns=self.config.history_keep_turns,
+            summarizer=self._summarize,
+        )
+        self.session_start = datetime.now()
+        self.router = RoutingEngine(
+            local_weights=self.config.routing_local_weights,
+            cloud_weights=self.config.routing_cloud_weights,
+        )
+        self.last_routing: Optional[RoutingDecision] = None
+        self.latency = LatencyModel(local_parallel=self.config.routing_local_parallel * len(self.ollama.hosts))
+        PROFILER.trace_dir = self.config.profile_dir
+        self.context = ContextPlanner(
+            claude_context=self.config.claude_context,
+            claude_max_tokens=self.config.claude_max_tokens,
+            ctx_min=self.config.ollama_ctx_min,
+            ctx_max=self.config.ollama_ctx_max,
+            answer_tokens=self.config.ollama_answer_tokens,
+            fixed_ctx=self.config.ollama_options.get("num_ctx"),
+        )
+        self.ollama.num_ctx = self.context.num_ctx
+        self.in_flight: Dict[str, int] = {"local": 0, "cloud": 0}  # backend streams open right now
+        self.queued: Dict[str, int] = {"local": 0, "cloud": 0}  # routed turns waiting for a batch/server slot
+        self.hedge_log: deque = deque(maxlen=200)
+        self.warm_state: Dict[str, str] = {}  # local model → "loading", "loaded in 3.2s", ...
+        self._warm_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None  # session loop, created by run()
+        self._exit_requested = False
+        self.cache: Optional[ResponseCache] = None
+        try:
+            self.cache = ResponseCache(
+                self.config.response_cache_path,
+                ttl=self.config.response_cache_ttl,
+                max_entries=self.config.response_cache_max_entries,
+                max_bytes=int(self.config.response_cache_max_mb * 1024 * 1024),
+            )
+        except (sqlite3.Error, OSError):
+            pass  # Run uncached rather than refuse to start
+        self.memory: Optional[MemoryIndex] = None  # opened in the background by run()
+        self.memory_status = ""
+        self._memory_pending: List[Dict] = []
+        self._memory_worker: Optional[threading.Thread] = None
+        self._memory_lock = threading.Lock()
+        self.voice: Optional[SpeechPipeline] = None  # started by start_voice()
+        self.voice_input: Optional[VoiceInput] = None  # set up by listen()
+        self.sessions: Optional[SessionStore] = None
+        self.session_id: Optional[str] = None
+        if self.config.session_store_path:
+            try:
+                self.sessions = SessionStore(self.config.session_store_path)
+            except (sqlite3.Error, OSError):
+                pass
+    
+    def check_systems(self) -> Tuple[bool, bool]:
+        """Cached availability of all AI systems (no network on this path)"""
+        return self.health.is_healthy("local"), self.health.is_healthy("cloud")
+    
+    def process_input(self, user_input: str) -> Optional[str]:
+        """Process user input - returns response for commands, None to continue"""
+        cmd = user_input.strip().lower()
+        
+        # Exit commands
+        if cmd in ['exit', 'quit', 'bye', 'goodbye']:
+            self._goodbye()
+            sys.exit(0)
+        
+        # Help
+        if cmd == 'help':
+            return self._help_text()
+        
+        # Status
+        if cmd == 'status':
+            ollama_ok, claude_ok = self.check_systems()
+            display_status(ollama_ok, claude_ok, self.health.get("local").models, self.config.mode,
+                           self._status_rows())
+            return None
+        
+        # Mode changes
+        if cmd == 'mode local':
+            self.config.mode = 'local'
+            self.warm_up()
+            return "Switched to [yellow]LOCAL[/] mode (Ollama - unrestricted)"
+        if cmd == 'mode cloud':
+            self.config.mode = 'cloud'
+            return "Switched to [cyan]CLOUD[/] mode (Claude)"
+        if cmd == 'mode auto':
+            self.config.mode = 'auto'
+            self.warm_up()
+            return "Switched to [green]AUTO[/] mode (intelligent routing)"
+        
+        # Hedging
+        if cmd == 'hedge off':
+            self.config.hedge_deadline = 0.0
+            return "Hedging disabled."
+        hedge = re.fullmatch(r'hedge (\d+(?:\.\d*)?|\.\d+)s?', cmd)
+        if hedge:
+            self.config.hedge_deadline = float(hedge.group(1))
+            return f"Hedging after [yellow]{self.config.hedge_deadline:g}s[/] without a first token (auto mode)."
+        
+        # Clear history (and start a fresh session)
+        if cmd == 'clear':
+            self.history.clear()
+            if self.session_id:
+                self._start_session()
+            return "Conversation history cleared, sir."
+        
+        # Saved sessions
+        if cmd == 'sessions':
+            return self._sessions_text()
+        if cmd == 'sessions compact':
+            if not self.sessions:
+                return "[red]Session store unavailable.[/]"
+            count = self.sessions.compact(self.config.session_compact_after_days * 86400,
+                                          self.config.history_keep_turns)
+            return f"Compacted {count} session(s) older than {self.config.session_compact_after_days:g} days."
+        # Only a session id (or id prefix) argument: "resume writing tips" is a question
+        resume = re.fullmatch(r'resume(?: (\d[\w.-]*))?', cmd)
+        if resume:
+            return self._resume(resume.group(1) or "")
+        
+        # History budget
+        if cmd == 'history':
+            return self._history_text()
+        
+        # Response cache
+        if cmd in ('cache', 'cache stats'):
+            return self._cache_text()
+        if cmd == 'cache clear':
+            if not self.cache:
+                return "[red]Response cache unavailable.[/]"
+            return f"Response cache cleared ({self.cache.clear()} entries), sir."
+        
+        # Latency metrics
+        if cmd == 'stats':
+            return self._stats_text()
+        if cmd == 'stats export':
+            if not self.export_metrics():
+                return "[red]Could not write metrics (metrics_prom_path unset or not writable).[/]"
+            return f"Metrics written to [yellow]{self.config.metrics_prom_path}[/]"
+        if cmd == 'stats reset':
+            self.metrics.reset()
+            return "Metrics reset, sir."
+        
+        # List models
+        if cmd == 'models':
+            local = self.health.get("local")
+            if local.models:
+                return "Local models ([green]●[/] loaded in memory):\n  " + "\n  ".join(
+                    f"[green]●[/] {m}" if m in local.resident else f"  {m}" for m in local.models
+                )
+            return "[red]No local models found.[/]"
+        words = user_input.split()
+        if len(words) == 2 and words[0].lower() == 'model':
+            # Only a known model name makes this a command; "model railways" is a question
+            model = words[1]
+            models = self.health.get("local").models
+            if models and OllamaClient.canonical(model) in models:
+                self.config.ollama_model = model
+                self.warm_up()
+                return f"Local model set to [yellow]{model}[/], loading in the background."
+            if models and ":" in model:
+                return f"[red]{model} is not installed. Try: ollama pull {model}[/]"
+        
+        # Voice output
+        if cmd == 'voice':
+            return " · ".join(self._voice_row()[1:])
+        if cmd == 'voice off':
+            self.stop_voice()
+            return "Voice output off."
+        if cmd == 'voice on':
+            return self.start_voice()
+        if cmd.startswith('voice on '):
+            # Only a path ("~/audio", "./out", an existing dir): "voice on a phone call vs VoIP?" is a question
+            directory = user_input.strip().split(None, 2)[2]
+            if os.path.isdir(os.path.expanduser(directory)) or (
+                    len(directory.split()) == 1 and (directory[0] in "/~." or os.sep in directory)):
+                return self.start_voice(directory)
+        
+        # Profiling
+        # "profile of a good engineer" is a question, not a usage error
+        if re.fullmatch(r'profile(?: off| on(?: cpu| memory)*)?', cmd):
+            return self._profile(cmd.split()[1:])
+        
+        # Reactor animation
+        if cmd == 'reactor':
+            animate_startup()
+            return None
+        
+        return "NOT_COMMAND"
+    
+    def _profile(self, args: List[str]) -> str:
+        """profile on [cpu] [memory] | profile off | profile"""
+        where = f"[yellow]{PROFILER.trace_dir}[/]" if PROFILER.trace_dir else "nowhere (profile_dir unset)"
+        if not args:
+            last = f" · last: {PROFILER.last_path}" if PROFILER.last_path else ""
+            return f"Profiling {PROFILER.describe()}, {PROFILER.written} trace(s) written to {where}{last}"
+        if args[0] == "off":
+            PROFILER.stop()
+            return f"Profiling off. {PROFILER.written} trace(s) in {where}"
+        PROFILER.start(cpu="cpu" in args, memory="memory" in args)
+        return (f"Profiling {PROFILER.describe()}: each turn is written to {where} "
+                f"as a Chrome trace (open in ui.perfetto.dev).")
+    
+    def start_voice(self, directory: Optional[str] = None) -> str:
+        """Speak answers from now on (or write them to directory); returns a message"""
+        directory = self.config.voice_output_dir if directory is None else os.path.expanduser(directory)
+        if not self.config.elevenlabs_api_key:
+            return "[red]Voice output needs ELEVENLABS_API_KEY.[/]"
+        try:
+            output = AudioFiles(directory) if directory else Speaker()
+        except ImportError:
+            return "[red]Playing audio needs pydub (pip install pydub); `voice on <dir>` writes files instead.[/]"
+        except OSError as e:
+            return f"[red]Cannot write audio to {directory}: {e}[/]"
+        self.stop_voice()
+        tts = ElevenLabsTTS(self.config.elevenlabs_api_key, self.config.voice_id, self.config.voice_model,
+                            self.config.voice_format, transport=self.transport)
+        self.voice = SpeechPipeline(tts, output, workers=self.config.voice_workers,
+                                    queue_size=self.config.voice_queue)
+        self.config.voice_enabled = True
+        return f"Voice output on: {self.voice.describe()}"
+    
+    def listen(self, source: str) -> Generator[Utterance, None, None]:
+        """Transcribed utterances from "mic", a WAV file or "-" (raises ImportError, ValueError, OSError)"""
+        recognizer = SpeechRecognizer(self.config.listen_engine, self.config.listen_language)
+        rate, blocks = open_audio(source, self.config.listen_rate)
+        self.voice_input = VoiceInput(recognizer, rate, frame_ms=self.config.listen_frame_ms,
+                                      end_ms=self.config.listen_end_ms,
+                                      min_speech_ms=self.config.listen_min_speech_ms,
+                                      ratio=self.config.listen_ratio)
+        return self.voice_input.utterances(blocks)
+    
+    def _hear(self, utterances: Generator[Utterance, None, None]) -> Utterance:
+        """Next spoken question, echoed as if typed; EOFError when the audio ends"""
+        heard = next(utterances, None)
+        if heard is None:
+            if self.voice:
+                self.voice.wait(self.config.http_read_timeout)  # finish speaking the last answer
+            raise EOFError
+        # Recognizers punctuate; "Exit." should still be the exit command
+        if len(heard.text.split()) <= 3:
+            heard.text = heard.text.rstrip(".!?")
+        if RICH_AVAILABLE:
+            console.print("[bold yellow]You:[/] ", end="")
+            console.print(heard.text, markup=False, highlight=False)
+        else:
+            print(f"You: {heard.text}")
+        return heard
+    
+    def _speech_latency(self, heard: Utterance, asked: float, info: TurnInfo) -> str:
+        """End of speech to first token, by stage, for a spoken question"""
+        ttft = info.timings.get("ttft")
+        if ttft is None:
+            return ""
+        endpoint, recognize = heard.timings["endpoint"], heard.timings["recognize"]
+        total = endpoint + (asked + ttft - heard.detected_at)
+        backend, model = ("cache", "") if info.cached else (info.backend, info.model)
+        self.metrics.observe("recognize_seconds", recognize)
+        self.metrics.observe("speech_to_token_seconds", total, backend, model)
+        return (f"end of speech → first token {total:.2f}s: endpoint {endpoint:.2f}s · "
+                f"recognize {recognize:.2f}s · first token {ttft:.2f}s")
+    
+    def stop_voice(self):
+        if self.voice is not None:
+            self.voice.cancel()
+            self.voice.close()
+            self.voice = None
+        self.config.voice_enabled = False
+    
+    def _status_rows(self) -> List[Tuple[str, str, str]]:
+        """Extra rows for the status table"""
+        conn = self.transport.connection_stats()
+        usage = self.claude.usage_totals
+        rows = []
+        for name in ("local", "cloud"):
+            h = self.health.get(name)
+            age = time.monotonic() - h.checked_at
+            detail = f"checked {age:.0f}s ago"
+            if h.error:
+                detail += f" · {textwrap.shorten(h.error, 60)}"
+            rows.append((f"Health ({name})", "[green]ok[/]" if h.healthy else "[red]down[/]", detail))
+        rows += [self._host_row(host) for host in self.ollama.hosts]
+        for name, client in (("local", self.ollama), ("cloud", self.claude)):
+            rows.append(self._breaker_row(name, client.retries))
+        model = self.config.ollama_model
+        resident = self.health.get("local").resident
+        others = [m for m in resident if m != OllamaClient.canonical(model)]
+        detail = "[green]in memory[/]" if len(others) < len(resident) else self.warm_state.get(model, "not loaded")
+        detail += f" · keep_alive {self.config.ollama_keep_alive}"
+        if others:
+            detail += f" · also loaded: {', '.join(others)}"
+        rows.append(("Local model", model, detail))
+        return rows + [
+            ("Connections", f"{conn['opened']} opened",
+             f"{conn['reused']} reused / {conn['requests']} requests"),
+            ("Last routing", self.last_routing.backend if self.last_routing else "—",
+             self.last_routing.explain() if self.last_routing else "no auto-routed query yet"),
+            self._latency_row(),
+            ("Context", f"num_ctx {self.context.num_ctx:,}",
+             f"max_tokens {self.config.claude_max_tokens:,} · estimates {self.context.describe()}"),
+            ("Hedging", f"{self.config.hedge_deadline:g}s" if self.config.hedge_deadline else "off",
+             self._hedge_summary()),
+            self._memory_row(),
+            self._voice_row(),
+            ("Session", self.session_id or "—",
+             f"{self.history.turn_count()} turns in context" if self.session_id else "not saved"),
+            ("Prompt cache", "on" if self.claude.prompt_cache else "off",
+             f"read {usage['cache_read_input_tokens']:,} · written "
+             f"{usage['cache_creation_input_tokens']:,} · uncached {usage['input_tokens']:,} tokens"),
+        ]
+    
+    def _latency_row(self) -> Tuple[str, str, str]:
+        local = self.health.get("local")
+        detail = " · ".join(f"{name} {self.latency.describe(name, self._model_for(name))}"
+                            for name in ("local", "cloud"))
+        if local.cpu is not None:
+            detail += f" · host cpu {local.cpu:.0f}% mem {local.memory:.0f}%"
+        return ("Latency model", "on" if self.config.routing_latency_aware else "off", detail)
+    
+    def _host_row(self, host: OllamaHost) -> Tuple[str, str, str]:
+        state = host.breaker.state
+        if not host.healthy:
+            status = "[red]down[/]"
+        elif state == "open":
+            status = "[red]ejected[/]"
+        else:
+            status = "[yellow]half-open[/]" if state == "half-open" else "[green]ok[/]"
+        detail = f"{host.outstanding} in flight · {host.served} served"
+        if host.resident:
+            detail += f" · loaded: {', '.join(host.resident)}"
+        if state == "open":
+            detail += f" · back in {host.breaker.remaining():.0f}s"
+        error = host.error or (host.breaker.last_error if host.breaker.failures else "")
+        if error:
+            detail += f" · {textwrap.shorten(error, 40)}"
+        return (f"Ollama {host.label}", status, detail)
+    
+    def _breaker_row(self, name: str, retries: int) -> Tuple[str, str, str]:
+        breaker = self.health.breakers[name]
+        state = breaker.state
+        if state == "open":
+            status, detail = "[red]open[/]", f"skipped for another {breaker.remaining():.0f}s"
+        elif state == "half-open":
+            status, detail = "[yellow]half-open[/]", "next call decides"
+        else:
+            status = "[green]closed[/]"
+            detail = f"{breaker.failures} failed in a row" if breaker.failures else "no recent failures"
+        detail += f" · tripped {breaker.trips}× · {retries} retries"
+        if name == "local" and len(self.ollama.hosts) > 1:
+            detail += f" · {self.ollama.failovers} failed over"
+        if breaker.failures and breaker.last_error:
+            detail += f" · {textwrap.shorten(breaker.last_error, 40)}"
+        return (f"Circuit ({name})", status, detail)
+    
+    def _memory_row(self) -> Tuple[str, str, str]:
+        if self.memory is None:
+            return ("Memory", "off", self.memory_status or ("disabled" if not self.config.memory_enabled
+                                                              else "loading"))
+        timings = []
+        for name, label in (("embed_seconds", "embed"), ("memory_search_seconds", "search")):
+            h = self.metrics.get(name, "local", self.config.memory_model)
+            if h and h.count:
+                timings.append(f"{label} p50 {h.quantile(0.5) * 1000:.0f}ms")
+        if self.memory_status:
+            timings.append(self.memory_status)
+        return ("Memory", f"{len(self.memory):,} exchanges", " · ".join(timings) or self.config.memory_model)
+    
+    def _voice_row(self) -> Tuple[str, str, str]:
+        voice = self.voice
+        if voice is None:
+            return ("Voice", "off", "[yellow]voice on[/] to speak answers")
+        detail = [voice.describe(), f"{voice.spoken} segments"]
+        if voice.first_audio is not None:
+            detail.append(f"first audio {voice.first_audio:.2f}s into the last answer")
+        if voice.pending:
+            detail.append(f"{voice.pending} pending")
+        if voice.merged:
+            detail.append(f"{voice.merged} merged")
+        if voice.errors:
+            detail.append(f"{voice.errors} errors ({textwrap.shorten(voice.last_error, 60)})")
+        if voice.skipped:
+            detail.append(f"{voice.skipped} skipped")
+        state = voice.breaker.state
+        return ("Voice", "on" if state == "closed" else f"[red]{state}[/]", " · ".join(detail))
+    
+    def _history_text(self) -> str:
+        """Describe the history window and its token budgets"""
+        h = self.history
+        lines = [f"{h.turn_count()} turns verbatim, {h.folded_turns} folded into summary"]
+        for name in ("local", "cloud"):
+            used = h.usage(name)
+            budget = h.budgets[name]
+            share = f" ({used / budget:.0%})" if budget else " (unbounded)"
+            lines.append(f"  [yellow]{name:<7}[/] {used:>6,} / {budget:,} tokens{share}")
+        pending = h.pending()
+        lines.append(f"  [yellow]summary[/] {h.summary_tokens():>6,} tokens"
+                     + (f" · {pending} messages awaiting fold" if pending else ""))
+        return "History window:\n" + "\n".join(lines)
+    
+    def _cache_text(self) -> str:
+        """Describe response cache usage"""
+        if not self.cache:
+            return "[red]Response cache unavailable.[/]"
+        st = self.cache.stats()
+        modes = ", ".join(self.config.response_cache_modes) or "none"
+        return (
+            "Response cache:\n"
+            f"  [yellow]entries[/]  {st['entries']:,} ({st['bytes'] / 1024:.1f} KB of "
+            f"{self.config.response_cache_max_mb:g} MB)\n"
+            f"  [yellow]session[/]  {st['hits']} hits / {st['misses']} misses ({st['hit_rate']:.0%})\n"
+            f"  [yellow]lifetime[/] {st['lifetime_hits']:,} hits\n"
+            f"  [yellow]modes[/]    {modes}"
+        )
+    
+    def _stats_text(self) -> str:
+        """Per backend/model latency percentiles from the metrics histograms"""
+        m = self.metrics
         
-        # Add to history
-        self.history.append({"role": "user", "content": user_input})
-        
-        # Get response
-        response_text = ""
+        def seconds(v: float) -> str:
+            if v < 0.01:
+                return f"{v * 1000:.1f}ms"
+            return f"{v * 1000:.0f}ms" if v < 1 else f"{v:.2f}s"
         
-        if use_cloud:
-            mode_indicator = "[cyan]☁[/] "
-            gen = self.claude.chat(
-                messages=self.history,
-                model=self.config.claude_model,
-                system=CLOUD_SYSTEM_PROMPT
-            )
+        def pct(name: str, backend: str, model: str = "", fmt: Callable[[float], str] = seconds) -> str:
+            h = m.get(name, backend, model)
+            if not h or not h.count:
+                return "—"
+            return f"{fmt(h.quantile(0.5))}/{fmt(h.quantile(0.95))}"
+        
+        lines = ["Latency, p50/p95:"]
+        for backend, model in m.backends():
+            counts = {o: n for (b, mo, o), n in m.turns.items() if (b, mo) == (backend, model)}
+            detail = ", ".join(f"{n} {o}" for o, n in sorted(counts.items()))
+            lines.append(f"  [yellow]{backend}[/] {model} [dim]({detail})[/]")
+            lines.append(f"    routing {pct('routing_seconds', backend, model)} · "
+                         f"connect {pct('connect_seconds', backend, model)} · "
+                         f"first token {pct('ttft_seconds', backend, model)}")
+            lines.append(f"    token gap {pct('inter_token_seconds', backend, model)} · "
+                         f"speed {pct('tokens_per_second', backend, model, lambda v: f'{v:.0f}')} tok/s · "
+                         f"total {pct('turn_seconds', backend, model)}")
+        if len(lines) == 1:
+            lines.append("  no turns yet")
+        probes = [f"{name} {pct('health_probe_seconds', name)}" for name in ("local", "cloud")]
+        lines.append(f"  [yellow]health probes[/] {' · '.join(probes)}")
+        if self.config.metrics_log_path:
+            lines.append(f"  [dim]turn log: {self.config.metrics_log_path}[/]")
+        return "\n".join(lines)
+    
+    def export_metrics(self) -> bool:
+        """Write the Prometheus text file, if one is configured"""
+        path = self.config.metrics_prom_path
+        return bool(path) and self.metrics.write_prometheus(path)
+    
+    def _start_session(self, session_id: Optional[str] = None):
+        """Log the interactive history to a new (or resumed) session from here on"""
+        if not self.sessions:
+            return
+        self.session_id = sid = session_id or SessionStore.new_id()
+        self.history.on_append = lambda m: self._persist(self.sessions.append, sid, m)
+        self.history.on_summary = lambda summary, folded: self._persist(
+            self.sessions.set_summary, sid, summary, folded
+        )
+    
+    @staticmethod
+    def _persist(write: Callable, *args):
+        try:
+            write(*args)
+        except sqlite3.Error:
+            pass  # never fail a turn over the session log
+    
+    def _resume(self, prefix: str) -> str:
+        """Swap the current conversation for a saved one (newest other session by default)"""
+        if not self.sessions:
+            return "[red]Session store unavailable.[/]"
+        if prefix:
+            session = self.sessions.find(prefix)
+        else:
+            session = next((s["id"] for s in self.sessions.list(2) if s["id"] != self.session_id), None)
+        if session is None:
+            return f"[red]No session matching '{prefix}'.[/]" if prefix else "[red]No earlier session.[/]"
+        
+        budgets = self.history.budgets.values()
+        state = self.sessions.load(session, 0 if 0 in budgets else max(budgets))
+        self.history.restore(state["summary"], state["folded"], state["folded_turns"],
+                             state["messages"], state["pending"])
+        self._start_session(session)
+        folded = state["folded_turns"]
+        return (f"Resumed session [yellow]{session}[/]: {self.history.turn_count()} turns in context"
+                + (f", {folded} earlier turns summarized" if folded else "") + ".")
+    
+    def _sessions_text(self) -> str:
+        """Recent sessions, newest first"""
+        if not self.sessions:
+            return "[red]Session store unavailable.[/]"
+        sessions = self.sessions.list(10)
+        if not sessions:
+            return "No saved sessions yet."
+        lines = ["Recent sessions ([yellow]resume <id>[/] to continue one):"]
+        for s in sessions:
+            when = datetime.fromtimestamp(s["updated"]).strftime("%b %d %H:%M")
+            marker = " [green]← current[/]" if s["id"] == self.session_id else ""
+            compacted = " [dim](compacted)[/]" if s["compacted"] else ""
+            lines.append(f"  [yellow]{s['id']}[/]  {when}  {s['turns']:>3} turns  "
+                         f"{s['title']}{compacted}{marker}")
+        return "\n".join(lines)
+    
+    def warm_up(self, model: Optional[str] = None):
+        """Load the local model on a background thread unless Ollama already has it in memory"""
+        model = model or self.config.ollama_model
+        if not self.config.ollama_preload:
+            return
+        with self._warm_lock:
+            if self.warm_state.get(model) == "loading":
+                return
+            self.warm_state[model] = "loading"
+        threading.Thread(target=self._warm, args=(model,), name="jarvis-warmup", daemon=True).start()
+    
+    def _warm(self, model: str):
+        self.health.wait_ready(timeout=self.config.http_connect_timeout + 2)
+        local = self.health.get("local")
+        if not local.healthy:
+            self.warm_state.pop(model, None)
+            return
+        if OllamaClient.canonical(model) in local.resident:
+            self.warm_state[model] = "in memory"
+            return
+        start = time.monotonic()
+        if self.ollama.warm(model):
+            elapsed = time.monotonic() - start
+            self.warm_state[model] = f"loaded in {elapsed:.1f}s"
+            self.latency.observe_load(model, elapsed)
+            self.health.refresh(force=True)  # pick up the new /api/ps listing
+        else:
+            self.warm_state[model] = "[red]load failed[/]"
+    
+    def _summarize(self, previous: str, messages: List[Dict]) -> str:
+        """Fold evicted turns into the running summary using the local model"""
+        if not self.health.is_healthy("local"):
+            return ""
+        transcript = "\n".join(
+            f"{'Carlos' if m['role'] == 'user' else 'JARVIS'}: {m['content']}" for m in messages
+        )
+        prompt = f"EXISTING SUMMARY:\n{previous or '(none)'}\n\nNEW EXCHANGES:\n{transcript}"
+        chunks = []
+        for chunk in self.ollama.chat(
+            [{"role": "system", "content": SUMMARY_PROMPT}, {"role": "user", "content": prompt}],
+            self.config.ollama_model,
+        ):
+            if not isinstance(chunk, Notice):
+                chunks.append(chunk)
+        return "".join(chunks).strip()
+    
+    def _hedge_summary(self) -> str:
+        log = list(self.hedge_log)
+        if not log:
+            return "no hedged turns yet"
+        hedged = [o for o in log if o["hedged"]]
+        flips = sum(1 for o in hedged if o["winner"] and o["winner"] != o["primary"])
+        return f"hedged {len(hedged)}/{len(log)} turns · other backend won {flips}"
+    
+    def _help_text(self) -> str:
+        """Generate help text"""
+        return """
+[bold cyan]━━━ Commands ━━━[/]
+
+[yellow]mode local[/]     Switch to local AI (Ollama - unrestricted)
+[yellow]mode cloud[/]     Switch to cloud AI (Claude)
+[yellow]mode auto[/]      Intelligent routing based on query
+
+[yellow]hedge <s>|off[/]  Race the other backend if no token within <s> seconds
+
+[yellow]status[/]         Show system status
+[yellow]models[/]         List available local models
+[yellow]model <name>[/]   Switch the local model (loads it in the background)
+[yellow]history[/]        Show history window and token budget
+[yellow]stats[/]          Latency and throughput per backend ([yellow]stats export[/] / [yellow]stats reset[/])
+[yellow]cache stats[/]    Show response cache usage
+[yellow]cache clear[/]    Empty the response cache
+[yellow]clear[/]          Clear conversation history (starts a new session)
+[yellow]sessions[/]       List saved sessions ([yellow]sessions compact[/] to shrink old ones)
+[yellow]resume [id][/]    Continue a saved session (default: the previous one)
+[yellow]voice on [dir][/]  Speak answers as they stream (or write audio files to dir; [yellow]voice off[/])
+[yellow]profile on[/]     Trace each turn for a trace viewer ([yellow]profile on cpu memory[/] / [yellow]profile off[/])
+[yellow]reactor[/]        Replay startup animation
+[yellow]help[/]           Show this help
+[yellow]exit[/]           Shutdown JARVIS
+"""
+
+    def _goodbye(self):
+        """Goodbye message"""
+        self.export_metrics()
+        self.stop_voice()
+        if load_rich():
+            console.print()
+            console.print("[cyan]JARVIS:[/] Shutting down. Until next time, sir.")
+            time.sleep(0.5)
         else:
-            mode_indicator = "[yellow]⚡[/] "
-            messages = [{"role": "system", "content": LOCAL_SYSTEM_PROMPT}] + self.history
-            gen = self.ollama.chat(messages, self.config.ollama_model)
+            print("\nJARVIS: Shutting down. Until next time, sir.")
+    
+    def get_response(self, user_input: str) -> Generator[str, None, None]:
+        """Get AI response with streaming (blocking view of aget_response)"""
+        return iterate_sync(self.aget_response(user_input))
+    
+    def choose_backend(self, user_input: str, mode: Optional[str] = None,
+                       history: Optional[HistoryManager] = None
+                       ) -> Tuple[Optional[str], Optional[RoutingDecision], List[Notice]]:
+        """Pick a backend for this input from cached health
+        
+        history, if given, is the conversation the input continues, counted
+        towards the prompt's size. Returns (backend or None if nothing is up,
+        the auto-routing decision, notices describing any fallback).
+        """
+        mode = mode or self.config.mode
+        ollama_ok, claude_ok = self.check_systems()
+        routing = None
+        
+        # Determine which system to use
+        if mode == 'local':
+            use_cloud = False
+        elif mode == 'cloud':
+            use_cloud = True
+        else:  # auto
+            routing = self.router.route(user_input)
+            if ollama_ok and claude_ok and not routing.private:
+                prompt = {name: self._prompt_estimate(name, user_input, history) for name in ("local", "cloud")}
+                if not self.context.fits_local(prompt["local"]):
+                    # Ollama would silently drop the start of the prompt
+                    routing.backend = "cloud"
+                    routing.oversized = (f"too long for local: ~{prompt['local']:,} tokens "
+                                         f"vs num_ctx limit {self.context.ctx_max:,}")
+                elif self.config.routing_latency_aware and routing.local_score == routing.cloud_score:
+                    self._route_by_latency(routing, prompt)
+            use_cloud = (routing.backend == 'cloud')
+        
+        # Fallback logic
+        notices: List[Notice] = []
+        if use_cloud and not claude_ok:
+            if not ollama_ok:
+                return None, routing, [StreamError("No AI systems available.")]
+            use_cloud = False
+            notices.append(Notice("[dim](Cloud unavailable, using local)[/]\n"))
+        
+        if not use_cloud and not ollama_ok:
+            if not claude_ok:
+                return None, routing, [StreamError("No AI systems available.")]
+            use_cloud = True
+            notices.append(Notice("[dim](Local unavailable, using cloud)[/]\n"))
+        
+        return ("cloud" if use_cloud else "local"), routing, notices
+    
+    def _prompt_estimate(self, backend: str, user_input: str, history: Optional[HistoryManager]) -> int:
+        """Calibrated size of the prompt a turn would send, before its window is built"""
+        system = CLOUD_SYSTEM_PROMPT if backend == "cloud" else LOCAL_SYSTEM_PROMPT
+        tokens = estimate_tokens(system) + estimate_tokens(user_input) + 2 * MESSAGE_OVERHEAD
+        if history is not None:
+            used = history.usage(backend)
+            tokens += min(used, history.budgets.get(backend) or used) + MESSAGE_OVERHEAD * len(history)
+        return self.context.estimate(backend, tokens)
+    
+    def _route_by_latency(self, routing: RoutingDecision, prompt: Dict[str, int]):
+        """Send a query the keywords have no opinion on to whichever backend should finish first"""
+        counts = {name: self.latency.samples(name, self._model_for(name)) for name in ("local", "cloud")}
+        if min(counts.values()) < LatencyModel.MIN_SAMPLES:
+            # Priors alone would keep one side from ever being measured; normal routing feeds both
+            routing.load_notes = "latency model learning: " + ", ".join(
+                f"{name} {min(n, LatencyModel.MIN_SAMPLES)}/{LatencyModel.MIN_SAMPLES}" for name, n in counts.items())
+            return
+        estimates = {
+            # Turns already routed and queued will run before this one, so they count as load
+            name: self.latency.estimate(name, self._model_for(name), prompt[name],
+                                        self.in_flight[name] + self.queued[name], self.health.get(name))
+            for name in ("local", "cloud")
+        }
+        best = min(estimates.values(), key=lambda e: e.seconds)
+        routing.backend = best.backend
+        routing.estimates = {name: e.seconds for name, e in estimates.items()}
+        routing.load_notes = ", ".join([f"prompt ~{prompt['local']:,} tokens"] + estimates["local"].notes)
+    
+    def new_history(self) -> HistoryManager:
+        """Empty history with this session's budgets, for one-off conversations"""
+        return HistoryManager(self.history.budgets, keep_turns=self.history.keep_turns,
+                              summarizer=self._summarize)
+    
+    async def aget_response(self, user_input: str, history: Optional[HistoryManager] = None,
+                            mode: Optional[str] = None, info: Optional[TurnInfo] = None,
+                            route: Optional[Tuple[Optional[str], Optional[RoutingDecision], List[Notice]]] = None
+                            ) -> AsyncGenerator[str, None]:
+        """Get AI response with streaming
+        
+        history and mode default to the interactive session's; info, if given,
+        is filled in with what actually served the turn. route is the
+        choose_backend result of a caller that already routed the input to
+        pick a queue, so the turn runs where it waited. The exchange is added
+        to history once the turn ends, except when the backend failed.
+        Cancelling the consumer aborts the backend stream; whatever had
+        arrived by then is kept as the assistant's turn.
+        """
+        history = self.history if history is None else history
+        mode = mode or self.config.mode
+        info = TurnInfo() if info is None else info
+        
+        start = time.monotonic()
+        if route is None:
+            with PROFILER.span("route", mode=mode):
+                route = self.choose_backend(user_input, mode, history)
+            info.timings["routing"] = time.monotonic() - start
+        routed, routing, notices = route
+        if routing and history is self.history:
+            self.last_routing = routing
+        info.routing = routing
+        private = routing is not None and routing.private
+        for notice in notices:
+            yield notice
+        if routed is None:
+            info.error = str(notices[-1])
+            self._record_metrics(info, mode, "unavailable", [])
+            return
+        
+        # Get response, with related past exchanges for the interactive session
+        turn = {"role": "user", "content": user_input}
+        backend = routed
+        with PROFILER.span("recall"):
+            recalled = await self._recall(user_input) if history is self.history else {}
+        with PROFILER.span("build request", backend=backend):
+            model, system_text, window, open_stream, plan = self._request(backend, history, turn, recalled)
+        plans = {backend: plan}
+        info.prompt_tokens = plan.prompt_tokens
+        mode_indicator = MODE_INDICATORS[backend]
+        
+        # Response cache, unless this mode has opted out or the query is private
+        cache_key = None
+        cached = None
+        if self.cache and mode in self.config.response_cache_modes and not private:
+            with PROFILER.span("cache lookup"):
+                cache_key = ResponseCache.make_key(backend, model, system_text, window)
+                cached = self.cache.get(cache_key)
+        
+        parts: List[str] = []
+        gaps: List[float] = []
+        arrivals: List[float] = []  # first and latest token
+        failed = completed = False
+        gen = handle = None
+        streaming = None  # backend counted in self.in_flight
+        
+        def arrived(chunk: str):
+            if not chunk or isinstance(chunk, Notice):
+                return
+            now = time.monotonic()
+            if arrivals:
+                gaps.append(now - arrivals[-1])
+                arrivals[1:] = [now]
+            else:
+                arrivals.append(now)
+        
+        try:
+            if cached is not None:
+                info.cached = True
+                yield Notice(mode_indicator + "[dim]↺[/] ")
+                gen = aiter_sync(ResponseCache.replay(cached))
+            else:
+                if plan.warning:
+                    yield Notice(f"[yellow]({plan.warning})[/]\n")
+                yield Notice(mode_indicator)
+                
+                # Hedge only in auto mode, never for privacy-routed queries, and only
+                # when the other backend is actually up
+                openers = {backend: open_stream}
+                other = "local" if backend == "cloud" else "cloud"
+                if (self.config.hedge_deadline > 0 and mode == 'auto' and not private
+                        and self.health.is_healthy(other)):
+                    def open_other(h: StreamHandle) -> AsyncGenerator:
+                        request = self._request(other, history, turn, recalled)
+                        plans[other] = request[4]
+                        return request[3](h)
+                    openers[other] = open_other
+                
+                with PROFILER.span("first token", backend=backend, prompt_tokens=plan.prompt_tokens):
+                    winner, first, gen, handle = await self._race(openers, backend, self.config.hedge_deadline)
+                failed = isinstance(first, StreamError)
+                if not failed:
+                    streaming = winner  # _race left the winner counted in self.in_flight
+                if winner != backend:
+                    info.hedged = True
+                    backend, model = winner, self._model_for(winner)
+                    yield Notice(f"[dim](hedged to {winner})[/] {MODE_INDICATORS[winner]}")
+                arrived(first)
+                if failed or not isinstance(first, Notice):
+                    parts.append(first)
+                yield first
+            
+            info.backend, info.model = backend, model
+            with PROFILER.span("stream", backend=backend):  # includes the consumer's rendering
+                async for chunk in gen:
+                    if isinstance(chunk, StreamError):
+                        failed = True
+                        self.health.record_failure(backend, str(chunk), chunk.retry_after)
+                    elif isinstance(chunk, Notice):
+                        yield chunk  # e.g. a truncation note: shown, but not part of the answer
+                        continue
+                    arrived(chunk)
+                    parts.append(chunk)
+                    yield chunk
+            completed = True
+        finally:
+            if gen is not None:
+                await gen.aclose()
+            if streaming:
+                self.in_flight[streaming] -= 1
+            info.backend, info.model = backend, model
+            if failed:
+                info.error = next(str(p) for p in parts if isinstance(p, StreamError))
+            response_text = "".join(parts)
+            with PROFILER.span("save turn"):
+                # The key describes the routed backend's request, so a hedged winner isn't cached
+                if (completed and cache_key and cached is None and not failed and response_text.strip()
+                        and backend == routed):
+                    self.cache.put(cache_key, backend, model, response_text)
+                
+                # Save to history (partial if the turn was interrupted); an error is not an answer
+                if not failed:
+                    history.append(turn)
+                    history.append({"role": "assistant", "content": response_text or "[interrupted]"})
+                if completed and not failed and not info.cached:
+                    self.health.record_success(backend)
+                if completed and not failed and history is self.history and response_text.strip():
+                    self._remember(user_input, response_text, backend)
+            
+            end = time.monotonic()
+            info.timings["turn"] = end - start
+            if handle is not None and handle.connect_time is not None:
+                info.timings["connect"] = handle.connect_time
+            if arrivals:
+                info.timings["ttft"] = arrivals[0] - start
+            info.tokens = estimate_tokens("".join(p for p in parts if not isinstance(p, StreamError)))
+            usage = handle.usage if handle is not None else {}
+            if completed and not failed and usage:
+                # The backend's own counts: better numbers for this turn, and a check on our estimates
+                info.tokens = usage.get("output_tokens") or info.tokens
+                if backend in plans:
+                    self.context.calibrate(backend, plans[backend].estimated, usage.get("input_tokens"))
+            if len(arrivals) > 1:
+                info.tokens_per_second = info.tokens / (arrivals[-1] - arrivals[0])
+            outcome = "error" if failed else "cached" if info.cached else "ok" if completed else "cancelled"
+            self._record_metrics(info, mode, outcome, gaps)
+    
+    def _record_metrics(self, info: TurnInfo, mode: str, outcome: str, gaps: List[float]):
+        """Feed one turn's timings into the histograms and the turn log"""
+        # Replayed answers would flatter the backend's numbers, so they get their own series
+        backend, model = ("cache", "") if info.cached else (info.backend, info.model)
+        for name in ("routing", "connect", "ttft", "turn"):
+            self.metrics.observe(f"{name}_seconds", info.timings.get(name), backend, model)
+        if info.tokens_per_second:
+            self.metrics.observe("tokens_per_second", info.tokens_per_second, backend, model)
+        if gaps:
+            self.metrics.observe_many("inter_token_seconds", gaps, backend, model)
+        if outcome == "ok" and not info.hedged:
+            self.latency.observe(backend, model, info.prompt_tokens, info.timings.get("ttft"),
+                                 info.tokens_per_second, info.tokens)
+        self.metrics.record_turn({
+            "at": datetime.now().isoformat(timespec="seconds"),
+            "mode": mode,
+            "backend": backend,
+            "model": model,
+            "outcome": outcome,
+            "hedged": info.hedged,
+            "tokens": info.tokens,
+            "tokens_per_s": round(info.tokens_per_second, 1),
+            **{f"{name}_s": round(value, 5) for name, value in info.timings.items()},
+        })
+    
+    def _open_memory(self):
+        """Load the semantic memory index (imports numpy, so kept off the startup path)"""
+        if not self.config.memory_enabled:
+            return
+        if not NUMPY_AVAILABLE:
+            self.memory_status = "needs numpy (pip install numpy)"
+            return
+        try:
+            self.memory = MemoryIndex(self.config.memory_dir, self.config.memory_model)
+        except (OSError, ValueError, KeyError) as e:
+            self.memory_status = f"[red]unavailable: {e}[/]"
+    
+    def _remember(self, user_input: str, answer: str, backend: str):
+        """Queue a finished exchange for embedding, batched on a background thread"""
+        if self.memory is None:
+            return
+        with self._memory_lock:
+            self._memory_pending.append({
+                "user": user_input,
+                "text": f"Carlos: {user_input}\nJARVIS: {answer}"[:800],
+                "backend": backend,  # cloud prompts only ever see cloud-served exchanges
+                "session": self.session_id,
+                "at": time.time(),
+            })
+            if self._memory_worker is None:
+                self._memory_worker = threading.Thread(target=self._embed_pending, name="jarvis-memory",
+                                                       daemon=True)
+                self._memory_worker.start()
+    
+    def _embed_pending(self):
+        while True:
+            with self._memory_lock:
+                batch = self._memory_pending[:self.config.memory_batch]
+                del self._memory_pending[:len(batch)]
+                if not batch:
+                    self._memory_worker = None
+                    return
+            start = time.monotonic()
+            try:
+                vectors = self.ollama.embed([e["text"] for e in batch], self.config.memory_model)
+                self.memory.add(vectors, batch)
+            except Exception as e:
+                self.memory_status = f"[red]embedding failed: {textwrap.shorten(str(e), 60)}[/]"
+                continue
+            self.metrics.observe("embed_seconds", time.monotonic() - start, "local", self.config.memory_model)
+            self.memory_status = ""
+    
+    async def _recall(self, query: str) -> Dict[str, List[Tuple[float, Dict]]]:
+        """Past exchanges similar to the query, per backend ({} if off, empty or too slow)"""
+        memory = self.memory
+        if memory is None or not len(memory) or not self.health.is_healthy("local"):
+            return {}
+        start = time.monotonic()
+        k, min_score = self.config.memory_top_k, self.config.memory_min_score
+        
+        def lookup():
+            vector = self.ollama.embed([query], self.config.memory_model)[0]
+            return {
+                "local": memory.search(vector, k, min_score=min_score),
+                "cloud": memory.search(vector, k, cloud_only=True, min_score=min_score),
+            }
+        
+        try:
+            recalled = await asyncio.wait_for(asyncio.get_running_loop().run_in_executor(None, lookup),
+                                              self.config.memory_timeout)
+        except asyncio.TimeoutError:
+            self.memory_status = "last lookup timed out"
+            return {}
+        except Exception as e:
+            self.memory_status = f"[red]lookup failed: {textwrap.shorten(str(e), 60)}[/]"
+            return {}
+        self.metrics.observe("memory_search_seconds", time.monotonic() - start, "local", self.config.memory_model)
+        return recalled
+    
+    def _memory_text(self, hits: List[Tuple[float, Dict]], window: List[Dict]) -> str:
+        """Retrieved exchanges that aren't already in the window, within the token budget"""
+        in_window = {m["content"] for m in window if m["role"] == "user"}
+        snippets: List[str] = []
+        used = 0
+        for _, entry in hits:
+            cost = estimate_tokens(entry["text"])
+            if entry["user"] in in_window or used + cost > self.config.memory_budget:
+                continue
+            snippets.append(entry["text"])
+            used += cost
+        return memory_section(snippets)
+    
+    def _model_for(self, backend: str) -> str:
+        return self.config.claude_model if backend == "cloud" else self.config.ollama_model
+    
+    def _request(self, backend: str, history: HistoryManager, turn: Dict,
+                 recalled: Optional[Dict[str, List[Tuple[float, Dict]]]] = None
+                 ) -> Tuple[str, str, List[Dict], Callable[[StreamHandle], AsyncGenerator], ContextPlan]:
+        """Model, system text, history window ending in `turn` (plus recalled memory), stream opener and sizing"""
+        with PROFILER.span("history window", backend=backend, messages=len(history)):
+            summary, window = history.window(backend, turn)
+        model = self._model_for(backend)
+        memory = self._memory_text((recalled or {}).get(backend, []), window)
+        # Recalled memory changes with every query, so it rides in the final turn, after the
+        # history prefix the backend can reuse, rather than in the system prompt ahead of it
+        prompt = window
+        if memory:
+            prompt = window[:-1] + [{**window[-1], "content": f"{window[-1]['content']}\n\n{memory}"}]
+        if backend == "cloud":
+            # Separate blocks so the static prompt stays cacheable as the summary changes
+            blocks = [CLOUD_SYSTEM_PROMPT, summary_section(summary)]
+            system_text = "\n\n".join(b for b in blocks if b)
+            plan = self.context.plan(backend, system_text, prompt)
+            return (model, system_text, prompt,
+                    lambda h: self.claude.achat(window, model, blocks, h, max_tokens=plan.max_tokens,
+                                                context=memory), plan)
+        system_text = with_summary(LOCAL_SYSTEM_PROMPT, summary)
+        messages = [{"role": "system", "content": system_text}] + prompt
+        plan = self.context.plan(backend, system_text, prompt)
+        self.ollama.num_ctx = plan.context
+        return model, system_text, prompt, lambda h: self.ollama.achat(messages, model, h), plan
+    
+    async def _race(self, openers: Dict[str, Callable[[StreamHandle], AsyncGenerator]], primary: str,
+                    deadline: float) -> Tuple[str, str, AsyncGenerator, StreamHandle]:
+        """Start the primary stream, hedging to the other opener if it's slow or fails
+        
+        The other backend is started when the primary has produced no token
+        by `deadline` seconds, or as soon as the primary fails. The first
+        stream to produce real text wins and the loser is cancelled. Returns
+        (winner, first chunk, stream to continue from, its handle); when every
+        stream fails or ends empty, the first chunk is the primary's StreamError.
+        
+        Each stream is counted in self.in_flight from its start until it fails
+        or is cancelled. A winner is returned still counted, and the caller
+        releases it when the stream ends.
+        """
+        start = time.monotonic()
+        gens: Dict[str, AsyncGenerator] = {}
+        handles: Dict[str, StreamHandle] = {}
+        tasks: Dict[str, asyncio.Future] = {}
+        started: Dict[str, float] = {}
+        first_token: Dict[str, float] = {}
+        failures: Dict[str, StreamError] = {}
+        secondary = next((name for name in openers if name != primary), None)
+        counted: set = set()  # streams counted in self.in_flight
+        
+        def launch(name: str):
+            handles[name] = StreamHandle()
+            gens[name] = openers[name](handles[name])
+            tasks[name] = asyncio.ensure_future(gens[name].__anext__())
+            started[name] = time.monotonic()
+            self.in_flight[name] += 1
+            counted.add(name)
+        
+        def release(name: str):
+            if name in counted:
+                counted.discard(name)
+                self.in_flight[name] -= 1
+        
+        async def discard(names):
+            for name in names:
+                tasks[name].cancel()
+            await asyncio.gather(*(tasks[name] for name in names), return_exceptions=True)
+            for name in names:
+                await gens[name].aclose()
+                del tasks[name]
+                release(name)
+        
+        launch(primary)
+        try:
+            while True:
+                timeout = None
+                if secondary and secondary not in gens:
+                    timeout = max(0.0, deadline - (time.monotonic() - start))
+                done, _ = await asyncio.wait(list(tasks.values()), timeout=timeout,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    launch(secondary)  # deadline passed without a token
+                    continue
+                
+                for name in [n for n, t in tasks.items() if t in done]:
+                    try:
+                        chunk = tasks[name].result()
+                    except StopAsyncIteration:
+                        chunk = None
+                    if chunk == "":
+                        tasks[name] = asyncio.ensure_future(gens[name].__anext__())
+                        continue
+                    if chunk is None or isinstance(chunk, StreamError):
+                        # A stream that ends without a token failed too, and must read as one
+                        chunk = chunk or StreamError("[Error: empty response]")
+                        failures[name] = chunk
+                        self.health.record_failure(name, str(chunk), chunk.retry_after)
+                        del tasks[name]
+                        release(name)
+                        if secondary and secondary not in gens:
+                            launch(secondary)
+                        if tasks:
+                            continue
+                        # Everyone failed: surface the primary's error
+                        for name in gens:
+                            if name != primary:
+                                await gens[name].aclose()
+                        self._record_hedge(primary, secondary, None, started, first_token, failures, deadline)
+                        return primary, failures[primary], gens[primary], handles[primary]
+                    
+                    first_token[name] = time.monotonic()
+                    del tasks[name]
+                    await discard(list(tasks))
+                    self._record_hedge(primary, secondary, name, started, first_token, failures, deadline)
+                    return name, chunk, gens[name], handles[name]
+        except BaseException:
+            await discard(list(tasks))
+            for name, gen in gens.items():
+                await gen.aclose()
+                release(name)
+            raise
+    
+    def _record_hedge(self, primary: str, secondary: Optional[str], winner: Optional[str],
+                      started: Dict[str, float], first_token: Dict[str, float],
+                      failures: Dict[str, StreamError], deadline: float):
+        """Keep hedging outcomes for tuning the deadline"""
+        if not secondary:
+            return
+        outcome = {
+            "at": datetime.now().isoformat(timespec="seconds"),
+            "deadline": deadline,
+            "primary": primary,
+            "hedged": secondary in started,
+            "winner": winner,
+            "ttft": {name: round(first_token[name] - started[name], 3) for name in first_token},
+            "failed": sorted(failures),
+        }
+        self.hedge_log.append(outcome)
+        if self.config.hedge_log_path:
+            try:
+                os.makedirs(os.path.dirname(self.config.hedge_log_path) or ".", exist_ok=True)
+                with open(self.config.hedge_log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(outcome) + "\n")
+            except OSError:
+                pass
+    
+    def run_once(self, prompt: str) -> int:
+        """Answer a single prompt as plain text (no banner, no Rich); returns an exit status"""
+        self.health.refresh(force=True)
+        status = 0
+        with PROFILER.turn("once"):
+            chunks = self.get_response(prompt.strip())
+            if self.voice:
+                chunks = self.voice.tee(chunks)
+            for chunk in chunks:
+                if isinstance(chunk, StreamError):
+                    sys.stderr.write(f"{chunk}\n")
+                    status = 1
+                elif not isinstance(chunk, Notice):
+                    sys.stdout.write(chunk)
+                    sys.stdout.flush()
+        sys.stdout.write("\n")
+        if self.voice:
+            self.voice.close(timeout=self.config.http_read_timeout)  # let it finish speaking
+        if PROFILER.last_path:
+            sys.stderr.write(f"trace: {PROFILER.last_path}\n")
+        self.export_metrics()
+        return status
+    
+    async def _stream_turn(self, user_input: str, info: Optional[TurnInfo] = None):
+        """Generate and render one answer, speaking it too when voice output is on"""
+        agen = self.aget_response(user_input, info=info)
+        voice = self.voice
+        if voice:
+            voice.begin_turn()
+            agen = self._speaking(agen, voice)
+        try:
+            if RICH_AVAILABLE:
+                with StreamRenderer(self.config.render_fps, self.config.render_markdown) as renderer:
+                    async for chunk in agen:
+                        renderer.feed(chunk)
+            else:
+                async for chunk in agen:
+                    print(chunk, end="", flush=True)
+        finally:
+            await agen.aclose()
+    
+    @staticmethod
+    async def _speaking(agen: AsyncGenerator, voice: SpeechPipeline) -> AsyncGenerator[str, None]:
+        """Pass chunks through, feeding the answer text to voice; Ctrl-C stops the speech too"""
+        completed = False
+        try:
+            async for chunk in agen:
+                if not isinstance(chunk, Notice):
+                    voice.feed(chunk)
+                yield chunk
+            completed = True
+        finally:
+            await agen.aclose()
+            if completed:
+                voice.end_turn()
+            else:
+                voice.cancel()
+    
+    def _run_cancellable(self, coro) -> bool:
+        """Run a turn on the session loop; returns True if Ctrl-C cancelled it"""
+        loop = self._loop
+        task = loop.create_task(coro)
         
-        yield mode_indicator
+        def on_sigint():
+            if task.cancelling():
+                self._exit_requested = True  # second Ctrl-C while the first is unwinding
+            task.cancel()
         
-        for chunk in gen:
-            response_text += chunk
-            yield chunk
+        try:
+            loop.add_signal_handler(signal.SIGINT, on_sigint)
+            handler_installed = True
+        except (NotImplementedError, RuntimeError):
+            handler_installed = False  # e.g. Windows: fall back to KeyboardInterrupt below
         
-        # Save to history
-        self.history.append({"role": "assistant", "content": response_text})
+        try:
+            loop.run_until_complete(task)
+            return False
+        except asyncio.CancelledError:
+            return True
+        except KeyboardInterrupt:
+            task.cancel()
+            loop.run_until_complete(asyncio.gather(task, return_exceptions=True))
+            return True
+        finally:
+            if handler_installed:
+                loop.remove_signal_handler(signal.SIGINT)
     
-    def run(self):
-        """Main loop"""
+    def run(self, listen: Optional[str] = None):
+        """Main loop; with listen, questions are spoken (see open_audio for the sources)"""
+        load_rich()
+        self._loop = asyncio.new_event_loop()
+        self._exit_requested = False
+        
+        # Probe backends on the monitor thread while the banner plays, and get the
+        # local model loading so the first local answer doesn't pay for it
+        self.health.start()
+        self.warm_up()
+        
+        # Log this conversation, and shrink old ones while the banner plays
+        self._start_session()
+        threading.Thread(target=self._open_memory, name="jarvis-memory-open", daemon=True).start()
+        if self.sessions and self.config.session_compact_after_days:
+            threading.Thread(
+                target=self._persist, name="jarvis-compact", daemon=True,
+                args=(self.sessions.compact, self.config.session_compact_after_days * 86400,
+                      self.config.history_keep_turns),
+            ).start()
+        
         # Startup
         if self.config.animate_startup:
             animate_startup()
@@ -662,13 +4898,43 @@ class Jarvis:
             clear_screen()
             display_header()
         
-        # Initial status
+        # Spoken answers, if configured (or --voice)
+        if self.config.voice_enabled and self.voice is None:
+            message = self.start_voice()
+            if not self.voice and RICH_AVAILABLE:
+                console.print(f"[cyan]JARVIS:[/] {message}")
+            elif not self.voice:
+                print(f"JARVIS: {message}")
+        
+        # Initial status, kept fresh in the background from here on
+        self.health.wait_ready(timeout=self.config.http_connect_timeout + 2)
         ollama_ok, claude_ok = self.check_systems()
-        display_status(ollama_ok, claude_ok, self.ollama.models, self.config.mode)
+        display_status(ollama_ok, claude_ok, self.health.get("local").models, self.config.mode)
+        
+        # Spoken questions instead of typed ones
+        utterances = None
+        if listen:
+            try:
+                utterances = self.listen(listen)
+            except ImportError as e:
+                message = f"Voice input needs {e.name or 'numpy'} (pip install -r requirements.txt)."
+            except (ValueError, OSError) as e:
+                message = f"Cannot listen to {listen}: {e}"
+            if utterances is None:
+                if RICH_AVAILABLE:
+                    console.print(f"[red]{message}[/]")
+                else:
+                    print(message)
+                sys.exit(1)
         
         # Welcome
-        if RICH_AVAILABLE:
+        if RICH_AVAILABLE and utterances is not None:
+            console.print(f"[cyan]JARVIS:[/] Listening ({self.voice_input.recognizer.describe()}), sir. "
+                          f"Say [yellow]help[/] for commands.\n")
+        elif RICH_AVAILABLE:
             console.print("[cyan]JARVIS:[/] Online and ready, sir. Type [yellow]help[/] for commands.\n")
+        elif utterances is not None:
+            print("JARVIS: Listening, sir. Say 'help' for commands.\n")
         else:
             print("JARVIS: Online and ready, sir. Type 'help' for commands.\n")
         
@@ -676,7 +4942,11 @@ class Jarvis:
         while True:
             try:
                 # Get input
-                if RICH_AVAILABLE:
+                heard = None
+                if utterances is not None:
+                    heard = self._hear(utterances)
+                    user_input = heard.text
+                elif RICH_AVAILABLE:
                     console.print("[bold yellow]You:[/] ", end="")
                     user_input = input().strip()
                 else:
@@ -685,33 +4955,53 @@ class Jarvis:
                 if not user_input:
                     continue
                 
-                # Check for commands
-                cmd_result = self.process_input(user_input)
-                if cmd_result is None:
-                    continue
-                if cmd_result != "NOT_COMMAND":
+                # One trace per line typed, when profiling (only its length is recorded)
+                with PROFILER.turn("turn", chars=len(user_input)):
+                    # Check for commands
+                    with PROFILER.span("process_input"):
+                        cmd_result = self.process_input(user_input)
+                    if cmd_result is None:
+                        continue
+                    if cmd_result != "NOT_COMMAND":
+                        if RICH_AVAILABLE:
+                            console.print(f"\n[cyan]JARVIS:[/] {cmd_result}\n")
+                        else:
+                            print(f"\nJARVIS: {cmd_result}\n")
+                        continue
+                    
+                    # Get AI response (Ctrl-C aborts the generation, a second one exits)
                     if RICH_AVAILABLE:
-                        console.print(f"\n[cyan]JARVIS:[/] {cmd_result}\n")
+                        console.print()
+                        console.print("[cyan]JARVIS:[/] ", end="")
                     else:
-                        print(f"\nJARVIS: {cmd_result}\n")
-                    continue
-                
-                # Get AI response
-                if RICH_AVAILABLE:
-                    console.print()
-                    console.print("[cyan]JARVIS:[/] ", end="")
+                        print()
+                        print("JARVIS: ", end="")
                     
-                    for chunk in self.get_response(user_input):
-                        console.print(chunk, end="")
+                    info = TurnInfo()
+                    asked = time.monotonic()
+                    interrupted = self._run_cancellable(self._stream_turn(user_input, info))
+                    latency = self._speech_latency(heard, asked, info) if heard else ""
                     
-                    console.print("\n")
-                else:
-                    print()
-                    print("JARVIS: ", end="")
-                    for chunk in self.get_response(user_input):
-                        print(chunk, end="", flush=True)
-                    print("\n")
+                    if RICH_AVAILABLE:
+                        if interrupted:
+                            console.print("\n[dim](interrupted — partial answer kept)[/]", end="")
+                        if latency:
+                            console.print(f"\n[dim]({latency})[/]", end="")
+                        console.print("\n")
+                    else:
+                        print("\n(interrupted)\n" if interrupted else "\n")
+                        if latency:
+                            print(f"({latency})\n")
                 
+                if PROFILER.enabled and PROFILER.last_path:
+                    if RICH_AVAILABLE:
+                        console.print(f"[dim]trace: {PROFILER.last_path}[/]\n")
+                    else:
+                        print(f"trace: {PROFILER.last_path}\n")
+                
+                if self._exit_requested:
+                    raise KeyboardInterrupt
+            
             except KeyboardInterrupt:
                 self._goodbye()
                 sys.exit(0)
@@ -725,13 +5015,595 @@ class Jarvis:
                     print(f"Error: {str(e)}")
 
 
+# ═══════════════════════════════════════════════════════════════════════════════
+# BATCH MODE
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class BatchRunner:
+    """Runs JSONL prompts through routing and the backend clients concurrently
+    
+    Input lines look like {"id": "q1", "prompt": "...", "mode": "auto"} (id and
+    mode optional). Each prompt is an independent conversation. Prompts are
+    routed once, as they are read, and queued per backend, where a fixed number
+    of workers (the backend's concurrency limit) answer them on that backend
+    rather than routing again. Results are written
+    as JSONL in completion order.
+    """
+    
+    def __init__(self, jarvis: "Jarvis", limits: Dict[str, int]):
+        self.jarvis = jarvis
+        self.limits = {name: max(1, n) for name, n in limits.items()}
+        self.done = self.errors = self.skipped = 0
+    
+    @staticmethod
+    def completed_ids(path: str) -> set:
+        """IDs already answered without error in a previous, possibly partial, run"""
+        done = set()
+        if not path or not os.path.exists(path):
+            return done
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn last line from an interrupted run
+                if "id" in record and not record.get("error"):
+                    done.add(str(record["id"]))
+        return done
+    
+    async def run(self, lines: Iterator[str], out, resume: set = frozenset()):
+        queues = {name: asyncio.Queue(maxsize=limit * 2) for name, limit in self.limits.items()}
+        workers = [
+            asyncio.create_task(self._worker(queues[name], out))
+            for name, limit in self.limits.items() for _ in range(limit)
+        ]
+        
+        # Read on a thread: a slow pipe mustn't stall the jobs already running on this loop
+        loop = asyncio.get_running_loop()
+        lines = iter(lines)
+        number = 0
+        while True:
+            line = await loop.run_in_executor(None, next, lines, None)
+            if line is None:
+                break
+            number += 1
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                item = {"id": str(number), "error": "invalid JSON"}
+            item_id = str(item.get("id", number))
+            if item_id in resume:
+                self.skipped += 1
+                continue
+            item["id"] = item_id
+            mode = item.get("mode") or self.jarvis.config.mode
+            route = self.jarvis.choose_backend(item.get("prompt", ""), mode)
+            # Unroutable items still go through a queue so their error is recorded in order
+            await queues[route[0] or "local"].put((item, route))
+            if route[0]:
+                self.jarvis.queued[route[0]] += 1
+        
+        for name, queue in queues.items():
+            for _ in range(self.limits[name]):
+                await queue.put(None)
+        await asyncio.gather(*workers)
+    
+    async def _worker(self, queue: asyncio.Queue, out):
+        while True:
+            entry = await queue.get()
+            if entry is None:
+                return
+            if entry[1][0]:
+                self.jarvis.queued[entry[1][0]] -= 1
+            record = await self._answer(*entry)
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            self.done += 1
+            if record.get("error"):
+                self.errors += 1
+    
+    async def _answer(self, item: Dict, route: Tuple) -> Dict:
+        record = {"id": item["id"]}
+        if item.get("error") or not item.get("prompt"):
+            record["error"] = item.get("error") or "missing prompt"
+            return record
+        
+        info = TurnInfo()
+        parts: List[str] = []
+        start = time.monotonic()
+        mode = item.get("mode") or self.jarvis.config.mode
+        async for chunk in self.jarvis.aget_response(item["prompt"], history=self.jarvis.new_history(),
+                                                     mode=mode, info=info, route=route):
+            if not isinstance(chunk, Notice):
+                parts.append(chunk)
+        ttft = info.timings.get("ttft")
+        record.update({
+            "backend": info.backend or None,
+            "model": info.model or None,
+            "latency_s": round(time.monotonic() - start, 3),
+            "ttft_s": round(ttft, 3) if ttft is not None else None,
+            "cached": info.cached,
+            "response": "".join(parts),
+        })
+        if info.error:
+            record["error"] = info.error
+        return record
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# SERVER MODE
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class FairLimiter:
+    """Concurrency limit whose waiters are served round-robin per client
+    
+    A client that queues fifty requests gets a slot in turn with everyone
+    else, instead of holding the backend until its whole burst is through.
+    """
+    
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self.active = 0
+        self._waiting: "OrderedDict[str, deque]" = OrderedDict()
+    
+    @property
+    def queued(self) -> int:
+        return sum(len(q) for q in self._waiting.values())
+    
+    async def acquire(self, client: str):
+        if self.active < self.limit and not self._waiting:
+            self.active += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(client, deque()).append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # the slot was handed over just as we gave up
+            else:
+                queue = self._waiting.get(client)
+                if queue and future in queue:
+                    queue.remove(future)
+                    if not queue:
+                        del self._waiting[client]
+            raise
+    
+    def release(self):
+        """Hand the slot to the next client in turn, or free it"""
+        while self._waiting:
+            client, queue = next(iter(self._waiting.items()))
+            future = queue.popleft()
+            if queue:
+                self._waiting.move_to_end(client)
+            else:
+                del self._waiting[client]
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+
+class SessionTable:
+    """Per-session histories, bounded; the least recently used session is dropped"""
+    
+    def __init__(self, factory: Callable[[], HistoryManager], max_sessions: int = 256):
+        self.factory = factory
+        self.max_sessions = max(1, max_sessions)
+        self.evicted = 0
+        self._sessions: "OrderedDict[str, Tuple[HistoryManager, asyncio.Lock]]" = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._sessions)
+    
+    def get(self, session: str) -> Tuple[HistoryManager, asyncio.Lock]:
+        """The session's history and the lock that keeps its turns in order"""
+        entry = self._sessions.get(session)
+        if entry is not None:
+            self._sessions.move_to_end(session)
+            return entry
+        entry = self._sessions[session] = (self.factory(), asyncio.Lock())
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evicted += 1
+        return entry
+    
+    def drop(self, session: str) -> bool:
+        return self._sessions.pop(session, None) is not None
+
+
+class APIServer:
+    """OpenAI-compatible local HTTP API with the REPL's routing, fallback and prompts
+    
+    POST /v1/chat/completions answers the last user message, as server-sent
+    events with "stream": true. A request with an X-Session-Id header
+    continues that session's history on the server and only its newest user
+    message is used; without one, the request's own messages are the whole
+    conversation. The model picks the routing mode (jarvis-auto, jarvis-local,
+    jarvis-cloud; anything else uses the configured mode). Client system
+    messages are ignored in favour of JARVIS's own prompts.
+    
+    Also: GET /v1/models, GET /health and DELETE /v1/sessions/<id>.
+    """
+    
+    MODES = {"jarvis-auto": "auto", "jarvis-local": "local", "jarvis-cloud": "cloud"}
+    MAX_BODY = 4 * 1024 * 1024
+    
+    def __init__(self, jarvis: "Jarvis", limits: Dict[str, int], max_sessions: int = 256):
+        self.jarvis = jarvis
+        self.limiters = {name: FairLimiter(n) for name, n in limits.items()}
+        self.sessions = SessionTable(jarvis.new_history, max_sessions)
+        self.served = self.failed = 0
+    
+    async def start(self, host: str, port: int) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self._connection, host, port)
+    
+    async def _connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """One keep-alive connection: requests are handled in order until it closes"""
+        peer = writer.get_extra_info("peername")
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except (ValueError, asyncio.LimitOverrunError) as e:
+                    await self._send_error(writer, 400, f"malformed request: {e}", close=True)
+                    return
+                if request is None:
+                    return
+                method, path, headers, body = request
+                await self._dispatch(method, path, headers, body, writer, peer[0] if peer else "")
+                if headers.get("connection", "").lower() == "close":
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # client went away; aget_response has been closed and cancelled its stream
+        finally:
+            writer.close()
+    
+    async def _read_request(self, reader: asyncio.StreamReader
+                            ) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        """(method, path, lower-cased headers, body), or None at end of connection"""
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as e:
+            if e.partial.strip():
+                raise ValueError("truncated headers")
+            return None
+        lines = head.decode("latin-1").split("\r\n")
+        method, target, _ = lines[0].split(" ", 2)
+        headers = {}
+        for line in lines[1:]:
+            key, sep, value = line.partition(":")
+            if sep:
+                headers[key.strip().lower()] = value.strip()
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise ValueError("chunked request bodies are not supported")
+        length = int(headers.get("content-length") or 0)
+        if not 0 <= length <= self.MAX_BODY:
+            raise ValueError(f"body over {self.MAX_BODY} bytes")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target.split("?", 1)[0], headers, body
+    
+    @staticmethod
+    def _head(writer: asyncio.StreamWriter, status: int, headers: Dict[str, object]):
+        from http import HTTPStatus
+        lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"]
+        lines += [f"{key}: {value}" for key, value in headers.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+    
+    async def _send_json(self, writer: asyncio.StreamWriter, status: int, body: Dict,
+                         headers: Optional[Dict[str, object]] = None, close: bool = False):
+        data = json.dumps(body, ensure_ascii=False).encode()
+        self._head(writer, status, {"Content-Type": "application/json", "Content-Length": len(data),
+                                    **({"Connection": "close"} if close else {}), **(headers or {})})
+        writer.write(data)
+        await writer.drain()
+    
+    async def _send_error(self, writer: asyncio.StreamWriter, status: int, message: str,
+                          kind: str = "invalid_request_error", close: bool = False):
+        await self._send_json(writer, status, {"error": {"message": message, "type": kind}}, close=close)
+    
+    @staticmethod
+    async def _send_chunk(writer: asyncio.StreamWriter, data: bytes):
+        """One piece of a Transfer-Encoding: chunked body (b"" ends it)"""
+        writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+        await writer.drain()
+    
+    async def _dispatch(self, method: str, path: str, headers: Dict[str, str], body: bytes,
+                        writer: asyncio.StreamWriter, peer: str):
+        if path == "/v1/chat/completions":
+            if method != "POST":
+                return await self._send_error(writer, 405, "use POST")
+            return await self._completions(headers, body, writer, peer)
+        if path == "/v1/models" and method == "GET":
+            return await self._send_json(writer, 200, {"object": "list", "data": [
+                {"id": name, "object": "model", "owned_by": "jarvis"} for name in self.MODES
+            ]})
+        if path == "/health" and method == "GET":
+            return await self._send_json(writer, 200, self.status())
+        if path.startswith("/v1/sessions/") and method == "DELETE":
+            if self.sessions.drop(path[len("/v1/sessions/"):]):
+                return await self._send_json(writer, 200, {"deleted": True})
+            return await self._send_error(writer, 404, "no such session")
+        await self._send_error(writer, 404, f"no route for {method} {path}")
+    
+    def status(self) -> Dict:
+        backends = {}
+        for name, limiter in self.limiters.items():
+            health = self.jarvis.health.get(name)
+            backends[name] = {
+                "healthy": health.healthy,
+                "circuit": self.jarvis.health.breakers[name].state,
+                "active": limiter.active,
+                "queued": limiter.queued,
+                "limit": limiter.limit,
+            }
+        return {"backends": backends, "sessions": len(self.sessions), "sessions_evicted": self.sessions.evicted,
+                "served": self.served, "failed": self.failed}
+    
+    @staticmethod
+    def _text(message: Dict) -> str:
+        """Text of a message whose content is a string or a list of content parts"""
+        content = message.get("content") or ""
+        if isinstance(content, list):
+            return "".join(p.get("text", "") for p in content if isinstance(p, dict) and p.get("type") == "text")
+        return str(content)
+    
+    async def _completions(self, headers: Dict[str, str], body: bytes, writer: asyncio.StreamWriter, peer: str):
+        try:
+            request = json.loads(body or b"{}")
+            messages = [m for m in request["messages"] if m.get("role") in ("user", "assistant")]
+            last = max(i for i, m in enumerate(messages) if m["role"] == "user")
+            prompt = self._text(messages[last]).strip()
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return await self._send_error(writer, 400, "expected JSON with a non-empty messages list "
+                                                       "ending in a user message")
+        if not prompt:
+            return await self._send_error(writer, 400, "the last user message is empty")
+        
+        mode = self.MODES.get(request.get("model"), self.jarvis.config.mode)
+        session = headers.get("x-session-id", "")
+        if session:
+            history, lock = self.sessions.get(session)
+        else:
+            history, lock = self.jarvis.new_history(), None
+            for message in messages[:last]:
+                history.append({"role": message["role"], "content": self._text(message)})
+        
+        async with lock or contextlib.nullcontext():
+            # Route once, with the conversation so far, to know whose queue to wait in;
+            # the turn then runs there rather than being routed again after the wait
+            route = self.jarvis.choose_backend(prompt, mode, history)
+            limiter = self.limiters.get(route[0]) if route[0] else None
+            if limiter:
+                self.jarvis.queued[route[0]] += 1
+                try:
+                    await limiter.acquire(session or request.get("user") or peer)
+                finally:
+                    self.jarvis.queued[route[0]] -= 1
+            try:
+                await self._answer(prompt, history, mode, route, bool(request.get("stream")), session, writer)
+            finally:
+                if limiter:
+                    limiter.release()
+    
+    async def _answer(self, prompt: str, history: HistoryManager, mode: str, route: Tuple, stream: bool,
+                      session: str, writer: asyncio.StreamWriter):
+        info = TurnInfo()
+        completion_id = f"chatcmpl-{os.urandom(12).hex()}"
+        created = int(time.time())
+        parts: List[str] = []
+        started = False
+        
+        def jarvis_headers() -> Dict[str, object]:
+            extra = {"X-Jarvis-Backend": info.backend, "X-Jarvis-Model": info.model}
+            if session:
+                extra["X-Session-Id"] = session
+            return extra
+        
+        async def event(delta: Dict, finish: Optional[str] = None):
+            payload = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                       "model": info.model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]}
+            await self._send_chunk(writer, f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode())
+        
+        async def start_stream():
+            self._head(writer, 200, {"Content-Type": "text/event-stream", "Cache-Control": "no-cache",
+                                     "Transfer-Encoding": "chunked", **jarvis_headers()})
+            await event({"role": "assistant", "content": ""})
+        
+        agen = self.jarvis.aget_response(prompt, history=history, mode=mode, info=info, route=route)
+        try:
+            async for chunk in agen:
+                if not chunk or isinstance(chunk, Notice):
+                    continue  # terminal markup, and errors, which info.error reports below
+                parts.append(chunk)
+                if stream:
+                    if not started:
+                        await start_stream()
+                        started = True
+                    await event({"content": chunk})
+        finally:
+            await agen.aclose()
+        
+        self.served += 1
+        if info.error:
+            self.failed += 1
+        if info.error and not started:
+            # Nothing sent yet, so the failure can still be a proper HTTP status
+            status = 502 if info.backend else 503
+            return await self._send_error(writer, status, info.error.strip("[]"), "backend_error")
+        if not stream:
+            tokens, prompt_tokens = info.tokens, info.prompt_tokens
+            return await self._send_json(writer, 200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": info.model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(parts)},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": tokens,
+                          "total_tokens": prompt_tokens + tokens},
+            }, jarvis_headers())
+        if not started:
+            await start_stream()
+        if info.error:
+            # The answer broke off part way; OpenAI clients look for an error object in the stream
+            error = {"error": {"message": info.error.strip("[]"), "type": "backend_error"}}
+            await self._send_chunk(writer, f"data: {json.dumps(error)}\n\n".encode())
+        else:
+            await event({}, "stop")
+        await self._send_chunk(writer, b"data: [DONE]\n\n")
+        await self._send_chunk(writer, b"")
+
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # ENTRY POINT
 # ═══════════════════════════════════════════════════════════════════════════════
 
+def parse_args(argv: Optional[List[str]] = None):
+    """Command line options"""
+    import argparse
+    parser = argparse.ArgumentParser(
+        prog="jarvis",
+        description="JARVIS - Personal AI Assistant (Local + Cloud)",
+        epilog="With -p or piped stdin, JARVIS answers once as plain text and exits.",
+    )
+    parser.add_argument("-p", "--prompt", help="answer this prompt non-interactively and exit")
+    parser.add_argument("-m", "--mode", choices=["auto", "local", "cloud"], help="routing mode")
+    parser.add_argument("--no-animation", action="store_true", help="skip the startup animation")
+    
+    def profile_option(value: str) -> set:
+        extras = {part for part in value.split(",") if part}
+        if not extras <= {"cpu", "memory"}:
+            raise argparse.ArgumentTypeError("expected cpu, memory or cpu,memory")
+        return extras
+    
+    parser.add_argument("--profile", nargs="?", const=set(), type=profile_option, metavar="cpu,memory",
+                        help="write a Chrome trace of every turn to ~/.jarvis/traces; --profile=cpu,memory "
+                             "adds cProfile and tracemalloc data")
+    
+    parser.add_argument("--voice", action="store_true", help="speak answers as they stream (ElevenLabs)")
+    parser.add_argument("--voice-dir", metavar="DIR",
+                        help="write the spoken audio to DIR instead of playing it (implies --voice)")
+    
+    parser.add_argument("--listen", nargs="?", const="mic", metavar="WAV",
+                        help="ask by voice: from the microphone, a WAV file, or '-' for WAV or raw "
+                             "16 kHz 16-bit PCM on stdin")
+    
+    batch = parser.add_argument_group("batch mode")
+    batch.add_argument("--batch", metavar="FILE",
+                       help="answer every prompt in a JSONL file ('-' for stdin) and exit")
+    batch.add_argument("-o", "--output", metavar="FILE",
+                       help="append results here (default stdout); rerunning resumes where it stopped")
+    batch.add_argument("--local-concurrency", type=int, default=2, metavar="N",
+                       help="parallel Ollama requests, also in server mode (default 2)")
+    batch.add_argument("--cloud-concurrency", type=int, default=8, metavar="N",
+                       help="parallel Claude requests, also in server mode (default 8)")
+    
+    server = parser.add_argument_group("server mode")
+    server.add_argument("--serve", action="store_true",
+                        help="serve an OpenAI-compatible API (/v1/chat/completions) instead of the REPL")
+    server.add_argument("--host", default="127.0.0.1", help="address to listen on (default 127.0.0.1)")
+    server.add_argument("--port", type=int, default=8741, help="port to listen on (default 8741)")
+    server.add_argument("--max-sessions", type=int, default=256, metavar="N",
+                        help="session histories kept before the least recently used is dropped (default 256)")
+    return parser.parse_args(argv)
+
+
+def run_batch(jarvis: Jarvis, args) -> int:
+    """--batch entry point; returns an exit status"""
+    jarvis.health.refresh(force=True)
+    jarvis.health.start()
+    runner = BatchRunner(jarvis, {"local": args.local_concurrency, "cloud": args.cloud_concurrency})
+    resume = BatchRunner.completed_ids(args.output)
+    
+    source = sys.stdin if args.batch == "-" else open(args.batch, encoding="utf-8")
+    out = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+    start = time.monotonic()
+    try:
+        with PROFILER.turn("batch"):
+            asyncio.run(runner.run(source, out, resume))
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+        jarvis.export_metrics()
+    
+    sys.stderr.write(
+        f"JARVIS batch: {runner.done} answered ({runner.errors} errors), "
+        f"{runner.skipped} already done, {time.monotonic() - start:.1f}s\n"
+    )
+    if PROFILER.last_path:
+        sys.stderr.write(f"trace: {PROFILER.last_path}\n")
+    return 1 if runner.errors else 0
+
+
+def run_server(jarvis: Jarvis, args) -> int:
+    """--serve entry point; runs until interrupted"""
+    jarvis.health.refresh(force=True)
+    jarvis.health.start()
+    jarvis.warm_up()
+    server = APIServer(jarvis, {"local": args.local_concurrency, "cloud": args.cloud_concurrency},
+                       max_sessions=args.max_sessions)
+    
+    async def serve():
+        listener = await server.start(args.host, args.port)
+        host, port = listener.sockets[0].getsockname()[:2]
+        sys.stderr.write(f"JARVIS API listening on http://{host}:{port}/v1 (Ctrl+C to stop)\n")
+        async with listener:
+            await listener.serve_forever()
+    
+    try:
+        # One trace for the whole run, written on shutdown
+        with PROFILER.turn("serve"):
+            asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        jarvis.export_metrics()
+    if PROFILER.last_path:
+        sys.stderr.write(f"trace: {PROFILER.last_path}\n")
+    return 0
+
+
 def main():
     """Entry point"""
+    args = parse_args()
     jarvis = Jarvis()
+    if args.mode:
+        jarvis.config.mode = args.mode
+    if args.no_animation:
+        jarvis.config.animate_startup = False
+    if args.profile is not None:
+        PROFILER.start(cpu="cpu" in args.profile, memory="memory" in args.profile)
+    if args.voice or args.voice_dir:
+        if args.voice_dir:
+            jarvis.config.voice_output_dir = args.voice_dir
+        jarvis.config.voice_enabled = True
+    
+    if args.batch:
+        sys.exit(run_batch(jarvis, args))
+    if args.serve:
+        sys.exit(run_server(jarvis, args))
+    
+    if args.listen:
+        jarvis.run(listen=args.listen)
+        return
+    
+    # One-shot: -p "question" or piped stdin
+    prompt = args.prompt
+    if prompt is None and not sys.stdin.isatty():
+        prompt = sys.stdin.read()
+    if prompt is not None:
+        if jarvis.config.voice_enabled:
+            message = jarvis.start_voice()
+            if not jarvis.voice:
+                sys.stderr.write(f"{message}\n")
+        sys.exit(jarvis.run_once(prompt))
+    
     jarvis.run()
 
 